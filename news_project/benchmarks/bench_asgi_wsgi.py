@@ -0,0 +1,185 @@
+"""
+Compares the ASGI deployment (uvicorn + async_views.py) with the WSGI
+deployment (gunicorn gthread + the sync views) under rising client
+concurrency.
+
+Both servers run with the same number of worker processes; gunicorn
+gets --threads threads per worker, which is what bounds the WSGI
+deployment while requests wait on the database.
+
+Requires: pip install uvicorn gunicorn
+
+    python benchmarks/bench_asgi_wsgi.py --seed 500
+    python benchmarks/bench_asgi_wsgi.py --path /api/articles/ \\
+        --concurrency 1 16 64 --duration 10
+
+The database named by DJANGO_SETTINGS_MODULE must be migrated; --seed
+adds approved articles to it first. The load generator is a pool of
+Python threads, so compare the two servers against each other rather
+than reading the numbers as absolute capacity.
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from common import PROJECT_DIR, percentile, print_table, setup_django
+
+
+def server_command(kind, port, workers, threads):
+    if kind == "asgi":
+        return [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "news_project.asgi:application",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ]
+    return [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "news_project.wsgi:application",
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--workers",
+        str(workers),
+        "--worker-class",
+        "gthread",
+        "--threads",
+        str(threads),
+        "--log-level",
+        "warning",
+    ]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start.")
+
+
+def run_load(url, concurrency, duration, cookie):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        local = []
+        failed = 0
+        request = urllib.request.Request(url)
+        if cookie:
+            request.add_header("Cookie", cookie)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                local.append(time.perf_counter() - start)
+            except (urllib.error.URLError, OSError):
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def session_cookie(username, password):
+    """Log in through the ORM and return a session cookie header."""
+    from django.conf import settings
+    from django.test import Client
+
+    client = Client()
+    if not client.login(username=username, password=password):
+        raise RuntimeError(f"Could not log in as {username}.")
+    return f"{settings.SESSION_COOKIE_NAME}={client.session.session_key}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--path", default="/")
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8, 32, 64]
+    )
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--login",
+        nargs=2,
+        metavar=("USERNAME", "PASSWORD"),
+        help="Send the requests with this user's session.",
+    )
+    args = parser.parse_args()
+
+    setup_django()
+    if args.seed:
+        from common import seed_articles
+
+        seed_articles(args.seed)
+    cookie = session_cookie(*args.login) if args.login else None
+
+    rows = []
+    for kind in ("wsgi", "asgi"):
+        env = dict(os.environ)
+        env.pop("NEWSAPP_ASYNC_VIEWS", None)
+        process = subprocess.Popen(
+            server_command(kind, args.port, args.workers, args.threads),
+            cwd=PROJECT_DIR,
+            env=env,
+        )
+        try:
+            wait_for_port(args.port)
+            url = f"http://127.0.0.1:{args.port}{args.path}"
+            run_load(url, 1, 1, cookie)  # warm up
+            for concurrency in args.concurrency:
+                latencies, errors = run_load(
+                    url, concurrency, args.duration, cookie
+                )
+                rows.append(
+                    (
+                        kind,
+                        concurrency,
+                        f"{len(latencies) / args.duration:.1f}",
+                        f"{percentile(latencies, 0.5) * 1000:.1f}",
+                        f"{percentile(latencies, 0.95) * 1000:.1f}",
+                        errors,
+                    )
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(f"GET {args.path}, {args.workers} worker(s), {args.duration}s each")
+    print_table(
+        ("server", "clients", "req/s", "p50 ms", "p95 ms", "errors"), rows
+    )
+
+
+if __name__ == "__main__":
+    main()
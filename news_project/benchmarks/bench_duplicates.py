@@ -0,0 +1,166 @@
+"""
+Benchmark of near-duplicate lookups (newsApp/duplicates.py) against
+corpus size.
+
+The corpus grows in steps of synthetic stories, each indexed with its
+MinHash signature and LSH band keys. At each size, near-copies of
+existing stories (2% of the words changed, a light edit) are looked
+up in two ways:
+
+* LSH: duplicates.find_duplicate(), which reads the candidates sharing
+  a band key and checks only their signatures,
+* scan: load every signature and compare them all (vectorised).
+
+The script reports the median lookup time, the candidates checked and
+the recall of each method.
+
+    python benchmarks/bench_duplicates.py [--sizes 1000 10000 50000]
+        [--queries 50]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+from common import print_table, setup_django, test_database
+
+
+def story(rng, vocabulary, words=120):
+    return " ".join(rng.choices(vocabulary, k=words))
+
+
+def near_copy(rng, text, vocabulary, changed=0.02):
+    words = text.split()
+    for index in rng.sample(range(len(words)), int(len(words) * changed)):
+        words[index] = rng.choice(vocabulary)
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10_000, 50_000]
+    )
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    from newsApp import duplicates
+    from newsApp.models import (
+        Article,
+        ArticleLSHBucket,
+        ArticleSignature,
+        CustomUser,
+    )
+
+    rng = random.Random(1)
+    vocabulary = [f"word{index}" for index in range(5000)]
+    texts = []
+    rows = []
+
+    def index(start, stop, author):
+        articles = Article.objects.bulk_create(
+            Article(title=f"Story {i}", content=texts[i], author=author)
+            for i in range(start, stop)
+        )
+        signatures = [duplicates.minhash(a.content) for a in articles]
+        ArticleSignature.objects.bulk_create(
+            (
+                ArticleSignature(article=a, minhash=s.tobytes())
+                for a, s in zip(articles, signatures)
+            ),
+            batch_size=2000,
+        )
+        ArticleLSHBucket.objects.bulk_create(
+            (
+                ArticleLSHBucket(article=a, key=key)
+                for a, s in zip(articles, signatures)
+                for key in duplicates.band_keys(s)
+            ),
+            batch_size=5000,
+        )
+        return [a.pk for a in articles]
+
+    def scan(signature):
+        best_id, best_score = None, 0.0
+        ids, blobs = zip(
+            *ArticleSignature.objects.values_list("article_id", "minhash")
+        )
+        stored = np.frombuffer(b"".join(blobs), dtype=np.uint32).reshape(
+            len(ids), duplicates.NUM_PERM
+        )
+        scores = (stored == signature).mean(axis=1)
+        best = int(scores.argmax())
+        if scores[best] >= settings.DUPLICATE_SIMILARITY:
+            best_id, best_score = ids[best], float(scores[best])
+        return best_id, best_score, len(ids)
+
+    with test_database():
+        author = CustomUser.objects.create(
+            username="bench_journalist", role="journalist"
+        )
+        ids = []
+        for size in sorted(args.sizes):
+            texts.extend(
+                story(rng, vocabulary) for _ in range(size - len(texts))
+            )
+            ids.extend(index(len(ids), size, author))
+
+            targets = rng.sample(range(size), args.queries)
+            lsh_times, scan_times, candidates = [], [], []
+            lsh_hits = scan_hits = 0
+            for target in targets:
+                signature = duplicates.minhash(
+                    near_copy(rng, texts[target], vocabulary)
+                )
+                keys = duplicates.band_keys(signature)
+
+                start = time.perf_counter()
+                found, _ = duplicates.find_duplicate(signature, keys)
+                lsh_times.append(time.perf_counter() - start)
+                candidates.append(
+                    ArticleLSHBucket.objects.filter(key__in=keys)
+                    .values("article_id")
+                    .distinct()
+                    .count()
+                )
+                lsh_hits += found == ids[target]
+
+                start = time.perf_counter()
+                found, _, _ = scan(signature)
+                scan_times.append(time.perf_counter() - start)
+                scan_hits += found == ids[target]
+
+            rows.append(
+                (
+                    size,
+                    f"{statistics.median(lsh_times) * 1000:.2f}",
+                    f"{statistics.mean(candidates):.1f}",
+                    f"{lsh_hits / args.queries:.0%}",
+                    f"{statistics.median(scan_times) * 1000:.2f}",
+                    size,
+                    f"{scan_hits / args.queries:.0%}",
+                )
+            )
+
+    print(f"{args.queries} near-copy lookups per corpus size")
+    print_table(
+        (
+            "articles",
+            "LSH ms",
+            "LSH candidates",
+            "LSH recall",
+            "scan ms",
+            "scan candidates",
+            "scan recall",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark of the related-articles build (newsApp/related.py).
+
+Generates a synthetic corpus of topical articles: a few topic words,
+a title drawn from the topic and a Zipf-distributed general
+vocabulary. The script times each phase of a full build (tokenising,
+building the TF-IDF matrix, blocked top-k scoring) and an incremental
+update of --new articles. Quality is the share of recommended
+neighbours that come from the same topic.
+
+By default everything runs in memory, so the time is the build's own.
+With --db the articles are also stored in a test database, and
+related.build() runs end to end (including the RelatedArticle
+inserts).
+
+    python benchmarks/bench_related.py [--articles 100000]
+        [--dimensions 2048] [--block-size 512] [--new 100] [--db]
+"""
+
+import argparse
+import random
+import string
+import time
+
+import numpy as np
+from common import print_table, setup_django, test_database
+
+
+def word(number):
+    letters = []
+    number += 26
+    while number:
+        number, letter = divmod(number, 26)
+        letters.append(string.ascii_lowercase[letter])
+    return "".join(letters)
+
+
+def synthetic_articles(count, topics=200, seed=1):
+    """(topic, title, content) tuples."""
+    rng = random.Random(seed)
+    general = [word(index) for index in range(20_000)]
+    weights = [1 / rank for rank in range(1, len(general) + 1)]
+    topic_words = [
+        [word(100_000 + topic * 50 + index) for index in range(50)]
+        for topic in range(topics)
+    ]
+    articles = []
+    for _ in range(count):
+        topic = rng.randrange(topics)
+        title = " ".join(rng.sample(topic_words[topic], 6))
+        content = rng.choices(general, weights, k=90) + rng.choices(
+            topic_words[topic], k=30
+        )
+        rng.shuffle(content)
+        articles.append((topic, title, " ".join(content)))
+    return articles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=2048)
+    parser.add_argument("--block-size", type=int, default=512)
+    parser.add_argument("--new", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--db", action="store_true")
+    args = parser.parse_args()
+
+    setup_django()
+    from newsApp import related
+
+    articles = synthetic_articles(args.articles + args.new)
+    topics = np.array([topic for topic, _, _ in articles])
+    rows = []
+
+    def phase(name, func):
+        start = time.perf_counter()
+        result = func()
+        rows.append((name, f"{time.perf_counter() - start:.1f}"))
+        return result
+
+    def build_corpus(items):
+        corpus = related.Corpus()
+        for index, (_, title, content) in enumerate(items):
+            corpus.add(index, title, content)
+        return corpus
+
+    base = articles[: args.articles]
+    corpus = phase("tokenise", lambda: build_corpus(base))
+    matrix = phase("TF-IDF matrix", lambda: corpus.matrix(args.dimensions))
+    indices, scores = phase(
+        "top-k scoring",
+        lambda: related.top_neighbours(
+            matrix, np.arange(len(matrix)), args.k, args.block_size
+        ),
+    )
+    precision = np.mean(topics[indices] == topics[: len(indices), None])
+
+    # Incremental: only the new rows are scored against everything,
+    # plus everything against the new rows.
+    corpus = build_corpus(articles)
+    matrix = corpus.matrix(args.dimensions)
+    new_rows = np.arange(args.articles, len(articles))
+    phase(
+        f"incremental scoring ({args.new} new)",
+        lambda: (
+            related.top_neighbours(matrix, new_rows, args.k, args.block_size),
+            related.top_neighbours(
+                matrix,
+                np.arange(len(matrix)),
+                args.k,
+                args.block_size,
+                candidates=new_rows,
+            ),
+        ),
+    )
+
+    if args.db:
+        from newsApp.models import Article, CustomUser
+
+        with test_database():
+            author = CustomUser.objects.create(
+                username="bench_journalist", role="journalist"
+            )
+            Article.objects.bulk_create(
+                (
+                    Article(
+                        title=title,
+                        content=content,
+                        author=author,
+                        status="approved",
+                    )
+                    for _, title, content in base
+                ),
+                batch_size=2000,
+            )
+            phase(
+                "related.build() with database",
+                lambda: related.build(
+                    k=args.k,
+                    dimensions=args.dimensions,
+                    block_size=args.block_size,
+                ),
+            )
+
+    print(
+        f"{args.articles} articles, {args.dimensions} dimensions, "
+        f"k={args.k}, {matrix.nbytes / 2**20:.0f} MiB matrix"
+    )
+    print_table(("phase", "seconds"), rows)
+    print(f"same-topic neighbours: {precision:.1%}")
+
+
+if __name__ == "__main__":
+    main()
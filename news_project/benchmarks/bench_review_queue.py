@@ -0,0 +1,111 @@
+"""
+Benchmark of the editors' review queue (newsApp/review_queue.py).
+
+N editor threads repeatedly claim a batch of pending articles, "review"
+each one for --review-ms, and approve it while holding the claim,
+until the queue is empty. The script reports the throughput for each
+editor count and checks that no article was reviewed twice.
+
+With SKIP LOCKED (MySQL 8, PostgreSQL) claims never wait for each
+other. On SQLite the claims fall back to conditional UPDATEs, which
+serialise on the database lock but still never hand out an article
+twice. For SQLite, set a TEST NAME file in DATABASES: the default
+in-memory test database locks whole tables and fails instead of waiting.
+
+    python benchmarks/bench_review_queue.py [--editors 1 2 4 8]
+        [--articles 400] [--batch 5] [--review-ms 10]
+"""
+
+import argparse
+import threading
+import time
+from collections import Counter
+
+from common import print_table, seed_articles, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--editors", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--articles", type=int, default=400)
+    parser.add_argument("--batch", type=int, default=5)
+    parser.add_argument("--review-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    from newsApp import review_queue
+    from newsApp.models import Article, CustomUser
+
+    def editor_loop(editor, reviewed, lock):
+        try:
+            while True:
+                claimed = review_queue.claim_next(editor, args.batch)
+                if not claimed:
+                    return
+                for article_id in claimed:
+                    time.sleep(args.review_ms / 1000)
+                    decided = Article.objects.filter(
+                        pk=article_id, status="pending", claimed_by=editor
+                    ).update(
+                        status="approved",
+                        claimed_by=None,
+                        claim_expires_at=None,
+                    )
+                    with lock:
+                        reviewed[article_id] += decided
+        finally:
+            connection.close()
+
+    rows = []
+    baseline = None
+    with test_database():
+        seed_articles(args.articles)
+        editors = [
+            CustomUser.objects.create(username=f"editor{index}", role="editor")
+            for index in range(max(args.editors))
+        ]
+        for count in args.editors:
+            Article.objects.update(
+                status="pending", claimed_by=None, claim_expires_at=None
+            )
+            reviewed = Counter()
+            lock = threading.Lock()
+            threads = [
+                threading.Thread(
+                    target=editor_loop, args=(editor, reviewed, lock)
+                )
+                for editor in editors[:count]
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            throughput = sum(reviewed.values()) / elapsed
+            baseline = baseline or throughput
+            rows.append(
+                (
+                    count,
+                    sum(reviewed.values()),
+                    sum(1 for n in reviewed.values() if n > 1),
+                    f"{elapsed:.2f}",
+                    f"{throughput:.0f}",
+                    f"{throughput / baseline:.1f}x",
+                )
+            )
+
+    print(
+        f"{args.articles} articles, batches of {args.batch}, "
+        f"{args.review_ms} ms per review, {connection.vendor}"
+    )
+    print_table(
+        ("editors", "reviewed", "twice", "seconds", "per second", "scaling"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
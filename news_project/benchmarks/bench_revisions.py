@@ -0,0 +1,149 @@
+"""
+Benchmark of the article revision history (newsApp/revisions.py) on
+long articles.
+
+Each article starts at --words words in paragraphs of about 80 words,
+then gets --revisions edits through Article.save(). An edit rewrites a
+few words, inserts a paragraph or deletes one. This is repeated for
+every snapshot interval in --intervals; interval 1 stores every
+revision as a compressed snapshot.
+
+The script reports the bytes stored against the bytes of a full copy
+per revision, the time Article.save() takes, and the time to rebuild
+every revision with revisions.content_at(), checking each rebuilt text
+against the original.
+
+    python benchmarks/bench_revisions.py [--articles 5] [--words 5000]
+        [--revisions 100] [--intervals 1 5 10 25]
+"""
+
+import argparse
+import random
+import statistics
+import string
+import time
+
+from common import print_table, setup_django, test_database
+
+
+def paragraph(rng, vocabulary, words=80):
+    return " ".join(rng.choices(vocabulary, k=words)) + "."
+
+
+def edit(rng, vocabulary, content):
+    paragraphs = content.split("\n")
+    kind = rng.random()
+    if kind < 0.6:
+        index = rng.randrange(len(paragraphs))
+        words = paragraphs[index].split()
+        for position in rng.sample(range(len(words)), rng.randint(1, 5)):
+            words[position] = rng.choice(vocabulary)
+        paragraphs[index] = " ".join(words)
+    elif kind < 0.8 or len(paragraphs) < 2:
+        paragraphs.insert(
+            rng.randrange(len(paragraphs) + 1), paragraph(rng, vocabulary)
+        )
+    else:
+        del paragraphs[rng.randrange(len(paragraphs))]
+    return "\n".join(paragraphs)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=5)
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--revisions", type=int, default=100)
+    parser.add_argument(
+        "--intervals", type=int, nargs="+", default=[1, 5, 10, 25]
+    )
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db.models import Sum
+    from django.db.models.functions import Length
+    from django.test.utils import override_settings
+
+    from newsApp import revisions
+    from newsApp.models import Article, ArticleRevision, CustomUser
+
+    rng = random.Random(1)
+    vocabulary = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+        for _ in range(5000)
+    ]
+    # The same edit sequence for every interval.
+    histories = []
+    for _ in range(args.articles):
+        content = "\n".join(
+            paragraph(rng, vocabulary) for _ in range(args.words // 80)
+        )
+        versions = [content]
+        for _ in range(args.revisions):
+            versions.append(edit(rng, vocabulary, versions[-1]))
+        histories.append(versions)
+    full_copies = sum(len(v.encode()) for h in histories for v in h)
+
+    rows = []
+    with test_database():
+        author = CustomUser.objects.create(
+            username="bench_journalist", role="journalist"
+        )
+        for interval in args.intervals:
+            ArticleRevision.objects.all().delete()
+            save_times, rebuild_times = [], []
+            with override_settings(REVISION_SNAPSHOT_INTERVAL=interval):
+                for versions in histories:
+                    article = Article(
+                        title="Long read", content=versions[0], author=author
+                    )
+                    article.save()
+                    for content in versions[1:]:
+                        article.content = content
+                        start = time.perf_counter()
+                        article.save()
+                        save_times.append(time.perf_counter() - start)
+                    for number, content in enumerate(versions, 1):
+                        start = time.perf_counter()
+                        rebuilt = revisions.content_at(article.pk, number)
+                        rebuild_times.append(time.perf_counter() - start)
+                        assert rebuilt == content, (interval, number)
+            stored = ArticleRevision.objects.aggregate(
+                total=Sum(Length("data"))
+            )["total"]
+            rows.append(
+                (
+                    interval,
+                    f"{stored / 1024:.0f}",
+                    f"{full_copies / stored:.1f}x",
+                    f"{statistics.median(save_times) * 1000:.1f}",
+                    f"{statistics.median(rebuild_times) * 1000:.2f}",
+                    f"{percentile(rebuild_times, 0.99) * 1000:.2f}",
+                    f"{max(rebuild_times) * 1000:.2f}",
+                )
+            )
+
+    print(
+        f"{args.articles} articles x {args.revisions + 1} revisions, "
+        f"{args.words} words each; full copies: {full_copies / 1024:.0f} KiB"
+    )
+    print_table(
+        (
+            "interval",
+            "stored KiB",
+            "saving",
+            "save ms",
+            "rebuild ms",
+            "rebuild p99",
+            "rebuild max",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
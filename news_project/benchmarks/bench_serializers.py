@@ -0,0 +1,87 @@
+"""
+Microbenchmark of the API list read path at 10k rows.
+
+Compares ArticleSerializer + JSONRenderer (the DRF default) with the
+values_list() fast path (ArticleValuesSerializer), rendered by the
+stdlib encoder and by FastJSONRenderer (orjson, when installed). Every
+variant's output is checked to be byte-identical to the default.
+
+    python benchmarks/bench_serializers.py [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+from unittest import mock
+
+from common import (
+    median_ms,
+    print_table,
+    seed_articles,
+    setup_django,
+    test_database,
+    timeit,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+
+    from newsApp import renderers
+    from newsApp.models import Article
+    from newsApp.renderers import FastJSONRenderer
+    from newsApp.serializers import ArticleSerializer, ArticleValuesSerializer
+
+    with test_database():
+        seed_articles(args.rows)
+        queryset = Article.objects.order_by("id")
+
+        def model_serializer():
+            data = ArticleSerializer(queryset.all(), many=True).data
+            return JSONRenderer().render(data)
+
+        def values_stdlib():
+            with mock.patch.object(renderers, "orjson", None):
+                data = ArticleValuesSerializer(queryset.all()).data
+                return FastJSONRenderer().render(data)
+
+        def values_fast():
+            data = ArticleValuesSerializer(queryset.all()).data
+            return FastJSONRenderer().render(data)
+
+        expected = model_serializer()
+        variants = [
+            ("ModelSerializer + JSONRenderer", model_serializer),
+            ("values_list + stdlib json", values_stdlib),
+            (
+                "values_list + "
+                + ("orjson" if renderers.orjson else "stdlib (no orjson)"),
+                values_fast,
+            ),
+        ]
+        rows = []
+        baseline = None
+        for name, func in variants:
+            identical = func() == expected
+            timings = timeit(func, args.repeat)
+            median = sorted(timings)[len(timings) // 2]
+            baseline = baseline or median
+            rows.append(
+                (
+                    name,
+                    median_ms(timings),
+                    f"{baseline / median:.1f}x",
+                    "yes" if identical else "NO",
+                )
+            )
+
+    print(f"{args.rows} rows, median of {args.repeat} runs")
+    print_table(("variant", "ms", "speed-up", "identical"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark of the queries a logged-in request makes before its view.
+
+A logged-in reader requests the dashboard (a login_required view)
+--requests times under three configurations, each followed by a flush
+of the session write-behind queue:
+
+* db: Django's database sessions and ModelBackend (the old setup),
+* cached_db: Django's cached_db sessions and ModelBackend,
+* cached: session_store.py and auth_cache.CachedModelBackend.
+
+Each request also saves the session once (a flash message, a cart,
+a "last seen" stamp), which the "writes" column counts. Reported per
+request: all queries, the session and user queries among them, and
+the time spent.
+
+    python benchmarks/bench_sessions.py [--requests 500]
+"""
+
+import argparse
+import time
+
+from common import print_table, setup_django, test_database
+
+CONFIGURATIONS = {
+    "db": (
+        "django.contrib.sessions.backends.db",
+        "django.contrib.auth.backends.ModelBackend",
+    ),
+    "cached_db": (
+        "django.contrib.sessions.backends.cached_db",
+        "django.contrib.auth.backends.ModelBackend",
+    ),
+    "cached": (
+        "newsApp.session_store",
+        "newsApp.auth_cache.CachedModelBackend",
+    ),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.urls import reverse
+
+    from newsApp import session_store
+    from newsApp.models import CustomUser
+
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        statements.append(sql)
+        return execute(sql, params, many, context)
+
+    rows = []
+    with test_database():
+        reader = CustomUser.objects.create_user(
+            username="bench_reader", password="Bench@12345", role="reader"
+        )
+        url = reverse("dashboard")
+        for name, (engine, backend) in CONFIGURATIONS.items():
+            with override_settings(
+                SESSION_ENGINE=engine, AUTHENTICATION_BACKENDS=[backend]
+            ):
+                cache.clear()
+                client = Client()
+                client.force_login(reader)
+                client.get(url)
+                session_store.write_behind.flush()
+                statements.clear()
+                with connection.execute_wrapper(record):
+                    start = time.perf_counter()
+                    for index in range(args.requests):
+                        response = client.get(url)
+                        assert response.status_code == 200
+                        session = client.session
+                        session["last_seen"] = index
+                        session.save()
+                    session_store.write_behind.flush()
+                    elapsed = time.perf_counter() - start
+
+            session_queries = [s for s in statements if "django_session" in s]
+            user_queries = [s for s in statements if "_customuser" in s]
+            writes = [
+                s
+                for s in session_queries
+                if s.lstrip().split(" ", 1)[0].upper() in ("INSERT", "UPDATE")
+            ]
+            rows.append(
+                (
+                    name,
+                    f"{len(statements) / args.requests:.2f}",
+                    f"{len(session_queries) / args.requests:.2f}",
+                    f"{len(user_queries) / args.requests:.2f}",
+                    len(writes),
+                    f"{elapsed / args.requests * 1000:.2f}",
+                )
+            )
+
+    print(f"{args.requests} logged-in dashboard requests")
+    print_table(
+        (
+            "variant",
+            "queries/req",
+            "session/req",
+            "user/req",
+            "writes",
+            "ms/req",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark of worker cold start: the time from a new interpreter to a
+served first request.
+
+Each scenario runs --runs times in a fresh process:
+
+* interpreter: python -c pass, the floor;
+* django.setup(): what every worker pays before serving;
+* first request: setup, then GET /login/ through the test client. That
+  request loads the URLconf (and with it DRF) and compiles templates;
+* warmed first request: setup, warmup.warm_up(), then the same request.
+  With WARMUP_ON_STARTUP the warm-up runs before the worker accepts
+  traffic.
+
+Median wall times are reported with the number of modules loaded and
+whether requests and NumPy were among them.
+
+    python benchmarks/bench_startup.py [--runs 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import PROJECT_DIR, print_table
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+phases = dict()
+if {setup!r}:
+    import django
+    django.setup()
+    phases["setup"] = time.perf_counter() - start
+if {warmup!r}:
+    from newsApp.warmup import warm_up
+    mark = time.perf_counter()
+    warm_up()
+    phases["warm-up"] = time.perf_counter() - mark
+if {request!r}:
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    mark = time.perf_counter()
+    assert Client().get("/login/").status_code == 200
+    phases["request"] = time.perf_counter() - mark
+phases["modules"] = len(sys.modules)
+phases["requests"] = "requests" in sys.modules
+phases["numpy"] = "numpy" in sys.modules
+print(json.dumps(phases))
+"""
+
+SCENARIOS = [
+    ("interpreter", dict(setup=False, warmup=False, request=False)),
+    ("django.setup()", dict(setup=True, warmup=False, request=False)),
+    ("first request", dict(setup=True, warmup=False, request=True)),
+    ("warmed first request", dict(setup=True, warmup=True, request=True)),
+]
+
+
+def run(options):
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "news_project.settings")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(**options)],
+        cwd=PROJECT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = time.perf_counter() - start
+    return total, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = []
+    for name, options in SCENARIOS:
+        results = [run(options) for _ in range(args.runs)]
+
+        def median_ms(key):
+            values = [phases[key] for _, phases in results if key in phases]
+            if not values:
+                return "-"
+            return f"{statistics.median(values) * 1000:.0f}"
+
+        phases = results[-1][1]
+        rows.append(
+            (
+                name,
+                f"{statistics.median(t for t, _ in results) * 1000:.0f}",
+                median_ms("setup"),
+                median_ms("warm-up"),
+                median_ms("request"),
+                phases["modules"],
+                "yes" if phases["requests"] else "no",
+                "yes" if phases["numpy"] else "no",
+            )
+        )
+
+    print(f"median of {args.runs} fresh processes, milliseconds")
+    print_table(
+        (
+            "scenario",
+            "process",
+            "setup",
+            "warm-up",
+            "request",
+            "modules",
+            "requests",
+            "numpy",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
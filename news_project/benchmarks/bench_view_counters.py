@@ -0,0 +1,134 @@
+"""
+Benchmark of article view counting: per-read UPDATEs vs ViewCounter.
+
+Replays the same Zipf-distributed reads over the seeded articles with
+two strategies and reports the write statements issued (write
+amplification), the time spent and the accuracy of the result:
+
+* naive: one bucket upsert and one "view_count + 1" UPDATE per read,
+* buffered: popularity.ViewCounter, flushed every --reads-per-flush
+  reads (the traffic of one VIEW_COUNT_FLUSH_SECONDS interval).
+
+Accuracy compares the stored view counts and the 24h top 10 with the
+true counts once everything is flushed; "at risk" is the most reads a
+crash could lose (those waiting in the buffer).
+
+    python benchmarks/bench_view_counters.py [--articles 1000]
+        [--reads 20000] [--reads-per-flush 2000]
+"""
+
+import argparse
+import random
+import time
+from collections import Counter
+
+from common import print_table, seed_articles, setup_django, test_database
+
+
+def zipf_reads(article_ids, count, exponent=1.1, seed=1):
+    weights = [1 / rank**exponent for rank in range(1, len(article_ids) + 1)]
+    return random.Random(seed).choices(article_ids, weights, k=count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=1000)
+    parser.add_argument("--reads", type=int, default=20_000)
+    parser.add_argument("--reads-per-flush", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.db.models import F
+
+    from newsApp import popularity
+    from newsApp.models import Article, ArticleViewBucket
+
+    writes = Counter()
+
+    def count_writes(execute, sql, params, many, context):
+        verb = sql.lstrip().split(" ", 1)[0].upper()
+        if verb in ("INSERT", "UPDATE", "DELETE"):
+            writes[verb] += 1
+        return execute(sql, params, many, context)
+
+    def naive(reads):
+        for article_id in reads:
+            hour = popularity.hour_of(popularity.timezone.now())
+            bucket, _ = ArticleViewBucket.objects.get_or_create(
+                article_id=article_id, hour=hour
+            )
+            ArticleViewBucket.objects.filter(pk=bucket.pk).update(
+                views=F("views") + 1
+            )
+            Article.objects.filter(pk=article_id).update(
+                view_count=F("view_count") + 1
+            )
+        return 0
+
+    def buffered(reads):
+        counter = popularity.ViewCounter()
+        at_risk = 0
+        for index, article_id in enumerate(reads, 1):
+            counter.record(article_id)
+            if index % args.reads_per_flush == 0:
+                at_risk = max(at_risk, sum(counter.pending.values()))
+                counter.flush()
+        at_risk = max(at_risk, sum(counter.pending.values()))
+        counter.flush()
+        return at_risk
+
+    with test_database():
+        seed_articles(args.articles)
+        article_ids = list(Article.objects.values_list("pk", flat=True))
+        reads = zipf_reads(article_ids, args.reads)
+        truth = Counter(reads)
+        true_top = [pk for pk, _ in truth.most_common(10)]
+
+        rows = []
+        for name, func in (("naive", naive), ("buffered", buffered)):
+            Article.objects.update(view_count=0)
+            ArticleViewBucket.objects.all().delete()
+            writes.clear()
+            with connection.execute_wrapper(count_writes):
+                start = time.perf_counter()
+                at_risk = func(reads)
+                elapsed = time.perf_counter() - start
+            stored = dict(Article.objects.values_list("pk", "view_count"))
+            exact = sum(stored[pk] == truth.get(pk, 0) for pk in stored)
+            top = [pk for pk, _ in popularity.rank("24h", 10)]
+            statements = sum(writes.values())
+            rows.append(
+                (
+                    name,
+                    statements,
+                    f"{statements / args.reads:.4f}",
+                    f"{elapsed * 1000:.0f}",
+                    f"{elapsed / args.reads * 1e6:.1f}",
+                    f"{exact}/{len(stored)}",
+                    "yes" if top == true_top else "NO",
+                    at_risk,
+                )
+            )
+
+    print(
+        f"{args.reads} reads over {args.articles} articles, "
+        f"flush every {args.reads_per_flush} reads"
+    )
+    print_table(
+        (
+            "variant",
+            "writes",
+            "writes/read",
+            "ms",
+            "us/read",
+            "exact counts",
+            "top 10",
+            "at risk",
+        ),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
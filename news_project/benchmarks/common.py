@@ -0,0 +1,119 @@
+"""
+Shared helpers for the benchmark scripts in this folder.
+
+Run the scripts from the news_project directory, for example:
+
+    python benchmarks/bench_asgi_wsgi.py
+
+They use DJANGO_SETTINGS_MODULE (news_project.settings by default),
+so point it at another settings module to benchmark against SQLite.
+Microbenchmarks run inside a throwaway test database; the server
+benchmarks seed the configured database because the servers run in
+their own processes.
+"""
+
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    if str(PROJECT_DIR) not in sys.path:
+        sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "news_project.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Create the test database for the duration of a benchmark."""
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment,
+        teardown_test_environment,
+    )
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_articles(count, content_words=120):
+    """Create a journalist, a reader, categories and approved articles."""
+    from newsApp.models import Article, Category, CustomUser, Publisher
+
+    journalist, _ = CustomUser.objects.get_or_create(
+        username="bench_journalist", defaults={"role": "journalist"}
+    )
+    reader, _ = CustomUser.objects.get_or_create(
+        username="bench_reader", defaults={"role": "reader"}
+    )
+    reader.set_password("Bench@12345")
+    reader.save()
+    publisher, _ = Publisher.objects.get_or_create(name="Bench Publisher")
+    reader.subscriptions_publishers.add(publisher)
+    categories = [
+        Category.objects.get_or_create(
+            slug=slug, defaults={"name": slug.title()}
+        )[0]
+        for slug in ("news", "tech", "sport", "business")
+    ]
+    words = (
+        "lorem ipsum dolor sit amet consectetur adipiscing elit " * 20
+    ).split()
+    Article.objects.bulk_create(
+        Article(
+            title=f"Benchmark article {index}",
+            content=" ".join(words[:content_words]) + f" {index}",
+            author=journalist,
+            publisher=publisher,
+            category=categories[index % len(categories)],
+            status="approved",
+        )
+        for index in range(count)
+    )
+    return journalist, reader
+
+
+def timeit(func, repeat=5):
+    """Run func repeat times and return the timings in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_table(headers, rows):
+    widths = [
+        max(len(str(value)) for value in column)
+        for column in zip(headers, *rows)
+    ]
+    line = "  ".join(f"{{:>{width}}}" for width in widths)
+    print(line.format(*headers))
+    for row in rows:
+        print(line.format(*row))
+
+
+def median_ms(timings):
+    return f"{statistics.median(timings) * 1000:.2f}"
@@ -1,20 +1,234 @@
 """
 This file is used to register the models with the Django admin site.
 A custom admin is created for the CustomUser model.
+
+The admins are built for large tables:
+
+* Unfiltered changelists of tables with more than
+  ADMIN_ESTIMATED_COUNT_THRESHOLD rows show the database's row
+  estimate instead of running COUNT(*) (EstimatedCountPaginator).
+  Filter facets and the "N total" full count are switched off.
+* List filters only use indexed columns (the user filters included,
+  see CustomUser.Meta), and changelists select the related rows they
+  show in the same query.
+* Foreign keys and many-to-many fields use autocomplete widgets, so a
+  change form never renders every user or publisher.
+* Only editors may bulk-approve articles, as in the approval view.
+* The bulk approve and soft-delete actions on articles run as single
+  UPDATE statements. UPDATEs send no signals, so the actions drop the
+  cached articles, publisher stats and reader feeds themselves (see
+  article_cache.py, publisher_stats.py and feed_cache.py), and log the
+  approvals and schedule their announcements (announcements.py).
 """
 
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import (
+    announcements,
+    article_cache,
+    feed_cache,
+    live_feed,
+    publisher_stats,
+    review_queue,
+)
 from .models import CustomUser, Publisher, Article, Newsletter, Category
 
 
-class CustomUserAdmin(UserAdmin):
+def estimated_count(model, using):
+    """
+    The row count of model's table from the database's statistics, or
+    None where there are none (SQLite, a table never analysed).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = to_regclass(%s)",
+                [connection.ops.quote_name(table)],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts unfiltered lists of large tables from the table statistics.
+    Small tables and filtered lists get an exact COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            threshold = getattr(
+                settings, "ADMIN_ESTIMATED_COUNT_THRESHOLD", 10000
+            )
+            if estimate is not None and estimate > threshold:
+                return estimate
+        return super().count
+
+
+class LargeTableAdminMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+
+class CustomUserAdmin(LargeTableAdminMixin, UserAdmin):
     model = CustomUser
     list_display = ["username", "email", "role", "is_staff"]
+    list_filter = ["role", "is_staff", "is_active"]
+    # username is unique, so a prefix search uses its index.
+    search_fields = ["^username"]
+    fieldsets = UserAdmin.fieldsets + (
+        (
+            "News",
+            {
+                "fields": (
+                    "role",
+                    "subscriptions_publishers",
+                    "subscriptions_journalists",
+                )
+            },
+        ),
+    )
+    autocomplete_fields = [
+        "subscriptions_publishers",
+        "subscriptions_journalists",
+    ]
+
+
+@admin.register(Publisher)
+class PublisherAdmin(admin.ModelAdmin):
+    search_fields = ["name"]
+    autocomplete_fields = ["editors", "journalists"]
+
+
+@admin.register(Article)
+class ArticleAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = [
+        "title",
+        "author",
+        "publisher",
+        "category",
+        "status",
+        "is_deleted",
+        "created_at",
+    ]
+    list_filter = ["status", "is_deleted", "category"]
+    list_select_related = ["author", "publisher", "category"]
+    autocomplete_fields = [
+        "author",
+        "publisher",
+        "category",
+        "approved_by",
+        "claimed_by",
+    ]
+    actions = ["approve_selected", "soft_delete_selected"]
+
+    def has_approve_permission(self, request):
+        return request.user.role == "editor" and self.has_change_permission(
+            request
+        )
+
+    @admin.action(
+        description="Approve selected pending articles",
+        permissions=["approve"],
+    )
+    def approve_selected(self, request, queryset):
+        # Articles another editor holds a review claim on are skipped.
+        with transaction.atomic():
+            rows = list(
+                review_queue.decidable(request.user)
+                .filter(pk__in=queryset.values("pk"))
+                .select_for_update()
+                .values_list("pk", "publisher_id", "author_id")
+            )
+            ids = [pk for pk, _, _ in rows]
+            publisher_ids = [publisher_id for _, publisher_id, _ in rows]
+            Article.objects.filter(pk__in=ids).update(
+                status="approved",
+                approved_by=request.user,
+                claimed_by=None,
+                claim_expires_at=None,
+                updated_at=timezone.now(),
+            )
+            article_cache.invalidate(*ids)
+            publisher_stats.invalidate("articles", *publisher_ids)
+            feed_cache.invalidate(
+                publisher_ids=publisher_ids,
+                journalist_ids=[author_id for _, _, author_id in rows],
+            )
+            live_feed.record_approvals(ids)
+            announcements.schedule(ids)
+        self.message_user(
+            request, f"{len(ids)} articles approved.", messages.SUCCESS
+        )
+
+    @admin.action(
+        description="Soft-delete selected articles", permissions=["change"]
+    )
+    def soft_delete_selected(self, request, queryset):
+        with transaction.atomic():
+            rows = list(
+                queryset.filter(is_deleted=False).values_list(
+                    "pk", "publisher_id", "author_id", "status"
+                )
+            )
+            ids = [pk for pk, _, _, _ in rows]
+            Article.objects.filter(pk__in=ids).update(
+                is_deleted=True, updated_at=timezone.now()
+            )
+            article_cache.invalidate(*ids)
+            approved = [row for row in rows if row[3] == "approved"]
+            publisher_stats.invalidate(
+                "articles",
+                *[publisher_id for _, publisher_id, _, _ in approved],
+            )
+            feed_cache.invalidate(
+                publisher_ids=[
+                    publisher_id for _, publisher_id, _, _ in approved
+                ],
+                journalist_ids=[author_id for _, _, author_id, _ in approved],
+            )
+            if approved:
+                # Drops their approvals from the live feed's buffer.
+                transaction.on_commit(live_feed.hub.notify)
+        self.message_user(
+            request, f"{len(ids)} articles deleted.", messages.SUCCESS
+        )
+
+
+@admin.register(Newsletter)
+class NewsletterAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ["title", "journalist", "publisher", "approved"]
+    list_select_related = ["journalist", "publisher"]
+    autocomplete_fields = ["journalist", "publisher"]
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ["name", "slug"]
+    search_fields = ["name"]
 
 
 admin.site.register(CustomUser, CustomUserAdmin)
-admin.site.register(Publisher)
-admin.site.register(Article)
-admin.site.register(Newsletter)
-admin.site.register(Category)
@@ -0,0 +1,100 @@
+"""
+This file announces approved articles, off the request path: it
+e-mails the subscribers (notifications.py) and posts to X
+(functions/tweet.py).
+
+An approval is logged as an ApprovalEvent in the approving
+transaction (see live_feed.record_approvals()), and schedule() is
+called alongside. Once the transaction commits, the announcements are
+handed to a pool of ANNOUNCEMENT_WORKERS threads. Sending mail is
+I/O-bound and rate-limited (mailer.py), so threads suffice, and the
+approving request neither waits on the SMTP server nor holds the
+article's row lock while it does. A rolled-back approval is never
+announced.
+
+announce() claims the event by setting ApprovalEvent.announced_at
+before sending, so an approval is announced at most once, however many
+workers or commands try. Approvals left unannounced by a worker that
+stopped are sent by "python manage.py send_announcements".
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .functions.tweet import post_tweet
+from .models import ApprovalEvent, Article
+from .notifications import notify_subscribers
+
+logger = logging.getLogger("newsApp.announcements")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def workers():
+    return getattr(settings, "ANNOUNCEMENT_WORKERS", 2)
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=workers(), thread_name_prefix="announcements"
+            )
+    return _executor
+
+
+def announce(article_id):
+    """
+    Mail the subscribers of an approved article and post it to X,
+    unless its approval was already announced. Returns whether it was.
+    """
+    claimed = ApprovalEvent.objects.filter(
+        article_id=article_id, announced_at__isnull=True
+    ).update(announced_at=timezone.now())
+    if not claimed:
+        return False
+    article = (
+        Article.objects.select_related("author")
+        .filter(pk=article_id, status="approved", is_deleted=False)
+        .first()
+    )
+    if article is None:
+        # Withdrawn before it could be announced.
+        return False
+    notify_subscribers(article)
+    post_tweet(article)
+    return True
+
+
+def _announce_all(article_ids):
+    # Runs on a pool thread, which has its own connections.
+    try:
+        for article_id in article_ids:
+            try:
+                announce(article_id)
+            except Exception:
+                logger.exception("Announcing article %s failed", article_id)
+    finally:
+        connections.close_all()
+
+
+def submit(article_ids):
+    """Announce in the worker pool (inline with no workers)."""
+    if not workers():
+        for article_id in article_ids:
+            announce(article_id)
+        return None
+    return executor().submit(_announce_all, article_ids)
+
+
+def schedule(article_ids):
+    """Announce these approvals once the current transaction commits."""
+    transaction.on_commit(partial(submit, list(article_ids)))
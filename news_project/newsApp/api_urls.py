@@ -11,15 +11,46 @@ satisfaction.
 
 """
 
+from django.conf import settings
 from django.urls import path
-from . import api_views
-from .api_views import ArticleListCreateAPI
+from . import async_views
+from .api_views import (
+    ArticleChangesAPI,
+    ArticleListCreateAPI,
+    MostReadAPI,
+    PublisherStatsAPI,
+)
+
+if settings.ASYNC_VIEWS:
+    article_list_view = async_views.api_article_list
+else:
+    article_list_view = ArticleListCreateAPI.as_view()
 
 
 urlpatterns = [
     path(
         "articles/",
-        api_views.ArticleListCreateAPI.as_view(),
+        article_list_view,
         name="api_article_list"
     ),
+    path(
+        "articles/changes/",
+        ArticleChangesAPI.as_view(),
+        name="api_article_changes",
+    ),
+    path(
+        "articles/live/",
+        async_views.article_live,
+        name="api_article_live",
+    ),
+    path(
+        "articles/most-read/",
+        MostReadAPI.as_view(),
+        name="api_most_read",
+    ),
+    path(
+        "publishers/<int:pk>/",
+        PublisherStatsAPI.as_view(),
+        name="api_publisher_stats",
+    ),
 ]
@@ -2,38 +2,195 @@
 Defines RESTful API views using Django REST Framework.
 For example, the ArticleListAPI view returns articles filtered by
 the reader’s subscriptions if the logged-in user is a reader.
+
+Views using FastReadMixin can set read_serializer_class to serve list
+requests from .values_list() rows (see ArticleValuesSerializer), and
+FastJSONRenderer encodes with orjson when it is installed. Both give
+byte-identical responses to the standard ModelSerializer path.
+
+MostReadAPI serves the cached "most read" ranking from popularity.py,
+and PublisherStatsAPI the cached publisher stats of publisher_stats.py.
+ArticleChangesAPI is the incremental sync of delta_sync.py.
+
+ArticleListCreateAPI also accepts a list of articles, created in one
+batch (see serializers.ArticleListSerializer), and honours the
+Idempotency-Key header of idempotency.py. Its reader feeds are served
+from the shared cache of feed_cache.py.
 """
 
+from django.conf import settings
 from rest_framework import generics, permissions
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from . import (
+    auth_cache,
+    delta_sync,
+    feed_cache,
+    popularity,
+    publisher_stats,
+)
+from .idempotency import IdempotentCreateMixin
 from .models import Article
-from .serializers import ArticleSerializer
-from django.db import models
+from .renderers import FastJSONRenderer
+from .serializers import ArticleSerializer, ArticleValuesSerializer
+from .throttling import RoleScopedThrottle
+from django.db import models, router
+
+
+def article_feed(user):
+    """
+    Approved articles visible to the user through the API. Readers only
+    get articles from the publishers and journalists they follow.
+    Soft-deleted articles are left out, as /changes/ sends them as
+    tombstones. Shared with the async API view in async_views.py.
+    """
+    if user.role == "reader":
+        # Cached with request.user by auth_cache.
+        return reader_articles(*auth_cache.subscription_ids(user))
+    return Article.objects.filter(status="approved", is_deleted=False)
+
+
+def reader_articles(publisher_ids, journalist_ids):
+    """Approved, not deleted articles of these publishers and journalists."""
+    return (
+        Article.objects.filter(status="approved", is_deleted=False)
+        .filter(
+            models.Q(publisher__id__in=publisher_ids)
+            | models.Q(author__id__in=journalist_ids)
+        )
+        .distinct()
+    )
+
 
+def reader_feed_data(publisher_ids, journalist_ids):
+    """The API list data of a reader feed, as cached by feed_cache."""
+    # Read from the primary, like the other cache fills: a lagging
+    # replica would store the feed as it was before the change that
+    # bumped the generation tokens.
+    return ArticleValuesSerializer(
+        reader_articles(publisher_ids, journalist_ids).using(
+            router.db_for_write(Article)
+        )
+    ).data
 
-class ArticleListCreateAPI(generics.ListCreateAPIView):
+
+class FastReadMixin:
+    """
+    Serves list() with read_serializer_class when it is set. The read
+    serializer takes the queryset and returns the response data. Paged
+    lists keep the normal serializer.
+    """
+
+    read_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.read_serializer_class is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.read_serializer_class(queryset).data)
+
+
+class ArticleListCreateAPI(
+    IdempotentCreateMixin, FastReadMixin, generics.ListCreateAPIView
+):
     queryset = Article.objects.all()  # or filter by role if needed
     serializer_class = ArticleSerializer
+    read_serializer_class = ArticleValuesSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [RoleScopedThrottle]
+    throttle_scope = "articles"
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == "reader":
-            publisher_ids = user.subscriptions_publishers.values_list(
-                "id", flat=True
-            )
-            journalist_ids = user.subscriptions_journalists.values_list(
-                "id", flat=True
+        return article_feed(self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        if request.user.role == "reader" and self.paginator is None:
+            # Shared by every reader with the same subscriptions.
+            return Response(
+                feed_cache.reader_feed(request.user, reader_feed_data)
             )
-            return (
-                Article.objects.filter(status="approved")
-                .filter(
-                    models.Q(publisher__id__in=publisher_ids)
-                    | models.Q(author__id__in=journalist_ids)
-                )
-                .distinct()
+        return super().list(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        if isinstance(kwargs.get("data"), list):
+            # A batch: each item is validated, the whole batch is refused
+            # if one fails, and otherwise inserted by one bulk_create()
+            # (see serializers.ArticleListSerializer).
+            kwargs.update(
+                many=True,
+                allow_empty=False,
+                max_length=getattr(settings, "ARTICLE_BULK_CREATE_MAX", 500),
             )
-        return Article.objects.filter(status="approved")
+        return super().get_serializer(*args, **kwargs)
 
     def perform_create(self, serializer):
         # Automatically set the author to the current user
         serializer.save(author=self.request.user)
+
+
+class MostReadAPI(APIView):
+    """
+    The most read approved articles, most read first, with their number
+    of views in the period: ?period=24h (the default) or 7d.
+    """
+
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        period = request.query_params.get("period", "24h")
+        if period not in popularity.PERIODS:
+            choices = ", ".join(popularity.PERIODS)
+            raise ValidationError({"period": [f"Choose one of: {choices}."]})
+        ranking = popularity.most_read(period)
+        rows = ArticleValuesSerializer(
+            Article.objects.filter(pk__in=[pk for pk, _ in ranking])
+        ).data
+        by_id = {row["id"]: row for row in rows}
+        return Response(
+            [
+                {**by_id[article_id], "views": views}
+                for article_id, views in ranking
+                if article_id in by_id
+            ]
+        )
+
+
+class PublisherStatsAPI(APIView):
+    """
+    A publisher's profile and roster, subscriber count, approved
+    articles per category and latest approved articles.
+    """
+
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        stats = publisher_stats.get(pk)
+        if stats is None:
+            raise NotFound("No such publisher.")
+        return Response(stats)
+
+
+class ArticleChangesAPI(APIView):
+    """
+    The articles of the user's feed changed since ?since=<token>, with
+    tombstones for the ones removed from it (see delta_sync.py).
+    """
+
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [RoleScopedThrottle]
+    # Clients poll this on their own schedule; its budget is separate
+    # from the list's.
+    throttle_scope = "article_changes"
+
+    def get(self, request):
+        since = request.query_params.get("since") or None
+        try:
+            return Response(delta_sync.changes(request.user, since))
+        except delta_sync.InvalidToken:
+            raise ValidationError({"since": ["Invalid sync token."]})
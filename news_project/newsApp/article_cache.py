@@ -0,0 +1,231 @@
+"""
+This file is the cache-aside layer of the article detail page.
+
+get(pk) returns a compact record of an article: its own columns, the
+names of its author, category and publisher, and its image variants.
+The record is a plain dict, small to pickle. The views check
+visibility against it, and to_article() turns it back into an unsaved
+Article whose author, category and publisher are set, so the template
+makes no further queries.
+
+Keys are versioned. Each article has a version token under
+"article_version:<pk>", and its record is stored under
+"article:<RECORD_FORMAT>:<pk>:<token>". invalidate() replaces the
+token, which orphans the old record, so nothing has to be deleted. A
+reader that loaded the old row just before a write stores it under the
+old token, where no one looks any more. The token is replaced when the
+write happens and again when its transaction commits, so a read
+between the two cannot keep stale data alive. This holds because
+records are loaded from the primary: a replica still behind the commit
+would hand out the old row under the new token. Raise RECORD_FORMAT
+when the record's shape changes.
+
+Every write path that changes what the record holds calls
+invalidate(). signals.py covers Article saves and deletes, and renames
+of the author, category or publisher. thumbnails.py covers new image
+variants. Queryset update() calls must call it themselves.
+
+Misses are coalesced. The first request to miss takes a short fill
+lock with cache.add(), reads the database and stores the record.
+Concurrent misses for the same key poll the cache meanwhile, for up to
+FILL_WAIT seconds, so a breaking story that has just been edited costs
+one database read, not one per request. With a shared cache backend
+(Redis, Memcached) this holds across workers. A missing article is
+cached too, as an empty record, so repeated 404s do not reach the
+database.
+"""
+
+import asyncio
+import time
+import uuid
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import (
+    Article,
+    ArticleImageVariant,
+    Category,
+    CustomUser,
+    Publisher,
+)
+
+RECORD_FORMAT = 1
+FILL_LOCK_SECONDS = 5
+FILL_WAIT = 0.5
+POLL_INTERVAL = 0.005
+
+FIELDS = (
+    "id",
+    "title",
+    "content",
+    "status",
+    "is_deleted",
+    "image",
+    "created_at",
+    "updated_at",
+    "author_id",
+    "author__username",
+    "author__role",
+    "category_id",
+    "category__name",
+    "category__slug",
+    "publisher_id",
+    "publisher__name",
+)
+VARIANT_FIELDS = ("source", "format", "width", "height", "file")
+
+
+def _timeout():
+    return getattr(settings, "ARTICLE_CACHE_SECONDS", 300)
+
+
+def _version_key(pk):
+    return f"article_version:{pk}"
+
+
+def _version(pk):
+    key = _version_key(pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+async def _aversion(pk):
+    key = _version_key(pk)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, None)
+        version = await cache.aget(key)
+    return version
+
+
+def _key(pk, version):
+    return f"article:{RECORD_FORMAT}:{pk}:{version}"
+
+
+def load(pk):
+    """The record of article pk from the database ({} if it is missing)."""
+    # The record is stored under the current token, so it is read from
+    # the primary: a lagging replica could still return the old row.
+    alias = router.db_for_write(Article)
+    record = (
+        Article.objects.db_manager(alias).filter(pk=pk).values(*FIELDS).first()
+    )
+    if record is None:
+        return {}
+    record["image_variants"] = list(
+        ArticleImageVariant.objects.db_manager(alias)
+        .filter(article_id=pk)
+        .values(*VARIANT_FIELDS)
+    )
+    return record
+
+
+def get(pk):
+    """The cached record of article pk, or None if it does not exist."""
+    key = _key(pk, _version(pk))
+    record = cache.get(key)
+    if record is None:
+        deadline = time.monotonic() + FILL_WAIT
+        locked = cache.add(f"{key}:fill", 1, FILL_LOCK_SECONDS)
+        while not locked:
+            # Another request is loading it.
+            time.sleep(POLL_INTERVAL)
+            record = cache.get(key)
+            if record is not None or time.monotonic() > deadline:
+                break
+            locked = cache.add(f"{key}:fill", 1, FILL_LOCK_SECONDS)
+        if record is None:
+            try:
+                record = load(pk)
+                cache.set(key, record, _timeout())
+            finally:
+                # A request that gave up waiting must not release the
+                # lock of the one still loading.
+                if locked:
+                    cache.delete(f"{key}:fill")
+    return record or None
+
+
+async def aget(pk):
+    """get() for async views: waiting on a fill does not block a thread."""
+    key = _key(pk, await _aversion(pk))
+    record = await cache.aget(key)
+    if record is None:
+        deadline = time.monotonic() + FILL_WAIT
+        locked = await cache.aadd(f"{key}:fill", 1, FILL_LOCK_SECONDS)
+        while not locked:
+            await asyncio.sleep(POLL_INTERVAL)
+            record = await cache.aget(key)
+            if record is not None or time.monotonic() > deadline:
+                break
+            locked = await cache.aadd(f"{key}:fill", 1, FILL_LOCK_SECONDS)
+        if record is None:
+            try:
+                record = await sync_to_async(load)(pk)
+                await cache.aset(key, record, _timeout())
+            finally:
+                if locked:
+                    await cache.adelete(f"{key}:fill")
+    return record or None
+
+
+def _bump(pks):
+    cache.set_many(
+        {_version_key(pk): uuid.uuid4().hex for pk in pks}, timeout=None
+    )
+
+
+def invalidate(*pks):
+    """Drop the cached records of these articles, now and on commit."""
+    if pks:
+        _bump(pks)
+        transaction.on_commit(partial(_bump, pks))
+
+
+def visible(record, user):
+    """Whether user may look the article up (a 404 otherwise)."""
+    if record is None or record["is_deleted"]:
+        return False
+    return user.role in ("editor", "journalist") or (
+        record["status"] == "approved"
+    )
+
+
+def to_article(record):
+    """An unsaved Article with its author, category and publisher set."""
+    article = Article(
+        **{
+            field: record[field]
+            for field in FIELDS
+            if "__" not in field and field != "image"
+        },
+        image=record["image"] or "",
+    )
+    article.author = CustomUser(
+        id=record["author_id"],
+        username=record["author__username"],
+        role=record["author__role"],
+    )
+    if record["category_id"] is not None:
+        article.category = Category(
+            id=record["category_id"],
+            name=record["category__name"],
+            slug=record["category__slug"],
+        )
+    if record["publisher_id"] is not None:
+        article.publisher = Publisher(
+            id=record["publisher_id"], name=record["publisher__name"]
+        )
+    # Read by thumbnails.picture() instead of querying the variants.
+    article.cached_image_variants = [
+        ArticleImageVariant(article_id=record["id"], **variant)
+        for variant in record["image_variants"]
+    ]
+    return article
@@ -0,0 +1,214 @@
+"""
+Contains native async versions of the hot read views: article_list,
+homepage, category_articles, article_detail and the API article list,
+and the live feed of approvals (live_feed.py), which is async only
+and answers 501 to requests that come through WSGI.
+
+They are wired up by urls.py and api_urls.py when ASYNC_VIEWS is on,
+which news_project/asgi.py does for the ASGI deployment. Under ASGI a
+request waiting on MySQL then no longer ties up a worker thread.
+
+The views use Django's async ORM. Independent queries (for example
+the category menu and the articles of a page) are started together
+with asyncio.gather(). Django still runs the database calls of one
+request on a single thread, so gathering does not open extra
+connections; it lets the event loop serve other requests meanwhile.
+
+Templates are rendered on that same thread (sync_to_async), because
+the context processors and templates still touch lazy relations.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    StreamingHttpResponse,
+)
+from django.shortcuts import aget_object_or_404, render
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import Throttled
+
+from . import article_cache, feed_cache, live_feed
+from .api_views import ArticleListCreateAPI, article_feed, reader_feed_data
+from .models import Article, Category
+from .popularity import acount_view
+from .renderers import FastJSONRenderer
+from .serializers import ArticleValuesSerializer
+from .throttling import RoleScopedThrottle
+
+_sync_api_view = ArticleListCreateAPI.as_view()
+
+
+def _approved_articles():
+    return (
+        Article.objects.filter(status="approved", is_deleted=False)
+        .select_related("author", "category")
+        .order_by("-created_at")
+    )
+
+
+async def _fetch(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _categories():
+    # Replaces the lazy queryset from the news_categories context processor.
+    return await _fetch(Category.objects.all())
+
+
+async def _render(request, template_name, context):
+    # Resolve the user once, so templates do not load it again.
+    request.user = await request.auser()
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def article_list(request):
+    articles, categories = await asyncio.gather(
+        _fetch(_approved_articles()), _categories()
+    )
+    return await _render(
+        request,
+        "newsApp/article_list.html",
+        {"articles": articles, "categories": categories},
+    )
+
+
+@login_required
+async def homepage(request):
+    articles, categories = await asyncio.gather(
+        _fetch(_approved_articles().prefetch_related("image_variants")),
+        _categories(),
+    )
+    return await _render(
+        request,
+        "newsApp/homepage.html",
+        {"articles": articles, "categories": categories},
+    )
+
+
+async def category_articles(request, slug):
+    # The articles are filtered on the slug, so they need not wait for
+    # the category lookup.
+    category, articles, categories = await asyncio.gather(
+        aget_object_or_404(Category, slug=slug),
+        _fetch(
+            Article.objects.filter(
+                category__slug=slug, status="approved", is_deleted=False
+            ).select_related("author")
+        ),
+        _categories(),
+    )
+    return await _render(
+        request,
+        "newsApp/category_articles.html",
+        {"category": category, "articles": articles, "categories": categories},
+    )
+
+
+@login_required
+async def article_detail(request, pk):
+    user = await request.auser()
+    # The related articles only need the pk, so they are fetched
+    # alongside the cached article record (see article_cache.py).
+    record, categories, related = await asyncio.gather(
+        article_cache.aget(pk),
+        _categories(),
+        _fetch(Article(pk=pk).related_articles()),
+    )
+    if not article_cache.visible(record, user):
+        # Readers see only approved articles.
+        raise Http404("No Article matches the given query.")
+
+    if (
+        user.role == "journalist"
+        and record["author_id"] != user.pk
+        and record["status"] != "approved"
+    ):
+        # Prevent journalists from viewing others' unapproved articles.
+        return HttpResponseForbidden(
+            "You are not allowed to view this article."
+        )
+    article = article_cache.to_article(record)
+
+    if article.status == "approved":
+        await acount_view(article.pk)
+    return await _render(
+        request,
+        "newsApp/article_detail.html",
+        {
+            "article": article,
+            "categories": categories,
+            "related_articles": related,
+        },
+    )
+
+
+@csrf_exempt
+async def api_article_list(request):
+    """
+    Async GET path of ArticleListCreateAPI for session-authenticated
+    JSON clients. Everything else (POST, Basic auth, the browsable API,
+    unauthenticated requests) is handed to the DRF view.
+    """
+    user = await request.auser()
+    if (
+        request.method != "GET"
+        or not user.is_authenticated
+        or "text/html" in request.headers.get("Accept", "")
+    ):
+        return await sync_to_async(_sync_api_view)(request)
+
+    # Same budget as the DRF view.
+    throttle = RoleScopedThrottle()
+    allowed = await sync_to_async(throttle.check)(
+        ArticleListCreateAPI.throttle_scope,
+        user.role,
+        "list",
+        throttle.get_ident_for(user),
+    )
+    if not allowed:
+        exc = Throttled(throttle.wait())
+        response = HttpResponse(
+            FastJSONRenderer().render({"detail": exc.detail}),
+            content_type="application/json",
+            status=exc.status_code,
+        )
+        response["Retry-After"] = str(throttle.wait())
+        return response
+
+    if user.role == "reader":
+        # The shared feed cache of the DRF view (see feed_cache.py).
+        data = await sync_to_async(feed_cache.reader_feed)(
+            user, reader_feed_data
+        )
+    else:
+        rows = await _fetch(ArticleValuesSerializer(article_feed(user)).rows())
+        data = ArticleValuesSerializer.to_representation(rows)
+    return HttpResponse(
+        FastJSONRenderer().render(data), content_type="application/json"
+    )
+
+
+async def article_live(request):
+    """Newly approved articles as Server-Sent Events (see live_feed.py)."""
+    if isinstance(request, WSGIRequest):
+        return HttpResponse(
+            "The live feed is only served by the ASGI application.",
+            status=501,
+        )
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponseForbidden("Log in to follow the live feed.")
+    response = StreamingHttpResponse(
+        live_feed.stream(user, live_feed.last_event_id(request)),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
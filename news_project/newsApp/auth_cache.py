@@ -0,0 +1,147 @@
+"""
+This file caches the logged-in user of each request.
+
+Django's AuthenticationMiddleware loads request.user with one SELECT
+on every request, and login_required and the role checks in views.py
+need that row before the view starts. CachedModelBackend (the
+AUTHENTICATION_BACKENDS entry) answers get_user() from a record cached
+for AUTH_USER_CACHE_SECONDS instead: the user's columns and the IDs of
+the publishers and journalists a reader follows. Together with the
+opt-in write-behind session engine (session_store.py) a logged-in
+request reaches its view without a query.
+
+The record holds the password hash, so the session check that logs
+out other sessions after a password change still works. It is
+rebuilt with CustomUser.from_db(), so the user behaves like one
+loaded from the database.
+
+Records are dropped on logout, on every save or delete of the user
+(role, password, is_active and last_login changes included) and when
+the user's subscriptions change; signals.py connects those. The short
+timeout bounds anything else, such as queryset update() calls.
+Records are loaded from the primary, so a fill that follows a change
+sees it even when reads go to a lagging replica. Raise RECORD_FORMAT
+when the record's shape changes.
+"""
+
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import CustomUser
+
+RECORD_FORMAT = 1
+
+FIELDS = tuple(field.attname for field in CustomUser._meta.concrete_fields)
+PublisherSubscription = CustomUser.subscriptions_publishers.through
+JournalistSubscription = CustomUser.subscriptions_journalists.through
+
+
+def _timeout():
+    return getattr(settings, "AUTH_USER_CACHE_SECONDS", 60)
+
+
+def _key(user_id):
+    return f"auth_user:{RECORD_FORMAT}:{user_id}"
+
+
+def load(user_id):
+    """The record of user_id from the database ({} if it is missing)."""
+    # Read from the primary: a record filled from a lagging replica
+    # right after a password, role or subscription change would keep
+    # the old values for AUTH_USER_CACHE_SECONDS.
+    alias = router.db_for_write(CustomUser)
+    row = (
+        CustomUser.objects.db_manager(alias)
+        .filter(pk=user_id)
+        .values_list(*FIELDS)
+        .first()
+    )
+    if row is None:
+        return {}
+    return {
+        "row": row,
+        "publisher_ids": list(
+            PublisherSubscription.objects.db_manager(alias)
+            .filter(customuser_id=user_id)
+            .values_list("publisher_id", flat=True)
+        ),
+        "journalist_ids": list(
+            JournalistSubscription.objects.db_manager(alias)
+            .filter(from_customuser_id=user_id)
+            .values_list("to_customuser_id", flat=True)
+        ),
+    }
+
+
+def to_user(record):
+    """The CustomUser of a record, carrying its subscription IDs."""
+    user = CustomUser.from_db(
+        router.db_for_read(CustomUser), FIELDS, record["row"]
+    )
+    # Read by subscription_ids() instead of querying.
+    user.cached_subscription_ids = (
+        record["publisher_ids"],
+        record["journalist_ids"],
+    )
+    return user
+
+
+def get(user_id):
+    """The user with pk user_id, from the cache when possible, or None."""
+    key = _key(user_id)
+    record = cache.get(key)
+    if record is None:
+        record = load(user_id)
+        cache.set(key, record, _timeout())
+    return to_user(record) if record else None
+
+
+async def aget(user_id):
+    key = _key(user_id)
+    record = await cache.aget(key)
+    if record is None:
+        record = await sync_to_async(load)(user_id)
+        await cache.aset(key, record, _timeout())
+    return to_user(record) if record else None
+
+
+def _delete(user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids])
+
+
+def invalidate(*user_ids):
+    """Drop the cached records of these users, now and on commit."""
+    if user_ids:
+        _delete(user_ids)
+        transaction.on_commit(partial(_delete, user_ids))
+
+
+def subscription_ids(user):
+    """
+    The IDs of the publishers and journalists that the user follows:
+    lists for a cached user, lazy subqueries for any other.
+    """
+    cached = getattr(user, "cached_subscription_ids", None)
+    if cached is not None:
+        return cached
+    return (
+        user.subscriptions_publishers.values_list("id", flat=True),
+        user.subscriptions_journalists.values_list("id", flat=True),
+    )
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() reads the cached record."""
+
+    def get_user(self, user_id):
+        user = get(user_id)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        user = await aget(user_id)
+        return user if self.user_can_authenticate(user) else None
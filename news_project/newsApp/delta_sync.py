@@ -0,0 +1,140 @@
+"""
+This file serves /api/articles/changes/, the incremental sync of the
+article API for offline clients.
+
+A client first calls it without a token and pages through everything
+("has_more"), then keeps the last "next" token and asks only for what
+changed since:
+
+    GET /api/articles/changes/?since=<token>
+
+    {"changes": [...], "deleted": [12, 40], "next": "...",
+     "has_more": false}
+
+"changes" holds the articles the user may now see, in the format of
+the article list. "deleted" holds the IDs of tombstones: articles in
+the user's feed that were soft-deleted, rejected or sent back to
+review, which the client should drop.
+
+The token is opaque to clients. It holds the position (updated_at, id)
+of the last row sent, and rows come ordered by the index on those
+columns, so a sync with nothing new is one indexed query.
+
+updated_at is set when a row is saved, not when its transaction
+commits, so a slow transaction can commit a row behind a token that
+was already handed out. The token therefore never moves past
+DELTA_SYNC_SETTLE_SECONDS ago. Rows changed more recently are sent
+again on the next sync, which is harmless since clients apply changes
+by ID.
+
+Changes are detected through updated_at, which Model.save() sets. Bulk
+UPDATEs of articles must set it too (see admin.py).
+"""
+
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import auth_cache
+from .models import Article
+from .serializers import ArticleValuesSerializer
+
+PAGE_SIZE = 200
+
+_FIELDS = ArticleValuesSerializer.fields
+_ID = _FIELDS.index("id")
+_UPDATED_AT = _FIELDS.index("updated_at")
+_STATUS = _FIELDS.index("status")
+_IS_DELETED = _FIELDS.index("is_deleted")
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def encode_token(updated_at, pk):
+    micros = (updated_at - EPOCH) // timedelta(microseconds=1)
+    return (
+        base64.urlsafe_b64encode(f"1:{micros}:{pk}".encode())
+        .decode()
+        .rstrip("=")
+    )
+
+
+def decode_token(token):
+    """(updated_at, pk) of a token from encode_token()."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        version, micros, pk = (
+            base64.urlsafe_b64decode(padded).decode().split(":")
+        )
+        if version != "1":
+            raise ValueError(version)
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidToken(token) from exc
+
+
+def scope(user):
+    """Every article, whatever its state, that may be in user's feed."""
+    if user.role == "reader":
+        publisher_ids, journalist_ids = auth_cache.subscription_ids(user)
+        return Article.objects.filter(
+            Q(publisher_id__in=publisher_ids) | Q(author_id__in=journalist_ids)
+        )
+    return Article.objects.all()
+
+
+def changes(user, since=None, page_size=PAGE_SIZE):
+    """The changes to user's feed after the token since (None: all)."""
+    queryset = scope(user)
+    if since is not None:
+        updated_at, pk = decode_token(since)
+        queryset = queryset.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk)
+        )
+    rows = list(
+        ArticleValuesSerializer(
+            queryset.order_by("updated_at", "id")[: page_size + 1]
+        ).rows()
+    )
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    next_token = since
+    if rows:
+        settled = timezone.now() - timedelta(
+            seconds=getattr(settings, "DELTA_SYNC_SETTLE_SECONDS", 10)
+        )
+        last = rows[-1]
+        if last[_UPDATED_AT] < settled:
+            next_token = encode_token(last[_UPDATED_AT], last[_ID])
+        else:
+            # Stay behind rows that may still be joined by late commits;
+            # they are sent again next time.
+            has_more = False
+            if since is None or decode_token(since)[0] < settled:
+                next_token = encode_token(settled, 0)
+    if next_token is None:
+        next_token = encode_token(EPOCH, 0)
+
+    visible = [
+        row
+        for row in rows
+        if row[_STATUS] == "approved" and not row[_IS_DELETED]
+    ]
+    return {
+        "changes": ArticleValuesSerializer.to_representation(visible),
+        "deleted": [
+            row[_ID]
+            for row in rows
+            if row[_STATUS] != "approved" or row[_IS_DELETED]
+        ],
+        "next": next_token,
+        "has_more": has_more,
+    }
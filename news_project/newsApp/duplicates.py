@@ -0,0 +1,157 @@
+"""
+This file flags near-duplicate article submissions.
+
+An article's content is cut into shingles, which are runs of
+SHINGLE_WORDS words. Its MinHash signature keeps, for each of NUM_PERM
+hash functions, the smallest hash over those shingles. The share of
+positions where two signatures are equal estimates the Jaccard
+similarity of the two shingle sets. A signature is NUM_PERM 32-bit
+values (512 bytes), stored in ArticleSignature.
+
+For the index, the signature is split into BANDS bands of ROWS
+positions, and each band is hashed to a key in ArticleLSHBucket. Two
+articles only become candidates when a whole band agrees. That happens
+with probability 1 - (1 - s ** ROWS) ** BANDS for similarity s: over
+0.99 at 0.7, and 0.23 at 0.3. A lookup is therefore one indexed query
+on BANDS keys plus a check of the few candidates, whatever the size of
+the corpus.
+
+index_article() runs from the post_save signal when an article is
+created or its content changes. It records the most similar earlier
+article in ArticleSignature.duplicate_of, if the estimate reaches
+DUPLICATE_SIMILARITY. Articles saved before this existed are indexed
+by "python manage.py backfill_minhash".
+"""
+
+import hashlib
+import re
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import ArticleLSHBucket, ArticleSignature
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+
+# Hash functions h(x) = (a * x + b) mod PRIME over 32-bit shingle
+# hashes. The parameters are derived from fixed seeds, so every process
+# (and every release) computes the same signatures.
+PRIME = (1 << 32) + 15
+_A, _B = (
+    np.array(
+        [
+            int.from_bytes(
+                hashlib.sha256(f"{name}{index}".encode()).digest()[:4], "big"
+            )
+            | 1
+            for index in range(NUM_PERM)
+        ],
+        dtype=np.uint64,
+    )[:, None]
+    for name in ("a", "b")
+)
+
+WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text):
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {
+        " ".join(words[start : start + SHINGLE_WORDS])
+        for start in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def minhash(text):
+    """The uint32 MinHash signature of text, or None if it has no words."""
+    pieces = shingles(text)
+    if not pieces:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(piece.encode("utf-8")) for piece in pieces),
+        dtype=np.uint64,
+        count=len(pieces),
+    )
+    # a, b and the hashes are below 2**32, so nothing overflows uint64.
+    values = (_A * hashes + _B) % PRIME
+    return (values.min(axis=1) & 0xFFFFFFFF).astype(np.uint32)
+
+
+def band_keys(signature):
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS : (band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(
+            rows, digest_size=8, person=band.to_bytes(2, "big")
+        ).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def similarity(signature, other):
+    return float(np.count_nonzero(signature == other)) / NUM_PERM
+
+
+def find_duplicate(signature, keys, before=None):
+    """
+    (article id, similarity) of the most similar indexed article that is
+    not deleted (and older than before, if given), or (None, None) when
+    none reaches DUPLICATE_SIMILARITY.
+    """
+    candidates = ArticleLSHBucket.objects.filter(
+        key__in=keys, article__is_deleted=False
+    )
+    if before is not None:
+        candidates = candidates.filter(article_id__lt=before)
+    candidate_ids = set(candidates.values_list("article_id", flat=True))
+    if not candidate_ids:
+        return None, None
+
+    best_id, best_score = None, -1.0
+    for article_id, stored in ArticleSignature.objects.filter(
+        article_id__in=candidate_ids
+    ).values_list("article_id", "minhash"):
+        score = similarity(signature, np.frombuffer(stored, dtype=np.uint32))
+        if score > best_score or (
+            score == best_score and article_id < best_id
+        ):
+            best_id, best_score = article_id, score
+    if best_score < getattr(settings, "DUPLICATE_SIMILARITY", 0.7):
+        return None, None
+    return best_id, best_score
+
+
+def index_article(article_id, content):
+    """
+    (Re)index an article and flag its closest earlier duplicate. Returns
+    the duplicate's id or None.
+    """
+    signature = minhash(content)
+    with transaction.atomic():
+        ArticleLSHBucket.objects.filter(article_id=article_id).delete()
+        if signature is None:
+            ArticleSignature.objects.filter(article_id=article_id).delete()
+            return None
+        keys = band_keys(signature)
+        duplicate_id, score = find_duplicate(
+            signature, keys, before=article_id
+        )
+        ArticleSignature.objects.update_or_create(
+            article_id=article_id,
+            defaults={
+                "minhash": signature.tobytes(),
+                "duplicate_of_id": duplicate_id,
+                "similarity": score,
+            },
+        )
+        ArticleLSHBucket.objects.bulk_create(
+            ArticleLSHBucket(article_id=article_id, key=key) for key in keys
+        )
+    return duplicate_id
@@ -0,0 +1,104 @@
+"""
+This file caches the reader feed of the articles API, shared between
+readers who follow the same sources.
+
+A reader's feed depends only on the publishers and journalists they
+follow, so it is cached under a hash of that subscription set: every
+reader with the same subscriptions shares one cached response, and the
+feed query and serialization run once for all of them.
+
+Each followed source has a generation token, under
+"feed_generation:publisher:<pk>" or "feed_generation:journalist:<pk>",
+and the hash covers the tokens too. invalidate() replaces the tokens of
+the sources whose approved articles changed (approved, edited, moved
+or deleted), now and when the transaction commits, so only the feeds
+that follow them are rebuilt. signals.py does this on article saves and
+deletes; the admin's bulk actions and bulk creates call it themselves.
+A subscription change gives the reader a new set, hence a new key.
+
+Feeds are built from the primary (see api_views.reader_feed_data()), so
+a feed rebuilt straight after a bump cannot come from a replica that
+has not seen the change yet.
+
+A lookup costs two cache round trips: the generation tokens, then the
+feed. Hits and misses are counted in the
+newsapp_feed_cache_requests_total series of /metrics.
+"""
+
+import hashlib
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import auth_cache
+from .metrics import registry
+
+RECORD_FORMAT = 1
+HITS_METRIC = "newsapp_feed_cache_requests_total"
+
+
+def _generation_key(kind, pk):
+    return f"feed_generation:{kind}:{pk}"
+
+
+def _generation_keys(publisher_ids, journalist_ids):
+    return [_generation_key("publisher", pk) for pk in publisher_ids] + [
+        _generation_key("journalist", pk) for pk in journalist_ids
+    ]
+
+
+def feed_key(publisher_ids, journalist_ids):
+    """The cache key of the feed of these (sorted) subscriptions."""
+    keys = _generation_keys(publisher_ids, journalist_ids)
+    generations = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in generations}
+    if missing:
+        for key, generation in missing.items():
+            cache.add(key, generation, None)
+        generations.update(cache.get_many(missing))
+    material = "|".join(
+        [
+            ",".join(map(str, publisher_ids)),
+            ",".join(map(str, journalist_ids)),
+            *(generations.get(key, "") for key in keys),
+        ]
+    )
+    digest = hashlib.sha1(material.encode()).hexdigest()
+    return f"reader_feed:{RECORD_FORMAT}:{digest}"
+
+
+def reader_feed(user, build):
+    """
+    The feed data of reader user; build(publisher_ids, journalist_ids)
+    makes it on a miss.
+    """
+    publisher_ids, journalist_ids = (
+        sorted(set(ids)) for ids in auth_cache.subscription_ids(user)
+    )
+    key = feed_key(publisher_ids, journalist_ids)
+    data = cache.get(key)
+    if data is not None:
+        registry.count(HITS_METRIC, result="hit")
+        return data
+    registry.count(HITS_METRIC, result="miss")
+    data = build(publisher_ids, journalist_ids)
+    cache.set(key, data, getattr(settings, "FEED_CACHE_SECONDS", 300))
+    return data
+
+
+def _bump(keys):
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+
+
+def invalidate(publisher_ids=(), journalist_ids=()):
+    """Drop the cached feeds following these sources, now and on commit."""
+    keys = _generation_keys(
+        {pk for pk in publisher_ids if pk is not None},
+        {pk for pk in journalist_ids if pk is not None},
+    )
+    if keys:
+        _bump(keys)
+        transaction.on_commit(partial(_bump, keys))
@@ -7,6 +7,9 @@ lowercase, digit, and special character rules).
 
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from . import pickers
 from .models import CustomUser, Article, Category
 import re
 
@@ -51,16 +54,74 @@ class LoginForm(AuthenticationForm):
     pass
 
 
-# Removed duplicate ArticleForm definition
+class AutocompleteSelect(forms.Select):
+    """
+    A <select> for a ModelChoiceField rendered with only its empty and
+    selected options. static/newsApp/js/autocomplete.js loads the other
+    options from the article_field_options view as the user types.
+    """
+
+    def __init__(self, field_name, attrs=None):
+        super().__init__(attrs)
+        self.field_name = field_name
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["attrs"]["data-autocomplete-url"] = reverse(
+            "article_field_options", args=[self.field_name]
+        )
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        # self.choices is the field's ModelChoiceIterator; iterating it
+        # would load every row.
+        field = self.choices.field
+        selected = [v for v in value if v]
+        choices = []
+        if field.empty_label is not None:
+            choices.append(("", field.empty_label))
+        try:
+            choices += [
+                self.choices.choice(obj)
+                for obj in field.queryset.filter(pk__in=selected)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            pass  # A malformed submitted ID; the field reports it.
+        return [
+            (
+                None,
+                [
+                    self.create_option(
+                        name, choice, label, str(choice) in selected, index
+                    )
+                    for index, (choice, label) in enumerate(choices)
+                ],
+                0,
+            )
+        ]
 
 
 class ArticleForm(forms.ModelForm):
+    """
+    Pass user=the journalist: the publisher choices are limited to the
+    publishers they write for (see pickers.py).
+    """
+
     category = forms.ModelChoiceField(
         queryset=Category.objects.all(),
         required=False,  # Set to True if you want to enforce selection
         empty_label="Select a category",
+        widget=AutocompleteSelect("category"),
     )
 
     class Meta:
         model = Article
-        fields = ["title", "content", "publisher", "category"]
+        fields = ["title", "content", "image", "publisher", "category"]
+        widgets = {"publisher": AutocompleteSelect("publisher")}
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is not None:
+            self.fields["publisher"].queryset = pickers.querysets(user)[
+                "publisher"
+            ]
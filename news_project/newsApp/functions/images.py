@@ -0,0 +1,68 @@
+"""
+This file resizes and recompresses article images with Pillow.
+
+render_variants() takes the bytes of an uploaded image and returns the
+encoded variants. It imports nothing from Django, so it can run in a
+worker process started with "spawn" (see thumbnails.py) without
+setting Django up there.
+"""
+
+import hashlib
+import io
+
+FORMATS = {
+    # format: (Pillow format, extension, save options)
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": (
+        "JPEG",
+        "jpg",
+        {"quality": 82, "optimize": True, "progressive": True},
+    ),
+}
+
+
+def target_widths(width, widths):
+    """The widths to render for an image width pixels wide, never upscaled."""
+    return sorted(
+        {target for target in widths if target < width}
+        | {min(width, max(widths))}
+    )
+
+
+def render_variants(data, widths, formats=("webp", "jpeg")):
+    """
+    [(format, width, height, digest, bytes)] for each width in widths
+    that is not wider than the image, plus one at the image's own width
+    (capped at the largest width). digest is the SHA-256 of the bytes.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            flat = Image.new("RGB", image.size, "white")
+            flat.paste(image, mask=image.getchannel("A"))
+            image = flat
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        variants = []
+        for width in target_widths(image.width, widths):
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            for name in formats:
+                pillow_format, _, options = FORMATS[name]
+                buffer = io.BytesIO()
+                resized.save(buffer, pillow_format, **options)
+                encoded = buffer.getvalue()
+                variants.append(
+                    (
+                        name,
+                        width,
+                        height,
+                        hashlib.sha256(encoded).hexdigest(),
+                        encoded,
+                    )
+                )
+        return variants
@@ -6,8 +6,6 @@ content. In a real application, you would integrate with X's API
 using the requests module.
 """
 
-import requests
-
 
 def post_tweet(article):
     # Create tweet content based on the article title.
@@ -0,0 +1,106 @@
+"""
+This file makes API POSTs safe to retry.
+
+A client that sends an Idempotency-Key header with a POST gets the
+same response for every request carrying that key: the first request
+is processed, and its response is stored and replayed (with an
+"Idempotent-Replayed: true" header) to the retries. A wire service
+retrying after a timeout therefore no longer creates the articles
+twice.
+
+Responses are kept in the cache backend for IDEMPOTENCY_KEY_SECONDS,
+per user, under a hash of the key. The cache bounds the store's size,
+and it expires by itself. While the first request is still being
+processed, a retry is refused with 409 Conflict. Reusing a key for a
+different request body is refused with 422. Requests that fail
+(invalid data, server errors) are not stored, so they can be retried
+under the same key.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# How long a request may hold its key before a retry may run it again.
+IN_PROGRESS_SECONDS = 60
+
+
+class RequestInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is in progress."
+    default_code = "idempotency_conflict"
+
+
+class KeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+def _cache_key(user, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency:{user.pk}:{digest}"
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.path}\n{body}".encode()).hexdigest()
+
+
+def _replay(stored, request_fingerprint):
+    if stored["fingerprint"] != request_fingerprint:
+        raise KeyReused()
+    if stored["status"] is None:
+        raise RequestInProgress()
+    return Response(
+        stored["data"],
+        status=stored["status"],
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+class IdempotentCreateMixin:
+    """Replays the response of a repeated Idempotency-Key on create()."""
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValidationError(
+                {HEADER: [f"At most {MAX_KEY_LENGTH} characters."]}
+            )
+
+        cache_key = _cache_key(request.user, key)
+        request_fingerprint = fingerprint(request)
+        claim = {"fingerprint": request_fingerprint, "status": None}
+        if not cache.add(cache_key, claim, IN_PROGRESS_SECONDS):
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return _replay(stored, request_fingerprint)
+            # It expired in between: claim it again.
+            if not cache.add(cache_key, claim, IN_PROGRESS_SECONDS):
+                raise RequestInProgress()
+
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        cache.set(
+            cache_key,
+            {
+                "fingerprint": request_fingerprint,
+                "status": response.status_code,
+                "data": response.data,
+            },
+            getattr(settings, "IDEMPOTENCY_KEY_SECONDS", 86400),
+        )
+        return response
@@ -0,0 +1,257 @@
+"""
+This file streams newly approved articles to readers as Server-Sent
+Events, so clients no longer poll /api/articles/ to spot them.
+
+Approvals are appended to the ApprovalEvent log in the approving
+transaction (record_approvals(), called by the post_save signal and
+the admin's bulk approve). Once that commits, the approving process
+tells its Hub to read the log at once.
+
+Each process has one Hub, which keeps the latest LIVE_FEED_BUFFER
+events in memory and is shared by all the streams open in that
+process. While at least one stream is open, the hub also reads the log
+every LIVE_FEED_POLL_SECONDS. That is how approvals made by other
+processes reach it, and the only database work an idle process does.
+An open stream only waits on an asyncio.Event and sends a heartbeat
+comment every LIVE_FEED_HEARTBEAT_SECONDS, so proxies keep the
+connection open. It needs no thread and no query of its own.
+
+Readers get the approvals of the publishers and journalists they
+follow; editors and journalists get all of them, as in the article
+API. Subscriptions are read when the stream opens. Browsers reconnect
+by themselves and send the last event ID in Last-Event-ID; the stream
+then replays the events since then from the database.
+
+Event IDs are database IDs, which transactions may commit out of
+order. The hub therefore also rereads the last LATE_COMMIT_SECONDS
+of the log and skips the events it already holds, so a slow
+transaction's approval is still delivered.
+
+That reread also withdraws events. load_events() leaves out articles
+that are deleted or no longer approved, so a buffered event of the
+last LATE_COMMIT_SECONDS that the log stops returning is dropped from
+the buffer, and streams that have not sent it yet never will. The
+admin's bulk soft delete wakes the hub on commit so this process drops
+them at once; other processes do on their next poll. An event that a
+stream has already sent cannot be recalled, and older events are left
+alone: by then every open stream has sent them.
+
+The stream is only served through the ASGI application
+(news_project/asgi.py). Under WSGI, Django would consume an async
+streaming body into a list before sending anything, so an endless
+stream would never reach the client; the view answers 501 there.
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from . import auth_cache
+from .models import ApprovalEvent
+
+logger = logging.getLogger("newsApp.live_feed")
+
+LATE_COMMIT_SECONDS = 60
+BACKLOG_LIMIT = 500
+
+EVENT_FIELDS = {
+    "id": "id",
+    "article_id": "article_id",
+    "title": "article__title",
+    "author_id": "article__author_id",
+    "author": "article__author__username",
+    "publisher_id": "article__publisher_id",
+    "publisher": "article__publisher__name",
+    "approved_at": "created_at",
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def record_approvals(article_ids):
+    """Log approvals in the current transaction; publish them on commit."""
+    ApprovalEvent.objects.bulk_create(
+        ApprovalEvent(article_id=article_id) for article_id in article_ids
+    )
+    transaction.on_commit(hub.notify)
+
+
+def latest_id():
+    return ApprovalEvent.objects.aggregate(latest=Max("id"))["latest"] or 0
+
+
+def load_events(condition, limit=None):
+    """Events matching condition, oldest first, as dicts."""
+    rows = (
+        ApprovalEvent.objects.filter(
+            condition,
+            article__status="approved",
+            article__is_deleted=False,
+        )
+        .order_by("id")
+        .values_list(*EVENT_FIELDS.values())
+    )
+    if limit is not None:
+        rows = rows[:limit]
+    return [dict(zip(EVENT_FIELDS, row)) for row in rows]
+
+
+class Hub:
+    """This process's window on the approval log, shared by its streams."""
+
+    def __init__(self):
+        self.loop = None
+
+    def _reset(self, loop):
+        # The state belongs to one event loop.
+        self.loop = loop
+        self.events = deque()  # (sequence number, event)
+        self.known = set()
+        self.sequence = 0
+        self.last_id = None
+        self.changed = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.streams = 0
+        self.poller = None
+
+    async def open(self):
+        """Register a stream; returns the sequence number to follow from."""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self._reset(loop)
+        if self.last_id is None:
+            self.last_id = await sync_to_async(latest_id)()
+        self.streams += 1
+        if self.poller is None:
+            self.poller = loop.create_task(self._poll())
+        return self.sequence
+
+    def close(self):
+        self.streams -= 1
+        if self.streams == 0 and self.poller is not None:
+            self.poller.cancel()
+            self.poller = None
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(_setting("LIVE_FEED_POLL_SECONDS", 2))
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Reading the approval log failed.")
+
+    async def refresh(self):
+        """Read new events from the log and wake the streams."""
+        async with self.lock:
+            since = timezone.now() - timedelta(seconds=LATE_COMMIT_SECONDS)
+            rows = await sync_to_async(load_events)(
+                Q(id__gt=self.last_id) | Q(created_at__gte=since)
+            )
+            listed = {row["id"] for row in rows}
+            withdrawn = {
+                event["id"]
+                for _, event in self.events
+                if event["approved_at"] >= since and event["id"] not in listed
+            }
+            if withdrawn:
+                self.events = deque(
+                    (seq, event)
+                    for seq, event in self.events
+                    if event["id"] not in withdrawn
+                )
+                self.known -= withdrawn
+            fresh = [row for row in rows if row["id"] not in self.known]
+            if not fresh:
+                return
+            buffer_size = _setting("LIVE_FEED_BUFFER", 1000)
+            for event in fresh:
+                self.sequence += 1
+                self.events.append((self.sequence, event))
+                self.known.add(event["id"])
+                self.last_id = max(self.last_id, event["id"])
+                if len(self.events) > buffer_size:
+                    self.known.discard(self.events.popleft()[1]["id"])
+            self.changed.set()
+            self.changed = asyncio.Event()
+
+    def notify(self):
+        """Read the log now (callable from any thread)."""
+        loop = self.loop
+        if loop is not None and not loop.is_closed() and self.streams:
+            asyncio.run_coroutine_threadsafe(self.refresh(), loop)
+
+    def after(self, sequence):
+        return [(seq, event) for seq, event in self.events if seq > sequence]
+
+
+hub = Hub()
+
+
+def format_event(event):
+    data = json.dumps(event, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return f"id: {event['id']}\nevent: approval\ndata: {data}\n\n"
+
+
+def _follows(user):
+    if user.role != "reader":
+        return None
+    publisher_ids, journalist_ids = auth_cache.subscription_ids(user)
+    return set(publisher_ids), set(journalist_ids)
+
+
+async def stream(user, last_event_id=None):
+    """The SSE body for user: an endless async iterator of strings."""
+    follows = await sync_to_async(_follows)(user)
+
+    def wanted(event):
+        return follows is None or (
+            event["publisher_id"] in follows[0]
+            or event["author_id"] in follows[1]
+        )
+
+    position = await hub.open()
+    try:
+        yield f"retry: {_setting('LIVE_FEED_RETRY_MS', 3000)}\n\n"
+        replayed = set()
+        if last_event_id is not None:
+            backlog = await sync_to_async(load_events)(
+                Q(id__gt=last_event_id), BACKLOG_LIMIT
+            )
+            for event in backlog:
+                replayed.add(event["id"])
+                if wanted(event):
+                    yield format_event(event)
+
+        heartbeat = _setting("LIVE_FEED_HEARTBEAT_SECONDS", 15)
+        while True:
+            if hub.sequence == position:
+                try:
+                    await asyncio.wait_for(hub.changed.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+            # Withdrawn events leave gaps, so follow the hub's sequence
+            # rather than the last event's.
+            pending, position = hub.after(position), hub.sequence
+            for _, event in pending:
+                if event["id"] not in replayed and wanted(event):
+                    yield format_event(event)
+    finally:
+        hub.close()
+
+
+def last_event_id(request):
+    """The Last-Event-ID of a reconnecting client, or None."""
+    value = request.headers.get("Last-Event-ID", "")
+    return int(value) if value.isdigit() else None
@@ -0,0 +1,128 @@
+"""
+This file sends batches of e-mail over reused SMTP connections.
+
+send_in_batches() opens one connection per batch of
+NOTIFICATION_BATCH_SIZE messages and sends the messages of the batch
+one by one over it, so every message has a single recipient in its
+envelope. NOTIFICATION_MAX_PER_SECOND caps the send rate for relays
+that throttle. A refused recipient or a dropped connection only fails
+the messages concerned; the rest of the run carries on, and every
+failure is logged and counted in the returned DeliveryReport.
+send_one() sends a single message the same way, for callers that
+manage their own connection (newsletters.py).
+"""
+
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger("newsApp.mailer")
+
+
+class DeliveryReport:
+    def __init__(self):
+        self.sent = 0
+        self.batches = 0
+        self.failed = []  # (recipient, error message)
+
+    def __repr__(self):
+        return (
+            f"<DeliveryReport sent={self.sent} failed={len(self.failed)} "
+            f"batches={self.batches}>"
+        )
+
+
+class RateLimiter:
+    """Spaces calls at least 1 / max_per_second seconds apart."""
+
+    def __init__(self, max_per_second):
+        self.interval = 1 / max_per_second if max_per_second else 0
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self.next_slot:
+            time.sleep(self.next_slot - now)
+            now = self.next_slot
+        self.next_slot = now + self.interval
+
+
+def _chunks(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _reconnect(connection):
+    # Reconnect for the rest of the batch. If that fails too, each
+    # remaining message retries on its own and is counted as failed.
+    try:
+        connection.close()
+        connection.open()
+    except (smtplib.SMTPException, OSError) as exc:
+        logger.error("Could not reopen mail connection: %s", exc)
+
+
+def send_one(connection, message, report):
+    """
+    Send message over connection and count it in report as sent or
+    failed. Returns whether it was sent.
+    """
+    message.connection = connection
+    try:
+        sent = connection.send_messages([message]) or 0
+    except (smtplib.SMTPException, OSError) as exc:
+        recipient = ", ".join(message.to)
+        logger.warning("Mail to %s failed: %s", recipient, exc)
+        report.failed.append((recipient, str(exc)))
+        if isinstance(exc, smtplib.SMTPServerDisconnected):
+            _reconnect(connection)
+        return False
+    report.sent += sent
+    return bool(sent)
+
+
+def send_in_batches(messages, batch_size=None, max_per_second=None):
+    """Send an iterable of EmailMessage objects and return a report."""
+    if batch_size is None:
+        batch_size = getattr(settings, "NOTIFICATION_BATCH_SIZE", 50)
+    if max_per_second is None:
+        max_per_second = getattr(settings, "NOTIFICATION_MAX_PER_SECOND", None)
+    limiter = RateLimiter(max_per_second)
+    report = DeliveryReport()
+
+    for batch in _chunks(messages, batch_size):
+        report.batches += 1
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except (smtplib.SMTPException, OSError) as exc:
+            logger.error("Could not open mail connection: %s", exc)
+            report.failed.extend(
+                (", ".join(message.to), str(exc)) for message in batch
+            )
+            continue
+        try:
+            for message in batch:
+                limiter.wait()
+                send_one(connection, message, report)
+        finally:
+            connection.close()
+
+    if report.failed:
+        logger.warning(
+            "%d of %d messages failed.",
+            len(report.failed),
+            report.sent + len(report.failed),
+        )
+    return report
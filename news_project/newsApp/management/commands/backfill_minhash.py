@@ -0,0 +1,59 @@
+"""
+Indexes existing articles for near-duplicate detection (duplicates.py).
+
+Usage:
+    python manage.py backfill_minhash [--rebuild] [--batch-size N]
+
+Articles are indexed oldest first, so each one is compared with the
+articles before it, as if they had been submitted in that order.
+New and edited articles are indexed by the post_save signal.
+"""
+
+from django.core.management.base import BaseCommand
+
+from newsApp.duplicates import index_article
+from newsApp.models import Article
+
+
+class Command(BaseCommand):
+    help = "Compute MinHash signatures for articles that have none."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Re-index every article, not only those without one.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Articles loaded per query.",
+        )
+
+    def handle(self, *args, **options):
+        articles = Article.objects.filter(is_deleted=False).order_by("pk")
+        if not options["rebuild"]:
+            articles = articles.filter(signature__isnull=True)
+        indexed = flagged = 0
+        last_id = 0
+        while True:
+            # Keyset pagination: indexing adds signatures, so offsets
+            # into the unindexed set would skip articles.
+            batch = list(
+                articles.filter(pk__gt=last_id).values_list("pk", "content")[
+                    : options["batch_size"]
+                ]
+            )
+            if not batch:
+                break
+            for article_id, content in batch:
+                if index_article(article_id, content) is not None:
+                    flagged += 1
+                indexed += 1
+            last_id = batch[-1][0]
+            self.stdout.write(f"Indexed {indexed} articles...")
+        self.stdout.write(
+            f"Done: {indexed} articles indexed, {flagged} flagged as "
+            f"possible duplicates."
+        )
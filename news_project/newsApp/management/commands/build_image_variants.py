@@ -0,0 +1,74 @@
+"""
+Builds the resized variants of article images (thumbnails.py).
+
+Usage:
+    python manage.py build_image_variants [--all] [--workers N]
+
+By default only articles whose current image has no variants are
+processed: images uploaded before variants existed, and uploads whose
+variants were lost (for example when a web worker stopped first).
+--all rebuilds every image, for example after changing
+ARTICLE_IMAGE_WIDTHS.
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from newsApp import thumbnails
+from newsApp.functions import images
+from newsApp.models import Article
+
+
+class Command(BaseCommand):
+    help = "Resize article images into their WebP and JPEG variants."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild the variants of every image.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "ARTICLE_IMAGE_WORKERS", 2) or 1,
+            help="Worker processes (default: ARTICLE_IMAGE_WORKERS).",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        articles = Article.objects.exclude(image="")
+        if not options["all"]:
+            articles = articles.exclude(image_variants__source=F("image"))
+        ids = list(articles.order_by("pk").values_list("pk", flat=True))
+
+        workers = max(1, options["workers"])
+        stored = 0
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            # A few images per worker in flight, so the originals are
+            # not all held in memory at once.
+            for offset in range(0, len(ids), workers * 4):
+                jobs = {}
+                for article_id in ids[offset : offset + workers * 4]:
+                    source, data = thumbnails.original(article_id)
+                    if source is None:
+                        continue
+                    job = pool.submit(
+                        images.render_variants, data, thumbnails.widths()
+                    )
+                    jobs[job] = (article_id, source)
+                for job in as_completed(jobs):
+                    stored += thumbnails.store(*jobs[job], job.result())
+
+        self.stdout.write(
+            f"{stored} variants of {len(ids)} images stored in "
+            f"{time.perf_counter() - start:.1f}s."
+        )
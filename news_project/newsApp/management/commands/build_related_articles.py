@@ -0,0 +1,60 @@
+"""
+Precomputes the related articles shown on article pages (related.py).
+
+Usage:
+    python manage.py build_related_articles [--incremental] [--count N]
+        [--dimensions N] [--block-size N]
+
+Run a full build nightly and an incremental one every few minutes so
+newly approved articles get (and appear in) recommendations quickly.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from newsApp.related import build
+
+
+class Command(BaseCommand):
+    help = "Compute the related articles of every approved article."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only update the articles changed since the last build.",
+        )
+        parser.add_argument(
+            "--count",
+            type=int,
+            help="Related articles kept per article "
+            "(default: RELATED_ARTICLES_COUNT).",
+        )
+        parser.add_argument(
+            "--dimensions",
+            type=int,
+            default=2048,
+            help="Width of the TF-IDF vectors; larger vocabularies are "
+            "hashed into it.",
+        )
+        parser.add_argument(
+            "--block-size",
+            type=int,
+            default=512,
+            help="Articles scored per matrix product.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        run = build(
+            incremental=options["incremental"],
+            k=options["count"],
+            dimensions=options["dimensions"],
+            block_size=options["block_size"],
+        )
+        kind = "Incremental" if run.incremental else "Full"
+        self.stdout.write(
+            f"{kind} build {run.pk}: {run.articles} articles scored in "
+            f"{time.perf_counter() - start:.1f}s."
+        )
@@ -0,0 +1,41 @@
+"""
+Sends the announcements (subscriber e-mails and the post on X) of
+approvals that were not announced (announcements.py), for example
+because the web worker holding them stopped first.
+
+Usage:
+    python manage.py send_announcements [--older-than SECONDS]
+
+Approvals younger than --older-than are left to the worker pool that
+is still sending them.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from newsApp import announcements
+from newsApp.models import ApprovalEvent
+
+
+class Command(BaseCommand):
+    help = "Announce approved articles whose announcements were not sent."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=300,
+            help="Only approvals at least this many seconds old.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options["older_than"])
+        events = ApprovalEvent.objects.filter(
+            announced_at__isnull=True, created_at__lte=cutoff
+        ).order_by("pk")
+        # An article approved twice is announced once.
+        ids = dict.fromkeys(events.values_list("article_id", flat=True))
+        sent = sum(announcements.announce(article_id) for article_id in ids)
+        self.stdout.write(f"{sent} approvals announced.")
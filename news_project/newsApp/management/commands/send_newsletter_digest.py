@@ -0,0 +1,70 @@
+"""
+Sends the newsletter digest e-mails built by newsletters.py.
+
+Usage:
+    python manage.py send_newsletter_digest [--since YYYY-MM-DD]
+        [--chunk-size N] [--batch-size N]
+
+If a previous run did not finish, it is resumed instead of starting a
+new period.
+"""
+
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from newsApp.newsletters import send_digests
+
+
+class Command(BaseCommand):
+    help = "Send the digest of approved newsletters to subscribed readers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="Start of the period for a new run (default: end of the "
+            "last run, or NEWSLETTER_DIGEST_DAYS ago).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Readers loaded per query.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Messages sent per batch over the SMTP connection.",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                date = parse_date(options["since"])
+                if date is None:
+                    raise CommandError("--since must be a date or datetime.")
+                since = datetime.combine(date, time.min)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        summary = send_digests(
+            since=since,
+            chunk_size=options["chunk_size"],
+            batch_size=options["batch_size"],
+        )
+        run = summary["run"]
+        resumed = "resumed " if summary["resumed"] else ""
+        self.stdout.write(
+            f"Finished {resumed}digest run {run.pk} "
+            f"({run.period_start:%Y-%m-%d %H:%M} to "
+            f"{run.period_end:%Y-%m-%d %H:%M}): "
+            f"{summary['sent']} e-mails sent, "
+            f"{summary['failed']} failed, "
+            f"{summary['digests']} distinct digests, "
+            f"{summary['rendered']} rendered."
+        )
@@ -0,0 +1,55 @@
+"""
+Prints the rolling top-N slow-query table recorded by slow_queries.py.
+
+Usage:
+    python manage.py slow_queries [--limit N] [--explain] [--clear]
+"""
+
+from django.core.management.base import BaseCommand
+
+from newsApp.models import SlowQuery
+from newsApp.slow_queries import top_queries
+
+
+class Command(BaseCommand):
+    help = "Show the slowest logged queries with their EXPLAIN plans."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=None, help="Rows to show."
+        )
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help="Print the captured EXPLAIN plan under each query.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Empty the slow-query table.",
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(f"Removed {deleted} slow-query entries.")
+            return
+
+        entries = list(top_queries(options["limit"]))
+        if not entries:
+            self.stdout.write("No slow queries logged.")
+            return
+
+        self.stdout.write(
+            f"{'#':>3} {'max ms':>9} {'avg ms':>9} {'calls':>6}  view / sql"
+        )
+        for rank, entry in enumerate(entries, start=1):
+            self.stdout.write(
+                f"{rank:>3} {entry.max_ms:>9.1f} "
+                f"{entry.average_ms:>9.1f} {entry.calls:>6}  "
+                f"{entry.view or '-'} [{entry.vendor}]"
+            )
+            self.stdout.write(f"{'':>31}{entry.normalized_sql}")
+            if options["explain"] and entry.explain:
+                for line in entry.explain.splitlines():
+                    self.stdout.write(f"{'':>33}{line}")
@@ -0,0 +1,127 @@
+"""
+Reports what a fresh worker spends its startup time importing.
+
+Usage:
+    python manage.py startup_profile [--limit N] [--urls] [--warmup]
+        [--sort self|cumulative]
+
+Starts a new interpreter with "python -X importtime" and the current
+settings, runs django.setup() (then loads the URLconf with --urls, or
+runs warmup.warm_up() with --warmup), and prints the wall time of each
+phase. It then lists the slowest modules and the top-level packages by
+total import time. Run it after adding an import to a module loaded at
+startup (models, signals, apps, middleware) to see what it costs.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+phases = [("django.setup()", time.perf_counter() - start)]
+if {urls!r}:
+    from django.urls import get_resolver
+    start = time.perf_counter()
+    get_resolver().url_patterns
+    phases.append(("URLconf", time.perf_counter() - start))
+if {warmup!r}:
+    from newsApp.warmup import warm_up
+    phases += [("warm-up: " + name, t) for name, t in warm_up()]
+print(json.dumps(phases))
+"""
+
+
+def parse_importtime(output):
+    """[(module, self us, cumulative us)] from "-X importtime" output."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # The header line.
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Profile the imports and phases of a fresh worker's startup."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=20, help="Modules to show."
+        )
+        parser.add_argument(
+            "--urls",
+            action="store_true",
+            help="Also load the URLconf, as the first request does.",
+        )
+        parser.add_argument(
+            "--warmup",
+            action="store_true",
+            help="Also run the warm-up steps (newsApp/warmup.py).",
+        )
+        parser.add_argument(
+            "--sort",
+            choices=["self", "cumulative"],
+            default="self",
+            help="Order modules by their own or their cumulative time.",
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                SCRIPT.format(urls=options["urls"], warmup=options["warmup"]),
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        phases = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = parse_importtime(result.stderr)
+
+        self.stdout.write(f"{'phase':<32} {'ms':>9}")
+        for name, seconds in phases:
+            shown = "failed" if seconds is None else f"{seconds * 1000:.1f}"
+            self.stdout.write(f"{name:<32} {shown:>9}")
+
+        column = 1 if options["sort"] == "self" else 2
+        self.stdout.write(
+            f"\n{len(modules)} modules imported, "
+            f"{sum(m[1] for m in modules) / 1000:.1f} ms in total"
+        )
+        self.stdout.write(f"{'self ms':>9} {'cumul. ms':>9}  module")
+        for name, self_us, cumulative_us in sorted(
+            modules, key=lambda module: -module[column]
+        )[: options["limit"]]:
+            self.stdout.write(
+                f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}  {name}"
+            )
+
+        packages = defaultdict(lambda: [0, 0])
+        for name, self_us, _ in modules:
+            package = packages[name.split(".")[0]]
+            package[0] += self_us
+            package[1] += 1
+        self.stdout.write(f"\n{'ms':>9} {'modules':>7}  package")
+        for name, (self_us, count) in sorted(
+            packages.items(), key=lambda item: -item[1][0]
+        )[: options["limit"]]:
+            self.stdout.write(f"{self_us / 1000:>9.1f} {count:>7}  {name}")
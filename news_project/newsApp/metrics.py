@@ -0,0 +1,319 @@
+"""
+This file collects lightweight per-request performance metrics.
+
+For every request the RequestMetricsMiddleware (see middleware.py)
+opens a RequestMetrics record and stores it in a context variable.
+The helpers below add to that record while the view runs:
+
+* db_timer is installed with connection.execute_wrapper() and counts
+  queries and the time spent waiting on the database.
+* TimedDjangoTemplates is a drop-in template backend that times
+  template rendering (lazy queries made by a template are counted in
+  both the template time and the DB time).
+* timed_signal_handler wraps our own signal receivers.
+
+When a staff user asks for a profile of the request (see profiling.py),
+the record also carries a Profile, to which db_timer and TimedTemplate
+report every query and template render. Otherwise that costs one
+attribute check.
+
+When a request finishes its numbers are sent as a Server-Timing
+header and added to per-view histograms, which the /metrics view
+exports in the Prometheus text format. The registry also keeps a few
+labelled counters, such as the hits and misses of the shared reader
+feed cache (feed_cache.py). Histograms and counters live in process
+memory, so every worker exposes its own series.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+# Upper bounds (in seconds) of the histogram buckets.
+DURATION_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar("newsapp_request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Timings gathered while a single request is being served."""
+
+    __slots__ = (
+        "started",
+        "queries",
+        "db_time",
+        "template_time",
+        "signal_time",
+        "slow_threshold",
+        "slow_queries",
+        "profile",
+    )
+
+    def __init__(self, slow_threshold=None):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.signal_time = 0.0
+        # Queries slower than slow_threshold (seconds) are kept for the
+        # slow-query log; see slow_queries.py.
+        self.slow_threshold = slow_threshold
+        self.slow_queries = []
+        self.profile = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        """Format the record as a Server-Timing header value."""
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f"tpl;dur={self.template_time * 1000:.1f}, "
+            f"sig;dur={self.signal_time * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+
+def start_request(slow_threshold=None):
+    """Open a metrics record for the current request or task."""
+    metrics = RequestMetrics(slow_threshold)
+    token = _current.set(metrics)
+    return metrics, token
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current_metrics():
+    """Return the record for the request being served, or None."""
+    return _current.get()
+
+
+def db_timer(execute, sql, params, many, context):
+    """execute_wrapper() hook counting queries and DB time."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        metrics.db_time += duration
+        metrics.queries += 1
+        threshold = metrics.slow_threshold
+        if threshold is not None and duration >= threshold:
+            metrics.slow_queries.append(
+                (context["connection"].alias, sql, params, many, duration)
+            )
+        if metrics.profile is not None:
+            metrics.profile.add_query(
+                context["connection"].alias, sql, params, many, duration
+            )
+
+
+def timed_signal_handler(handler):
+    """Decorator adding a receiver's run time to the request's signal time."""
+
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        metrics = _current.get()
+        if metrics is None:
+            return handler(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            metrics.signal_time += time.perf_counter() - start
+
+    return wrapper
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            duration = time.perf_counter() - start
+            metrics.template_time += duration
+            if metrics.profile is not None:
+                metrics.profile.add_template(
+                    self.template.origin.template_name or "<string>",
+                    duration,
+                )
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The standard Django template backend, with render timing."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class Histogram:
+    """A fixed-bucket histogram that is safe to update from many threads."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket plus the implicit "+Inf" bucket.
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += value
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.total
+
+
+class MetricsRegistry:
+    """Per-view histograms for each recorded request metric."""
+
+    METRICS = (
+        (
+            "newsapp_request_duration_seconds",
+            "Total time spent serving the request.",
+            DURATION_BUCKETS,
+        ),
+        (
+            "newsapp_request_db_seconds",
+            "Time spent waiting on database queries.",
+            DURATION_BUCKETS,
+        ),
+        (
+            "newsapp_request_template_seconds",
+            "Time spent rendering templates.",
+            DURATION_BUCKETS,
+        ),
+        (
+            "newsapp_request_signal_seconds",
+            "Time spent in newsApp signal handlers.",
+            DURATION_BUCKETS,
+        ),
+        (
+            "newsapp_request_queries",
+            "Number of database queries per request.",
+            QUERY_COUNT_BUCKETS,
+        ),
+    )
+
+    COUNTERS = (
+        (
+            "newsapp_feed_cache_requests_total",
+            "Reader feed lookups in the shared feed cache, by result.",
+        ),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # {view name: {metric name: Histogram}}
+        self.views = {}
+        # {(counter name, ((label, value), ...)): count}
+        self.counters = {}
+
+    def _histograms(self, view):
+        histograms = self.views.get(view)
+        if histograms is None:
+            with self.lock:
+                histograms = self.views.get(view)
+                if histograms is None:
+                    histograms = {
+                        name: Histogram(buckets)
+                        for name, _, buckets in self.METRICS
+                    }
+                    self.views[view] = histograms
+        return histograms
+
+    def observe(self, view, metrics, total):
+        histograms = self._histograms(view)
+        histograms["newsapp_request_duration_seconds"].observe(total)
+        histograms["newsapp_request_db_seconds"].observe(metrics.db_time)
+        histograms["newsapp_request_template_seconds"].observe(
+            metrics.template_time
+        )
+        histograms["newsapp_request_signal_seconds"].observe(
+            metrics.signal_time
+        )
+        histograms["newsapp_request_queries"].observe(metrics.queries)
+
+    def count(self, name, **labels):
+        """Add one to the counter name with these labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+            self.counters = {}
+
+    def render(self):
+        """Export every histogram in the Prometheus text format."""
+        lines = []
+        views = sorted(self.views.items())
+        for name, help_text, buckets in self.METRICS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for view, histograms in views:
+                counts, total = histograms[name].snapshot()
+                label = view.replace("\\", "\\\\").replace('"', '\\"')
+                cumulative = 0
+                for bound, count in zip(buckets, counts):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket{{view="{label}",le="{bound}"}} '
+                        f"{cumulative}"
+                    )
+                cumulative += counts[-1]
+                lines.append(
+                    f'{name}_bucket{{view="{label}",le="+Inf"}} {cumulative}'
+                )
+                lines.append(f'{name}_sum{{view="{label}"}} {total}')
+                lines.append(f'{name}_count{{view="{label}"}} {cumulative}')
+        with self.lock:
+            counters = sorted(self.counters.items())
+        for name, help_text in self.COUNTERS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (counter, labels), value in counters:
+                if counter == name:
+                    label = ",".join(f'{key}="{val}"' for key, val in labels)
+                    lines.append(f"{name}{{{label}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,217 @@
+"""
+This file contains the custom middleware used by the newsApp.
+
+RequestMetricsMiddleware records how long each request spends in the
+database, in template rendering and in signal handlers. The numbers
+are returned to the client in a Server-Timing header and aggregated
+into the per-view histograms published on /metrics. Queries slower
+than SLOW_QUERY_THRESHOLD_MS are passed on to the slow-query log.
+
+ReplicaPinningMiddleware gives the database router (see routers.py)
+its per-request state and keeps clients that have just written on the
+primary database for REPLICA_PIN_SECONDS.
+
+RequestProfilingMiddleware profiles the requests staff users ask it to
+(see profiling.py). It needs RequestMetricsMiddleware, and runs after
+AuthenticationMiddleware.
+
+All three run natively under WSGI and under the ASGI application in
+news_project/asgi.py, so neither forces a sync/async switch.
+"""
+
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import reverse
+
+from . import metrics, profiling, routers, slow_queries
+
+
+class AsyncCapableMiddleware:
+    """Base class running the async path when the handler is async."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+def _install_db_timers(stack):
+    # Wrap every configured database so replicas are timed too.
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(metrics.db_timer))
+
+
+class RequestMetricsMiddleware(AsyncCapableMiddleware):
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.slow_threshold = slow_queries.threshold()
+
+    def handle(self, request):
+        record, token = metrics.start_request(self.slow_threshold)
+        try:
+            with ExitStack() as stack:
+                _install_db_timers(stack)
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+
+        view = self.finish(request, response, record)
+        if record.slow_queries:
+            slow_queries.log_slow_queries(view, record.slow_queries)
+        return response
+
+    async def __acall__(self, request):
+        record, token = metrics.start_request(self.slow_threshold)
+        try:
+            # Connections are thread-local: the wrappers have to be
+            # installed on the thread that runs this request's queries.
+            stack = ExitStack()
+            await sync_to_async(_install_db_timers)(stack)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            metrics.finish_request(token)
+
+        view = self.finish(request, response, record)
+        if record.slow_queries:
+            await sync_to_async(slow_queries.log_slow_queries)(
+                view, record.slow_queries
+            )
+        return response
+
+    def finish(self, request, response, record):
+        total = record.elapsed()
+        response["Server-Timing"] = record.server_timing(total)
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        metrics.registry.observe(view, record, total)
+        return view
+
+
+class ReplicaPinningMiddleware(AsyncCapableMiddleware):
+    def __init__(self, get_response):
+        if not routers.replicas():
+            # Everything is served by the primary anyway.
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.cookie_name = getattr(
+            settings, "REPLICA_PIN_COOKIE", "primary_pin"
+        )
+        self.pin_seconds = getattr(settings, "REPLICA_PIN_SECONDS", 10)
+
+    def handle(self, request):
+        state, token = routers.start_routing(self.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.finish_routing(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        state, token = routers.start_routing(self.is_pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.finish_routing(token)
+        return self.finish(response, state)
+
+    def finish(self, response, state):
+        if state.wrote:
+            # The cookie holds the time the pin runs out.
+            response.set_cookie(
+                self.cookie_name,
+                str(int(time.time()) + self.pin_seconds),
+                max_age=self.pin_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def is_pinned(self, request):
+        value = request.COOKIES.get(self.cookie_name)
+        if value is None:
+            return False
+        try:
+            return int(value) > time.time()
+        except ValueError:
+            return False
+
+
+class RequestProfilingMiddleware(AsyncCapableMiddleware):
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_PROFILING_ENABLED", True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        record = metrics.current_metrics()
+        if (
+            record is None
+            or not profiling.requested(request)
+            or not request.user.is_staff
+        ):
+            return self.get_response(request)
+
+        profile, started = self.start(record)
+        try:
+            response = self.get_response(request)
+        finally:
+            duration = self.stop(record, profile, started)
+        entry = profiling.save(request, response, profile, duration)
+        return self.finish(response, entry)
+
+    async def __acall__(self, request):
+        record = metrics.current_metrics()
+        if (
+            record is None
+            or not profiling.requested(request)
+            or not (await request.auser()).is_staff
+        ):
+            return await self.get_response(request)
+
+        profile, started = self.start(record)
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration = self.stop(record, profile, started)
+        entry = await sync_to_async(profiling.save)(
+            request, response, profile, duration
+        )
+        return self.finish(response, entry)
+
+    def start(self, record):
+        profile = record.profile = profiling.Profile()
+        started = time.perf_counter()
+        profile.profiler.enable()
+        return profile, started
+
+    def stop(self, record, profile, started):
+        profile.profiler.disable()
+        record.profile = None
+        return time.perf_counter() - started
+
+    def finish(self, response, entry):
+        response["X-Profile-URL"] = reverse("request_profile", args=[entry.pk])
+        return response
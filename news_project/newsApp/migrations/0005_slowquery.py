@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsApp", "0004_category_article_category"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SlowQuery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fingerprint", models.CharField(max_length=40, unique=True)),
+                ("normalized_sql", models.TextField()),
+                ("sample_sql", models.TextField()),
+                ("view", models.CharField(blank=True, max_length=255)),
+                ("vendor", models.CharField(max_length=20)),
+                ("explain", models.TextField(blank=True)),
+                ("calls", models.PositiveIntegerField(default=1)),
+                ("total_time", models.FloatField(default=0)),
+                ("max_time", models.FloatField(default=0)),
+                ("last_seen", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["-max_time"],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsApp", "0006_newsletter_digests"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="view_count",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name="ArticleViewBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hour", models.DateTimeField()),
+                ("views", models.PositiveIntegerField(default=0)),
+                (
+                    "article",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="view_buckets",
+                        to="newsApp.article",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["hour"], name="newsApp_art_hour_f2b254_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("article", "hour"), name="unique_article_view_hour"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsApp", "0011_article_revisions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="image",
+            field=models.ImageField(blank=True, upload_to="articles/originals/"),
+        ),
+        migrations.CreateModel(
+            name="ArticleImageVariant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(max_length=255)),
+                ("format", models.CharField(max_length=4)),
+                ("width", models.PositiveIntegerField()),
+                ("height", models.PositiveIntegerField()),
+                ("file", models.FileField(max_length=255, upload_to="")),
+                (
+                    "article",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="image_variants",
+                        to="newsApp.article",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["article", "format", "width"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("article", "format", "width"),
+                        name="unique_article_image_variant",
+                    )
+                ],
+            },
+        ),
+    ]
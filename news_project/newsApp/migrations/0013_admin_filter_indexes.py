@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsApp", "0012_article_images"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="customuser",
+            name="role",
+            field=models.CharField(
+                choices=[
+                    ("reader", "Reader"),
+                    ("editor", "Editor"),
+                    ("journalist", "Journalist"),
+                ],
+                db_index=True,
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["is_deleted", "status"], name="article_deleted_status_idx"
+            ),
+        ),
+    ]
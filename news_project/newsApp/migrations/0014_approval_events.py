@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsApp", "0013_admin_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ApprovalEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "article",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="approval_events",
+                        to="newsApp.article",
+                    ),
+                ),
+            ],
+        ),
+    ]
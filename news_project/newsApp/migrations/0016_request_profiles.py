@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsApp", "0015_article_updated_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RequestProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("method", models.CharField(max_length=10)),
+                ("path", models.TextField()),
+                ("view", models.CharField(blank=True, max_length=255)),
+                ("status_code", models.PositiveSmallIntegerField()),
+                ("duration", models.FloatField()),
+                ("db_time", models.FloatField()),
+                ("template_time", models.FloatField()),
+                ("query_count", models.PositiveIntegerField()),
+                ("functions", models.JSONField(default=list)),
+                ("queries", models.JSONField(default=list)),
+                ("templates", models.JSONField(default=list)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:30
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_announced(apps, schema_editor):
+    # Approvals before this migration were announced when they were made.
+    ApprovalEvent = apps.get_model("newsApp", "ApprovalEvent")
+    ApprovalEvent.objects.update(announced_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsApp", "0016_request_profiles"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="approvalevent",
+            name="announced_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(
+            mark_existing_announced, migrations.RunPython.noop
+        ),
+    ]
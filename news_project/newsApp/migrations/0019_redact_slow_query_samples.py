@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:30
+
+from django.db import migrations
+
+
+def drop_sample_params(apps, schema_editor):
+    # Samples used to end with the query's parameters.
+    SlowQuery = apps.get_model("newsApp", "SlowQuery")
+    for entry in SlowQuery.objects.filter(
+        sample_sql__contains="\n-- params: "
+    ):
+        entry.sample_sql = entry.sample_sql.split("\n-- params: ")[0]
+        entry.save(update_fields=["sample_sql"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsApp", "0018_user_admin_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_sample_params, migrations.RunPython.noop),
+    ]
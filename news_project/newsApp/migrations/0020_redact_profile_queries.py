@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:00
+
+from django.db import migrations
+
+
+def drop_query_params(apps, schema_editor):
+    # Profiled queries used to end with their parameters.
+    RequestProfile = apps.get_model("newsApp", "RequestProfile")
+    for profile in RequestProfile.objects.only("queries").iterator():
+        for query in profile.queries:
+            query["sql"] = query["sql"].split("\n-- params: ")[0]
+        profile.save(update_fields=["queries"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsApp", "0019_redact_slow_query_samples"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_query_params, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsApp", "0020_redact_profile_queries"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="newsletterdigestrun",
+            name="failed_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -22,9 +22,12 @@ an article from the database, you can simply mark it as removed
 (or archived). This approach not only ensures an audit trail but
 also allows for the recovery of the article if necessary.
 
+Edits to an article's title and content are kept as ArticleRevision
+rows, written in the same transaction as the save (see revisions.py).
+
 """
 
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import AbstractUser
 
 
@@ -43,7 +46,10 @@ STATUS_CHOICES = [
 
 
 class CustomUser(AbstractUser):
-    role = models.CharField(max_length=20, choices=ROLE_CHOICES)
+    # Indexed for the admin's role filter.
+    role = models.CharField(
+        max_length=20, choices=ROLE_CHOICES, db_index=True
+    )
     subscriptions_publishers = models.ManyToManyField(
         "Publisher", blank=True, related_name="subscribed_readers"
     )
@@ -65,6 +71,13 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+    class Meta(AbstractUser.Meta):
+        # The admin's is_staff and is_active filters.
+        indexes = [
+            models.Index(fields=["is_staff"], name="user_is_staff_idx"),
+            models.Index(fields=["is_active"], name="user_is_active_idx"),
+        ]
+
 
 class Publisher(models.Model):
     name = models.CharField(max_length=255)
@@ -128,6 +141,9 @@ class Article(models.Model):
         default="pending"
     )
 
+    # The uploaded original. Pages show the resized ArticleImageVariant
+    # copies made from it (see thumbnails.py).
+    image = models.ImageField(upload_to="articles/originals/", blank=True)
     is_deleted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -138,10 +154,68 @@ class Article(models.Model):
         blank=True,
         related_name="approved_articles",
     )
+    # Total reads, flushed in bulk by popularity.ViewCounter; never
+    # incremented per request. save() leaves it out of its UPDATE, so
+    # an instance loaded before a flush does not write it back.
+    view_count = models.PositiveBigIntegerField(default=0, editable=False)
+    # Review lease (see review_queue.py): the editor reviewing a pending
+    # article, until claim_expires_at.
+    claimed_by = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="review_claims",
+    )
+    claim_expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "claim_expires_at"],
+                name="article_review_queue_idx",
+            ),
+            # The admin's status and is_deleted filters.
+            models.Index(
+                fields=["is_deleted", "status"],
+                name="article_deleted_status_idx",
+            ),
+            # The order and cursor of the delta-sync API (delta_sync.py).
+            models.Index(
+                fields=["updated_at", "id"], name="article_updated_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Edits to the title or content are recorded as an
+        # ArticleRevision in the same transaction (see revisions.py).
+        from . import revisions
+
+        using = kwargs.get("using") or router.db_for_write(
+            Article, instance=self
+        )
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name != "view_count"
+                and field.attname not in self.get_deferred_fields()
+            ]
+        with transaction.atomic(using=using):
+            previous = revisions.stored_version(
+                self, kwargs.get("update_fields")
+            )
+            super().save(*args, **kwargs)
+            revisions.record(self, previous)
+
     # helper methods:
     def approve(self, editor):
         """Set status to 'approved' and record the editor who approved it."""
@@ -158,6 +232,12 @@ class Article(models.Model):
         """Check if article is in 'approved' status."""
         return self.status == "approved"
 
+    def related_articles(self):
+        """Approved articles precomputed as related (see related.py)."""
+        return Article.objects.filter(
+            linked_from__article_id=self.pk, status="approved", is_deleted=False
+        ).order_by("linked_from__rank")
+
 
 # Create a Category Model
 class Newsletter(models.Model):
@@ -180,9 +260,286 @@ class Newsletter(models.Model):
         return self.title
 
 
+# Newsletter digests (see newsletters.py). A run covers the approved
+# newsletters of one period; last_recipient_id is the resume point.
+class NewsletterDigestRun(models.Model):
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_recipient_id = models.BigIntegerField(default=0)
+    # Messages the mail server refused or could not take.
+    failed_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Digest {self.period_start:%Y-%m-%d} - {self.period_end:%Y-%m-%d}"
+
+
+# One rendered digest per distinct set of newsletters in a run.
+class NewsletterDigest(models.Model):
+    run = models.ForeignKey(
+        NewsletterDigestRun, on_delete=models.CASCADE, related_name="digests"
+    )
+    key = models.CharField(max_length=40)
+    newsletter_ids = models.JSONField(default=list)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    sent_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["run", "key"], name="unique_digest_per_run"
+            )
+        ]
+
+    def __str__(self):
+        return self.subject
+
+
+# Reads per article per hour (see popularity.py). The "most read"
+# rankings sum the buckets of the last 24 hours or 7 days; older
+# buckets are pruned.
+class ArticleViewBucket(models.Model):
+    article = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="view_buckets"
+    )
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["article", "hour"], name="unique_article_view_hour"
+            )
+        ]
+        indexes = [models.Index(fields=["hour"])]
+
+    def __str__(self):
+        return f"{self.article_id} @ {self.hour:%Y-%m-%d %H:00}: {self.views}"
+
+
+# Precomputed "related articles" (see related.py): the top
+# RELATED_ARTICLES_COUNT neighbours of each approved article by TF-IDF
+# cosine similarity, read in rank order by the detail view.
+class RelatedArticle(models.Model):
+    article = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="related_links"
+    )
+    related = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="linked_from"
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ["article", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["article", "rank"], name="unique_related_rank"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.article_id} -> {self.related_id} ({self.score:.2f})"
+
+
+# One row per build_related_articles run. An incremental run covers the
+# articles updated since the last run started.
+class RelatedArticlesBuild(models.Model):
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    incremental = models.BooleanField(default=False)
+    articles = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Related articles build {self.started_at:%Y-%m-%d %H:%M}"
+
+
+# MinHash signature of an article's content (see duplicates.py), kept
+# out of the article table so list queries do not load it.
+# duplicate_of is the most similar earlier article when the estimated
+# similarity reaches DUPLICATE_SIMILARITY.
+class ArticleSignature(models.Model):
+    article = models.OneToOneField(
+        Article,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="signature",
+    )
+    minhash = models.BinaryField()
+    duplicate_of = models.ForeignKey(
+        Article,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    similarity = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Signature of {self.article_id}"
+
+
+# LSH index: one row per band of an article's signature. Articles that
+# share a key agree on every row of that band.
+class ArticleLSHBucket(models.Model):
+    article = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="lsh_buckets"
+    )
+    key = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f"{self.article_id} in {self.key}"
+
+
+# Revision history of an article's title and content (see
+# revisions.py). A revision whose base is its own number is a full
+# snapshot; the others hold a compressed diff against the revision
+# before them, and are rebuilt from snapshot base.
+class ArticleRevision(models.Model):
+    article = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="revisions"
+    )
+    number = models.PositiveIntegerField()
+    base = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["article", "number"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["article", "number"], name="unique_article_revision"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.article_id} revision {self.number}"
+
+    @property
+    def is_snapshot(self):
+        return self.number == self.base
+
+
+# A resized, recompressed copy of an article's image (see
+# thumbnails.py). The file is named after the SHA-256 of its bytes, so
+# it never changes and can be cached forever. source is the original
+# image it was made from; variants of a replaced image are ignored.
+class ArticleImageVariant(models.Model):
+    article = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="image_variants"
+    )
+    source = models.CharField(max_length=255)
+    format = models.CharField(max_length=4)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.FileField(max_length=255)
+
+    class Meta:
+        ordering = ["article", "format", "width"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["article", "format", "width"],
+                name="unique_article_image_variant",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.article_id} {self.format} {self.width}w"
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(unique=True)
 
     def __str__(self):
         return self.name
+
+
+# Slow-query log: one row per normalised SQL fingerprint (see
+# slow_queries.py). The table is pruned to the SLOW_QUERY_LOG_SIZE
+# slowest entries, so it is a rolling top-N.
+class SlowQuery(models.Model):
+    fingerprint = models.CharField(max_length=40, unique=True)
+    normalized_sql = models.TextField()
+    sample_sql = models.TextField()
+    view = models.CharField(max_length=255, blank=True)
+    vendor = models.CharField(max_length=20)
+    explain = models.TextField(blank=True)
+    calls = models.PositiveIntegerField(default=1)
+    total_time = models.FloatField(default=0)
+    max_time = models.FloatField(default=0)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-max_time"]
+
+    def __str__(self):
+        return self.normalized_sql[:80]
+
+    @property
+    def max_ms(self):
+        return self.max_time * 1000
+
+    @property
+    def average_ms(self):
+        return self.total_time * 1000 / self.calls if self.calls else 0
+
+
+# Append-only log of approvals, written in the approving transaction
+# and streamed to readers by the live feed (see live_feed.py). The
+# event ID is the SSE "id", so clients resume with Last-Event-ID.
+# announced_at is set when the approval is claimed for announcing
+# (see announcements.py).
+class ApprovalEvent(models.Model):
+    article = models.ForeignKey(
+        Article, on_delete=models.CASCADE, related_name="approval_events"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    announced_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"Approval of article {self.article_id}"
+
+
+# On-demand profiles of single requests, taken for staff users (see
+# profiling.py). Pruned to the REQUEST_PROFILE_LOG_SIZE latest.
+class RequestProfile(models.Model):
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    view = models.CharField(max_length=255, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration = models.FloatField()
+    db_time = models.FloatField()
+    template_time = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    # [{"function", "calls", "own_ms", "cumulative_ms"}], hottest first.
+    functions = models.JSONField(default=list)
+    # [{"alias", "sql", "ms"}] in execution order.
+    queries = models.JSONField(default=list)
+    # [{"template", "ms"}] in render order.
+    templates = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.method} {self.path}"
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    @property
+    def db_ms(self):
+        return self.db_time * 1000
+
+    @property
+    def template_ms(self):
+        return self.template_time * 1000
@@ -0,0 +1,245 @@
+"""
+This file builds and sends the newsletter digest e-mails.
+
+A digest run collects the approved newsletters of one period and
+mails every reader the ones written by the journalists or published
+by the publishers they follow:
+
+* Readers are read in keyset-paginated chunks (id > last id), so the
+  run never holds the whole reader table in memory.
+* Readers whose subscriptions select the same newsletters receive the
+  same digest, which is rendered once and stored in NewsletterDigest.
+  The number of renders is bounded by the number of distinct digests,
+  not the number of readers.
+* Messages go out one by one over a single SMTP connection that stays
+  open for the whole run (mailer.send_one()). A refused recipient or a
+  dropped connection only fails that message; it is logged, counted
+  in the run's failed_count and not retried.
+* After every batch the run's last_recipient_id, failed_count and each
+  digest's sent_count are saved in one transaction, also when the run
+  stops partway through the batch. A crashed run is resumed by the
+  next invocation from that point, reusing the stored bodies; at most
+  the message in flight is sent twice.
+
+Started by "python manage.py send_newsletter_digest".
+"""
+
+import hashlib
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .mailer import DeliveryReport, send_one
+from .models import (
+    CustomUser,
+    Newsletter,
+    NewsletterDigest,
+    NewsletterDigestRun,
+)
+
+PublisherSubscription = CustomUser.subscriptions_publishers.through
+JournalistSubscription = CustomUser.subscriptions_journalists.through
+
+
+def current_run(since=None):
+    """Return the unfinished run, or start one for the next period."""
+    run = (
+        NewsletterDigestRun.objects.filter(finished_at__isnull=True)
+        .order_by("pk")
+        .first()
+    )
+    if run is not None:
+        return run, True
+
+    now = timezone.now()
+    if since is None:
+        previous = (
+            NewsletterDigestRun.objects.filter(finished_at__isnull=False)
+            .order_by("-period_end")
+            .first()
+        )
+        days = getattr(settings, "NEWSLETTER_DIGEST_DAYS", 7)
+        since = previous.period_end if previous else now - timedelta(days=days)
+    run = NewsletterDigestRun.objects.create(
+        period_start=since, period_end=now
+    )
+    return run, False
+
+
+def digest_key(newsletter_ids):
+    joined = ",".join(str(pk) for pk in sorted(newsletter_ids))
+    return hashlib.sha1(joined.encode("ascii")).hexdigest()
+
+
+class DigestBuilder:
+    """Maps readers to digests and renders each digest once."""
+
+    def __init__(self, run):
+        self.run = run
+        self.newsletters = {
+            newsletter.pk: newsletter
+            for newsletter in Newsletter.objects.filter(
+                approved=True,
+                created_at__gte=run.period_start,
+                created_at__lt=run.period_end,
+            )
+            .select_related("journalist", "publisher")
+            .order_by("-created_at")
+        }
+        self.by_journalist = defaultdict(set)
+        self.by_publisher = defaultdict(set)
+        for newsletter in self.newsletters.values():
+            self.by_journalist[newsletter.journalist_id].add(newsletter.pk)
+            if newsletter.publisher_id:
+                self.by_publisher[newsletter.publisher_id].add(newsletter.pk)
+        # Digests rendered before a crash are reused when resuming.
+        self.digests = {digest.key: digest for digest in run.digests.all()}
+        self.renders = 0
+
+    def selected_newsletters(self, publisher_ids, journalist_ids):
+        selected = set()
+        for publisher_id in publisher_ids:
+            selected |= self.by_publisher.get(publisher_id, set())
+        for journalist_id in journalist_ids:
+            selected |= self.by_journalist.get(journalist_id, set())
+        return selected
+
+    def digest_for(self, newsletter_ids):
+        key = digest_key(newsletter_ids)
+        digest = self.digests.get(key)
+        if digest is None:
+            newsletters = sorted(
+                (self.newsletters[pk] for pk in newsletter_ids),
+                key=lambda newsletter: newsletter.created_at,
+                reverse=True,
+            )
+            digest = NewsletterDigest.objects.create(
+                run=self.run,
+                key=key,
+                newsletter_ids=sorted(newsletter_ids),
+                subject=(
+                    f"Your newsletter digest: {len(newsletters)} new "
+                    f"newsletter{'s' if len(newsletters) != 1 else ''}"
+                ),
+                body=render_to_string(
+                    "newsApp/email/newsletter_digest.txt",
+                    {"newsletters": newsletters, "run": self.run},
+                ),
+            )
+            self.digests[key] = digest
+            self.renders += 1
+        return digest
+
+
+def reader_chunks(after_id, chunk_size):
+    """Yield (id, email) chunks of active readers with id > after_id."""
+    readers = (
+        CustomUser.objects.filter(role="reader", is_active=True)
+        .exclude(email="")
+        .order_by("pk")
+    )
+    while True:
+        chunk = list(
+            readers.filter(pk__gt=after_id).values_list("pk", "email")[
+                :chunk_size
+            ]
+        )
+        if not chunk:
+            return
+        yield chunk
+        after_id = chunk[-1][0]
+
+
+def subscriptions_for(reader_ids):
+    publishers = defaultdict(list)
+    journalists = defaultdict(list)
+    for reader_id, publisher_id in PublisherSubscription.objects.filter(
+        customuser_id__in=reader_ids
+    ).values_list("customuser_id", "publisher_id"):
+        publishers[reader_id].append(publisher_id)
+    for reader_id, journalist_id in JournalistSubscription.objects.filter(
+        from_customuser_id__in=reader_ids
+    ).values_list("from_customuser_id", "to_customuser_id"):
+        journalists[reader_id].append(journalist_id)
+    return publishers, journalists
+
+
+def send_digests(since=None, chunk_size=500, batch_size=100):
+    """
+    Run (or resume) a digest run and return a summary dict with the
+    run, the number of messages sent and failed and the number of
+    digests rendered.
+    """
+    run, resumed = current_run(since)
+    builder = DigestBuilder(run)
+    from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@example.com")
+    report = DeliveryReport()
+
+    if builder.newsletters:
+        connection = get_connection()
+        connection.open()
+        try:
+            for chunk in reader_chunks(run.last_recipient_id, chunk_size):
+                publishers, journalists = subscriptions_for(
+                    [reader_id for reader_id, _ in chunk]
+                )
+                for start in range(0, len(chunk), batch_size):
+                    batch = chunk[start : start + batch_size]
+                    counts = Counter()
+                    failed_before = len(report.failed)
+                    last_id = run.last_recipient_id
+                    try:
+                        for reader_id, email in batch:
+                            selected = builder.selected_newsletters(
+                                publishers[reader_id], journalists[reader_id]
+                            )
+                            if selected:
+                                digest = builder.digest_for(selected)
+                                message = EmailMessage(
+                                    digest.subject,
+                                    digest.body,
+                                    from_email,
+                                    [email],
+                                )
+                                if send_one(connection, message, report):
+                                    counts[digest.pk] += 1
+                            last_id = reader_id
+                    finally:
+                        # Readers already mailed are not mailed again
+                        # when the run is resumed.
+                        record_progress(
+                            run,
+                            last_id,
+                            counts,
+                            len(report.failed) - failed_before,
+                        )
+        finally:
+            connection.close()
+
+    run.finished_at = timezone.now()
+    run.save(update_fields=["finished_at"])
+    return {
+        "run": run,
+        "resumed": resumed,
+        "sent": report.sent,
+        "failed": len(report.failed),
+        "rendered": builder.renders,
+        "digests": len(builder.digests),
+    }
+
+
+def record_progress(run, last_recipient_id, counts, failed=0):
+    with transaction.atomic():
+        run.last_recipient_id = last_recipient_id
+        run.failed_count += failed
+        run.save(update_fields=["last_recipient_id", "failed_count"])
+        for digest_id, count in counts.items():
+            NewsletterDigest.objects.filter(pk=digest_id).update(
+                sent_count=F("sent_count") + count
+            )
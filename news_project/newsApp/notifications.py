@@ -0,0 +1,67 @@
+"""
+This file e-mails subscribers when an article is approved.
+
+Each subscriber gets their own personalised message, so no recipient
+list is exposed and no single envelope grows with the number of
+subscribers. Messages are handed to mailer.send_in_batches(), which
+reuses one SMTP connection per batch, applies the configured rate
+limit and reports the failures instead of silently dropping them.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db.models import Q
+
+from .mailer import send_in_batches
+from .models import CustomUser
+
+logger = logging.getLogger("newsApp.notifications")
+
+
+def subscribers(article):
+    """(username, email) of readers following the author or publisher."""
+    follows = Q(subscriptions_journalists=article.author_id)
+    if article.publisher_id:
+        follows |= Q(subscriptions_publishers=article.publisher_id)
+    recipients = {}
+    for username, email in (
+        CustomUser.objects.filter(follows, is_active=True)
+        .exclude(email="")
+        .values_list("username", "email")
+        .distinct()
+    ):
+        recipients.setdefault(email, username)
+    return [(username, email) for email, username in recipients.items()]
+
+
+def approval_messages(article, recipients):
+    from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@example.com")
+    subject = f"New Article Published: {article.title}"
+    body = (
+        f"A new article titled '{article.title}' by "
+        f"{article.author.username} "
+        f"has just been approved.\n\n"
+        f"Content Preview:\n{article.content[:200]}..."
+    )
+    for username, email in recipients:
+        yield EmailMessage(
+            subject, f"Hello {username},\n\n{body}", from_email, [email]
+        )
+
+
+def notify_subscribers(article):
+    """Mail every subscriber about a newly approved article."""
+    recipients = subscribers(article)
+    if not recipients:
+        return None
+    report = send_in_batches(approval_messages(article, recipients))
+    logger.info(
+        "Approval of article %s: %d notified, %d failed in %d batches.",
+        article.pk,
+        report.sent,
+        len(report.failed),
+        report.batches,
+    )
+    return report
@@ -0,0 +1,85 @@
+"""
+This file serves the choices of the publisher and category pickers in
+ArticleForm.
+
+A journalist may only file under the publishers they write for
+(Publisher.journalists). The form renders each picker with just its
+selected option (forms.AutocompleteSelect), and static/newsApp/js/
+autocomplete.js fetches the rest from the article_field_options view
+as the journalist types. Rendering and validating the form therefore
+cost the same however many publishers exist. Validation looks up only
+the submitted ID, within the journalist's publishers.
+
+The option lists are cached: the category list once for everyone, the
+publisher list per journalist. Keys carry a version token, which
+invalidate() replaces when a publisher or category is saved or
+deleted, or a publisher's journalists change (see signals.py).
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Category, Publisher
+
+VERSION_KEY = "article_options_version"
+MAX_RESULTS = 20
+
+
+def querysets(user):
+    """{field: queryset of the choices user may pick}."""
+    return {
+        "publisher": Publisher.objects.filter(journalists=user),
+        "category": Category.objects.all(),
+    }
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def options(field, user):
+    """[(id, name)] of the choices of field for user, sorted by name."""
+    scope = user.pk if field == "publisher" else "all"
+    key = f"article_options:{field}:{scope}:{_version()}"
+    choices = cache.get(key)
+    if choices is None:
+        choices = list(
+            querysets(user)[field].order_by("name").values_list("id", "name")
+        )
+        cache.set(
+            key,
+            choices,
+            getattr(settings, "ARTICLE_OPTIONS_CACHE_SECONDS", 300),
+        )
+    return choices
+
+
+def search(field, user, term):
+    """
+    Up to MAX_RESULTS choices of field whose name contains term, and
+    whether there were more.
+    """
+    term = term.strip().casefold()
+    matches = [
+        (pk, name)
+        for pk, name in options(field, user)
+        if term in name.casefold()
+    ]
+    return matches[:MAX_RESULTS], len(matches) > MAX_RESULTS
+
+
+def _bump():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate():
+    """Drop every cached option list, now and on commit."""
+    _bump()
+    transaction.on_commit(_bump)
@@ -0,0 +1,261 @@
+"""
+This file counts article reads and ranks the most read articles.
+
+Writing each read straight away would make every popular article a
+hot row that all workers queue on. Instead, ViewCounter keeps this
+process's reads in memory, keyed by (article, hour). flush() then
+writes them out in bulk:
+
+* one INSERT (ignoring conflicts) that creates the missing hour buckets,
+* one UPDATE per buffered hour that adds to the buckets with a CASE,
+* one UPDATE that adds to Article.view_count, also with a CASE.
+
+A flush therefore costs a few statements however many reads it
+carries. A flush is due every VIEW_COUNT_FLUSH_SECONDS, or as soon as
+VIEW_COUNT_MAX_PENDING (article, hour) pairs are waiting. Flushes run
+on a background thread, started by the first read, which the read
+that fills the buffer wakes up: a reader's request only touches the
+buffer, so it neither waits on the UPDATEs nor is pinned to the
+primary (routers.py) for having written. The flush writes to the
+primary explicitly, and the buffer is flushed when the process exits.
+A worker that is killed loses the reads it has not flushed yet: at
+most one flush interval of its own traffic, which is fine for a
+popularity signal.
+
+most_read() sums the hourly buckets of the last 24 hours or 7 days,
+to the hour. The ranking is cached for MOST_READ_CACHE_SECONDS and
+shared by the web page and the API.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, models, router, transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.utils import timezone
+
+from .models import Article, ArticleViewBucket
+
+logger = logging.getLogger("newsApp.popularity")
+
+PERIODS = {"24h": timedelta(hours=24), "7d": timedelta(days=7)}
+
+
+def hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _increments(field, counts):
+    # CASE WHEN field IN (...) THEN n ... END, for one bulk UPDATE. Most
+    # articles share small counts, so grouping by count keeps the CASE
+    # (and Django's work compiling it) short.
+    by_count = defaultdict(list)
+    for pk, n in counts.items():
+        by_count[n].append(pk)
+    return Case(
+        *[
+            When(**{f"{field}__in": pks}, then=Value(n))
+            for n, pks in by_count.items()
+        ],
+        default=Value(0),
+        output_field=models.PositiveBigIntegerField(),
+    )
+
+
+def write_views(pending):
+    """Add a {(article_id, hour): reads} mapping to the database."""
+    by_hour = defaultdict(Counter)
+    totals = Counter()
+    for (article_id, hour), reads in pending.items():
+        by_hour[hour][article_id] += reads
+        totals[article_id] += reads
+    # The flush runs outside any request, so it picks the primary
+    # itself rather than leave the existence check to a replica.
+    alias = router.db_for_write(Article)
+    # Articles deleted since they were read are dropped.
+    existing = set(
+        Article.objects.db_manager(alias)
+        .filter(pk__in=totals)
+        .values_list("pk", flat=True)
+    )
+    if not existing:
+        return
+    with transaction.atomic(using=alias):
+        ArticleViewBucket.objects.db_manager(alias).bulk_create(
+            [
+                ArticleViewBucket(article_id=article_id, hour=hour)
+                for hour, counts in by_hour.items()
+                for article_id in counts
+                if article_id in existing
+            ],
+            ignore_conflicts=True,
+            batch_size=500,
+        )
+        for hour, counts in by_hour.items():
+            ArticleViewBucket.objects.db_manager(alias).filter(
+                hour=hour, article_id__in=existing & counts.keys()
+            ).update(views=F("views") + _increments("article_id", counts))
+        Article.objects.db_manager(alias).filter(pk__in=existing).update(
+            view_count=F("view_count") + _increments("pk", totals)
+        )
+
+
+def prune(now=None):
+    """Delete the buckets that no ranking period covers any more."""
+    now = now or timezone.now()
+    oldest = hour_of(now - max(PERIODS.values()))
+    return (
+        ArticleViewBucket.objects.db_manager(
+            router.db_for_write(ArticleViewBucket)
+        )
+        .filter(hour__lt=oldest)
+        .delete()[0]
+    )
+
+
+class ViewCounter:
+    """Buffers reads in memory and writes them out in bulk."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.last_flush = time.monotonic()
+        self.pruned_hour = None
+        self.timer = None
+        self.wakeup = threading.Event()
+
+    def record(self, article_id, now=None):
+        """Count one read; return True when a flush is due."""
+        key = (article_id, hour_of(now or timezone.now()))
+        max_pending = getattr(settings, "VIEW_COUNT_MAX_PENDING", 1000)
+        with self.lock:
+            self.pending[key] += 1
+            if self.timer is None:
+                self._start_timer()
+            full = len(self.pending) >= max_pending
+            due = full or self._due()
+        if full:
+            self.wakeup.set()
+        return due
+
+    def _due(self):
+        flush_seconds = getattr(settings, "VIEW_COUNT_FLUSH_SECONDS", 10)
+        return time.monotonic() - self.last_flush >= flush_seconds
+
+    def _start_timer(self):
+        # Started by the first read, so processes that serve no article
+        # run no thread.
+        self.timer = threading.Thread(
+            target=self._run, name="view-counter", daemon=True
+        )
+        self.timer.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(getattr(settings, "VIEW_COUNT_FLUSH_SECONDS", 10))
+            self.wakeup.clear()
+            try:
+                self.flush_if_due()
+            except Exception:
+                logger.exception("View count flush failed.")
+            finally:
+                # The thread's own connections; not held while it waits.
+                connections.close_all()
+
+    def flush_if_due(self):
+        """Flush when the buffer is full or the interval has passed."""
+        max_pending = getattr(settings, "VIEW_COUNT_MAX_PENDING", 1000)
+        with self.lock:
+            due = bool(self.pending) and (
+                len(self.pending) >= max_pending or self._due()
+            )
+        return self.flush() if due else 0
+
+    def take(self):
+        """Empty the buffer and return what it held."""
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            self.last_flush = time.monotonic()
+        return pending
+
+    def flush(self):
+        """Write the buffered reads and return how many were written."""
+        pending = self.take()
+        if not pending:
+            return 0
+        try:
+            write_views(pending)
+        except DatabaseError:
+            # Keep the reads for the next flush.
+            with self.lock:
+                self.pending.update(pending)
+            logger.exception("Could not flush %d view counts.", len(pending))
+            return 0
+
+        hour = hour_of(timezone.now())
+        if hour != self.pruned_hour:
+            self.pruned_hour = hour
+            prune()
+        return sum(pending.values())
+
+
+view_counter = ViewCounter()
+
+
+def count_view(article_id):
+    # Only buffered: the timer thread writes it out.
+    view_counter.record(article_id)
+
+
+async def acount_view(article_id):
+    # Takes a lock for a dict update, so it does not need a thread.
+    view_counter.record(article_id)
+
+
+def rank(period, limit):
+    """[(article_id, views)] of the most read approved articles."""
+    since = hour_of(timezone.now() - PERIODS[period])
+    return [
+        (row["article_id"], row["total"])
+        for row in ArticleViewBucket.objects.filter(
+            hour__gte=since,
+            article__status="approved",
+            article__is_deleted=False,
+        )
+        .values("article_id")
+        .annotate(total=Sum("views"))
+        .order_by("-total", "article_id")[:limit]
+    ]
+
+
+def most_read(period="24h", limit=None):
+    """Cached ranking for a period in PERIODS ("24h" or "7d")."""
+    if limit is None:
+        limit = getattr(settings, "MOST_READ_LIMIT", 10)
+    key = f"most_read:{period}:{limit}"
+    ranking = cache.get(key)
+    if ranking is None:
+        ranking = rank(period, limit)
+        cache.set(
+            key, ranking, getattr(settings, "MOST_READ_CACHE_SECONDS", 60)
+        )
+    return ranking
+
+
+def ranked_articles(queryset, ranking):
+    """The ranked articles of queryset, in ranking order, with .views set."""
+    articles = queryset.in_bulk([article_id for article_id, _ in ranking])
+    ranked = []
+    for article_id, views in ranking:
+        article = articles.get(article_id)
+        if article is not None:
+            article.views = views
+            ranked.append(article)
+    return ranked
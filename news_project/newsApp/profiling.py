@@ -0,0 +1,120 @@
+"""
+This file implements on-demand profiling of single requests, for
+reproducing a slow page or API call as the user who hit it saw it.
+
+A staff user adds ?profile=1 to the URL, or sends "X-Profile: 1".
+RequestProfilingMiddleware (see middleware.py) then runs the request
+under cProfile and attaches a Profile to the request's metrics record,
+to which metrics.db_timer and metrics.TimedTemplate report every query
+and template render. When the response is ready the report is stored
+as a RequestProfile:
+
+* the TOP_FUNCTIONS functions with the most time of their own, with
+  call counts and cumulative times,
+* every query in execution order with its time (up to MAX_QUERIES),
+  as parameterised SQL: parameters (session keys, e-mail addresses,
+  tokens) are not stored, and quoted literals are redacted,
+* every template rendered, with its time.
+
+The response links to the report in an X-Profile-URL header. Reports
+are listed on the staff-only /profiles/ page and pruned to the
+REQUEST_PROFILE_LOG_SIZE latest.
+
+Requests without the trigger only pay for checking it. Requests from
+other users are served as usual even with it. Under ASGI, cProfile
+sees only the event loop's thread, and everything that runs there
+meanwhile. The query and template lists are exact either way.
+"""
+
+import cProfile
+import pstats
+
+from django.conf import settings
+
+from .models import RequestProfile
+from .slow_queries import redact
+
+TRIGGER_PARAMETER = "profile"
+TRIGGER_HEADER = "X-Profile"
+TOP_FUNCTIONS = 40
+MAX_QUERIES = 1000
+
+
+def requested(request):
+    return (
+        request.GET.get(TRIGGER_PARAMETER) == "1"
+        or request.headers.get(TRIGGER_HEADER) == "1"
+    )
+
+
+class Profile:
+    """What one profiled request did."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.query_count = 0
+        self.db_time = 0.0
+        self.templates = []
+
+    def add_query(self, alias, sql, params, many, duration):
+        self.query_count += 1
+        self.db_time += duration
+        if len(self.queries) < MAX_QUERIES:
+            self.queries.append(
+                {"alias": alias, "sql": redact(sql), "ms": duration * 1000}
+            )
+
+    def add_template(self, name, duration):
+        self.templates.append({"template": name, "ms": duration * 1000})
+
+    def functions(self):
+        stats = pstats.Stats(self.profiler).stats
+        # Each entry is (primitive calls, calls, own time, cumulative
+        # time, callers), keyed by (file, line, function).
+        hottest = sorted(
+            stats.items(), key=lambda item: item[1][2], reverse=True
+        )[:TOP_FUNCTIONS]
+        return [
+            {
+                "function": pstats.func_std_string(function),
+                "calls": calls,
+                "own_ms": own_time * 1000,
+                "cumulative_ms": cumulative_time * 1000,
+            }
+            for function, (_, calls, own_time, cumulative_time, _) in hottest
+        ]
+
+
+def save(request, response, profile, duration):
+    """Store the report of a profiled request; returns the RequestProfile."""
+    match = request.resolver_match
+    entry = RequestProfile.objects.create(
+        user_id=request.user.pk,
+        method=request.method,
+        path=request.get_full_path(),
+        view=match.view_name if match else "",
+        status_code=response.status_code,
+        duration=duration,
+        db_time=profile.db_time,
+        template_time=sum(tpl["ms"] for tpl in profile.templates) / 1000,
+        query_count=profile.query_count,
+        functions=profile.functions(),
+        queries=profile.queries,
+        templates=profile.templates,
+    )
+    prune()
+    return entry
+
+
+def prune(size=None):
+    """Keep only the REQUEST_PROFILE_LOG_SIZE latest reports."""
+    if size is None:
+        size = getattr(settings, "REQUEST_PROFILE_LOG_SIZE", 50)
+    stale = list(
+        RequestProfile.objects.order_by("-created_at").values_list(
+            "pk", flat=True
+        )[size:]
+    )
+    if stale:
+        RequestProfile.objects.filter(pk__in=stale).delete()
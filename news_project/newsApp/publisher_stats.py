@@ -0,0 +1,166 @@
+"""
+This file builds the publisher pages and the publisher stats API.
+
+get(pk) returns a publisher's stats as a plain dict in three parts,
+each loaded by a few grouped queries and cached on its own:
+
+* "profile": name, description, and the editor and journalist roster,
+* "articles": the RECENT_ARTICLES latest approved articles and the
+  number of approved articles per category (one GROUP BY),
+* "subscribers": the number of readers following the publisher (one
+  COUNT on the indexed subscription table).
+
+Each part has a version token per publisher, under
+"publisher_stats_version:<pk>:<part>", and is stored under
+"publisher_stats:<RECORD_FORMAT>:<pk>:<part>:<token>". invalidate()
+replaces the tokens of the parts a change affects, now and when the
+transaction commits, so an approval reloads only the articles part,
+and a new subscriber only the count. signals.py connects approvals,
+subscription and roster changes and renames; the admin's bulk actions
+call invalidate() themselves. The loaders read from the primary, so a
+part reloaded right after a bump cannot come from a lagging replica. A
+page view costs two cache round trips whatever the size of the
+publisher.
+"""
+
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import Count
+
+from .models import Article, CustomUser, Publisher
+
+RECORD_FORMAT = 1
+RECENT_ARTICLES = 10
+PARTS = ("profile", "articles", "subscribers")
+
+PublisherSubscription = CustomUser.subscriptions_publishers.through
+
+
+def _timeout():
+    return getattr(settings, "PUBLISHER_STATS_CACHE_SECONDS", 600)
+
+
+def _version_key(pk, part):
+    return f"publisher_stats_version:{pk}:{part}"
+
+
+def _key(pk, part, version):
+    return f"publisher_stats:{RECORD_FORMAT}:{pk}:{part}:{version}"
+
+
+def _objects(model):
+    # Parts are stored under the freshly bumped token, so every loader
+    # reads from the primary.
+    return model.objects.db_manager(router.db_for_write(model))
+
+
+def _roster(through, pk):
+    return [
+        {"id": user_id, "username": username}
+        for user_id, username in _objects(through)
+        .filter(publisher_id=pk)
+        .order_by("customuser__username")
+        .values_list("customuser_id", "customuser__username")
+    ]
+
+
+def load_profile(pk):
+    publisher = (
+        _objects(Publisher)
+        .filter(pk=pk)
+        .values("id", "name", "description")
+        .first()
+    )
+    if publisher is None:
+        return {}
+    publisher["editors"] = _roster(Publisher.editors.through, pk)
+    publisher["journalists"] = _roster(Publisher.journalists.through, pk)
+    return publisher
+
+
+def load_articles(pk):
+    published = _objects(Article).filter(
+        publisher_id=pk, status="approved", is_deleted=False
+    )
+    return {
+        "recent_articles": list(
+            published.order_by("-created_at").values(
+                "id",
+                "title",
+                "created_at",
+                "author__username",
+                "category__name",
+            )[:RECENT_ARTICLES]
+        ),
+        "articles_by_category": list(
+            published.values("category__slug", "category__name")
+            .annotate(articles=Count("id"))
+            .order_by("-articles", "category__name")
+        ),
+    }
+
+
+def load_subscribers(pk):
+    return {
+        "subscriber_count": _objects(PublisherSubscription)
+        .filter(publisher_id=pk)
+        .count()
+    }
+
+
+LOADERS = {
+    "profile": load_profile,
+    "articles": load_articles,
+    "subscribers": load_subscribers,
+}
+
+
+def get(pk):
+    """The stats of publisher pk, or None if it does not exist."""
+    version_keys = {part: _version_key(pk, part) for part in PARTS}
+    versions = cache.get_many(version_keys.values())
+    missing = {
+        key: uuid.uuid4().hex
+        for key in version_keys.values()
+        if key not in versions
+    }
+    if missing:
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        versions.update(cache.get_many(missing))
+    keys = {
+        part: _key(pk, part, versions[version_keys[part]]) for part in PARTS
+    }
+    cached = cache.get_many(keys.values())
+
+    stats, fresh = {}, {}
+    for part in PARTS:
+        record = cached.get(keys[part])
+        if record is None:
+            record = fresh[keys[part]] = LOADERS[part](pk)
+        if not record:
+            # No such publisher: its profile is empty (and cached too).
+            stats = None
+            break
+        stats.update(record)
+    if fresh:
+        cache.set_many(fresh, _timeout())
+    return stats
+
+
+def _bump(part, pks):
+    cache.set_many(
+        {_version_key(pk, part): uuid.uuid4().hex for pk in pks}, timeout=None
+    )
+
+
+def invalidate(part, *pks):
+    """Drop one part of these publishers' cached stats, now and on commit."""
+    pks = {pk for pk in pks if pk is not None}
+    if pks:
+        _bump(part, pks)
+        transaction.on_commit(partial(_bump, part, pks))
@@ -0,0 +1,272 @@
+"""
+This file precomputes the "related articles" shown on article pages.
+
+build() turns the title and content of every approved article into a
+TF-IDF vector with NumPy:
+
+* tokens are lower-cased words, and title words count TITLE_WEIGHT
+  times;
+* term frequencies are sublinear (1 + log tf) and weighted by a
+  smoothed IDF;
+* terms found in only one article, or in more than MAX_DF of them,
+  cannot tell articles apart and are dropped;
+* if more terms remain than the vectors have dimensions, the terms are
+  hashed into the dimensions with a random sign, so that collisions
+  cancel out on average instead of adding up.
+
+The vectors are the L2-normalised float32 rows of one dense matrix, so
+cosine similarity is a matrix product. Scores are computed for
+block_size articles at a time against the whole matrix, and only the
+top k of each row are kept (argpartition). Memory therefore stays at
+block_size x articles on top of the matrix itself.
+
+A full build replaces every RelatedArticle row. An incremental build
+scores only the articles updated (for example approved) since the last
+build against all the others. It then offers them to the others'
+existing lists, without recomputing those lists' scores; run a full
+build now and then to pick up IDF drift. The vectors are rebuilt every
+time: tokenising is linear, and only the scoring is quadratic.
+
+Started by "python manage.py build_related_articles".
+"""
+
+import re
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Article, RelatedArticle, RelatedArticlesBuild
+
+WORD_RE = re.compile(r"[^\W\d_]{2,}")
+TITLE_WEIGHT = 2
+MAX_DF = 0.5
+
+
+def tokenize(text):
+    return WORD_RE.findall(text.lower())
+
+
+def term_counts(title, content):
+    counts = Counter(tokenize(content))
+    for token in tokenize(title):
+        counts[token] += TITLE_WEIGHT
+    return counts
+
+
+class Corpus:
+    """Articles as compact (term ids, counts) arrays."""
+
+    def __init__(self):
+        self.ids = []
+        self.terms = {}
+        self.documents = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, article_id, title, content):
+        counts = term_counts(title, content)
+        term_ids = np.fromiter(
+            (self.terms.setdefault(term, len(self.terms)) for term in counts),
+            dtype=np.int32,
+            count=len(counts),
+        )
+        frequencies = np.fromiter(
+            counts.values(), dtype=np.float32, count=len(counts)
+        )
+        self.ids.append(article_id)
+        self.documents.append((term_ids, frequencies))
+
+    def matrix(self, dimensions=2048):
+        """The L2-normalised TF-IDF matrix, one float32 row per article."""
+        count = len(self.documents)
+        df = np.zeros(len(self.terms), dtype=np.int64)
+        for term_ids, _ in self.documents:
+            df[term_ids] += 1
+        kept = np.flatnonzero((df >= 2) & (df <= max(2, MAX_DF * count)))
+
+        columns = np.full(len(self.terms), -1, dtype=np.int64)
+        weights = np.zeros(len(self.terms), dtype=np.float32)
+        weights[kept] = np.log((1 + count) / (1 + df[kept])) + 1
+        if len(kept) <= dimensions:
+            width = max(1, len(kept))
+            columns[kept] = np.arange(len(kept))
+        else:
+            width = dimensions
+            terms = list(self.terms)
+            for term_id in kept:
+                digest = zlib.crc32(terms[term_id].encode("utf-8"))
+                columns[term_id] = digest % dimensions
+                if digest & 0x80000000:
+                    weights[term_id] = -weights[term_id]
+
+        matrix = np.zeros((count, width), dtype=np.float32)
+        for row, (term_ids, frequencies) in enumerate(self.documents):
+            mask = columns[term_ids] >= 0
+            term_ids = term_ids[mask]
+            np.add.at(
+                matrix[row],
+                columns[term_ids],
+                (1 + np.log(frequencies[mask])) * weights[term_ids],
+            )
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+def top_neighbours(matrix, rows, k, block_size=512, candidates=None):
+    """
+    The k rows of candidates (default: all rows) most similar to each of
+    rows, excluding the row itself. Returns (indices, scores) arrays of
+    shape (len(rows), k), best first.
+    """
+    if candidates is None:
+        candidates = np.arange(len(matrix))
+    k = min(k, len(candidates))
+    indices = np.zeros((len(rows), k), dtype=np.int64)
+    scores = np.zeros((len(rows), k), dtype=np.float32)
+    if not k:
+        return indices, scores
+    others = matrix[candidates].T
+    for start in range(0, len(rows), block_size):
+        block = rows[start : start + block_size]
+        similarity = matrix[block] @ others
+        similarity[block[:, None] == candidates[None, :]] = -1
+        if k < len(candidates):
+            top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(k), (len(block), k))
+        top_scores = np.take_along_axis(similarity, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        end = start + len(block)
+        indices[start:end] = candidates[np.take_along_axis(top, order, 1)]
+        scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+
+def _links(ids, rows, indices, scores):
+    # {article id: [(related id, score)]}, dropping unrelated (score 0).
+    return {
+        int(ids[row]): [
+            (int(ids[index]), float(score))
+            for index, score in zip(row_indices, row_scores)
+            if score > 0
+        ]
+        for row, row_indices, row_scores in zip(rows, indices, scores)
+    }
+
+
+def load_corpus():
+    corpus = Corpus()
+    for article_id, title, content in (
+        Article.objects.filter(status="approved", is_deleted=False)
+        .order_by("pk")
+        .values_list("pk", "title", "content")
+        .iterator(chunk_size=2000)
+    ):
+        corpus.add(article_id, title, content)
+    return corpus
+
+
+def _chunks(items, size=1000):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def merge_new_links(ids, changed_rows, indices, scores, k):
+    """
+    Merge the changed articles (candidates) into the stored lists of the
+    other articles, returning only the lists that change.
+    """
+    changed = {int(ids[row]) for row in changed_rows}
+    offers = {
+        article_id: links
+        for article_id, links in _links(
+            ids, np.arange(len(ids)), indices, scores
+        ).items()
+        if links and article_id not in changed
+    }
+    current = defaultdict(list)
+    for chunk in _chunks(offers):
+        for article_id, related_id, score in RelatedArticle.objects.filter(
+            article_id__in=chunk
+        ).values_list("article_id", "related_id", "score"):
+            current[article_id].append((related_id, score))
+
+    merged = {}
+    for article_id, links in offers.items():
+        kept = [link for link in current[article_id] if link[0] not in changed]
+        best = sorted(kept + links, key=lambda link: -link[1])[:k]
+        if best != sorted(current[article_id], key=lambda link: -link[1]):
+            merged[article_id] = best
+    return merged
+
+
+def save_links(links, replace_all=False):
+    with transaction.atomic():
+        if replace_all:
+            RelatedArticle.objects.all().delete()
+        else:
+            for chunk in _chunks(links):
+                RelatedArticle.objects.filter(article_id__in=chunk).delete()
+        RelatedArticle.objects.bulk_create(
+            (
+                RelatedArticle(
+                    article_id=article_id,
+                    related_id=related_id,
+                    rank=rank,
+                    score=score,
+                )
+                for article_id, related in links.items()
+                for rank, (related_id, score) in enumerate(related, 1)
+            ),
+            batch_size=1000,
+        )
+
+
+def build(incremental=False, k=None, dimensions=2048, block_size=512):
+    """
+    Rebuild the related-article lists (or update them for the articles
+    changed since the last build) and return the RelatedArticlesBuild.
+    """
+    if k is None:
+        k = getattr(settings, "RELATED_ARTICLES_COUNT", 5)
+    last = (
+        RelatedArticlesBuild.objects.filter(finished_at__isnull=False)
+        .order_by("-started_at")
+        .first()
+    )
+    run = RelatedArticlesBuild.objects.create(
+        started_at=timezone.now(), incremental=incremental and last is not None
+    )
+
+    corpus = load_corpus()
+    ids = np.array(corpus.ids, dtype=np.int64)
+    matrix = corpus.matrix(dimensions)
+    if run.incremental:
+        changed = Article.objects.filter(
+            updated_at__gte=last.started_at
+        ).values_list("pk", flat=True)
+        rows = np.flatnonzero(np.isin(ids, list(changed)))
+    else:
+        rows = np.arange(len(ids))
+
+    indices, scores = top_neighbours(matrix, rows, k, block_size)
+    links = _links(ids, rows, indices, scores)
+    if run.incremental and len(rows):
+        # Offer the changed articles to everybody else's lists.
+        indices, scores = top_neighbours(
+            matrix, np.arange(len(ids)), k, block_size, candidates=rows
+        )
+        links.update(merge_new_links(ids, rows, indices, scores, k))
+    save_links(links, replace_all=not run.incremental)
+
+    run.articles = len(rows)
+    run.finished_at = timezone.now()
+    run.save(update_fields=["articles", "finished_at"])
+    return run
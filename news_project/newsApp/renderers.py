@@ -0,0 +1,48 @@
+"""
+Contains the JSON renderer used by the API views.
+
+FastJSONRenderer produces the same bytes as DRF's JSONRenderer with
+the default (compact, unicode) settings, but encodes with orjson when
+it is installed. Without orjson, for indented output, or for data
+orjson cannot encode (non-string keys, very large integers) it uses
+DRF's standard encoder.
+
+Dates and other non-JSON types are handed back to DRF's encoder so
+they are formatted exactly as before. Floats in exponent notation are
+written differently by the two encoders; the article API does not
+return any.
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.encoder_class is not JSONEncoder
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=JSONEncoder().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Match JSONRenderer, which escapes these for JavaScript.
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
@@ -0,0 +1,126 @@
+"""
+This file hands out pending articles to editors for review.
+
+An editor claims the next REVIEW_CLAIM_BATCH pending articles that no
+one holds, oldest first, for REVIEW_CLAIM_SECONDS. The approval page
+shows each editor only their own claims, so two editors never open the
+same article, and opening the page renews the lease. When a lease runs
+out (the editor went home), the article can be claimed again; no
+clean-up job is needed.
+
+On databases with SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8,
+PostgreSQL), claim_next() locks its candidate rows and skips the rows
+other editors are claiming at that moment. Concurrent claims therefore
+neither wait on each other nor collide, and adding editors adds
+throughput. SQLite has no row locks. There, the candidates are claimed
+with a conditional UPDATE (only if still claimable), and the editor
+keeps the rows it won and tries again for the rest.
+
+An editor may decide on an article they hold, or on one no one holds.
+An article held by someone else cannot be decided.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Article
+
+CLAIM_ATTEMPTS = 3
+
+
+def lease():
+    return timedelta(seconds=getattr(settings, "REVIEW_CLAIM_SECONDS", 900))
+
+
+def _articles():
+    # Claims are read back right after being written, so every query
+    # here goes to the primary.
+    return Article.objects.db_manager(router.db_for_write(Article))
+
+
+def pending():
+    return _articles().filter(status="pending", is_deleted=False)
+
+
+def claimable(now):
+    return pending().filter(
+        Q(claim_expires_at__isnull=True) | Q(claim_expires_at__lte=now)
+    )
+
+
+def claim_next(editor, count=None):
+    """Claim up to count unclaimed pending articles; return their ids."""
+    if count is None:
+        count = getattr(settings, "REVIEW_CLAIM_BATCH", 10)
+    now = timezone.now()
+    expires = now + lease()
+    queue = claimable(now).order_by("created_at", "pk")
+    db = queue.db
+
+    if connections[db].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=db):
+            ids = list(
+                queue.select_for_update(skip_locked=True).values_list(
+                    "pk", flat=True
+                )[:count]
+            )
+            _articles().filter(pk__in=ids).update(
+                claimed_by=editor, claim_expires_at=expires
+            )
+        return ids
+
+    claimed = []
+    for _ in range(CLAIM_ATTEMPTS):
+        ids = list(queue.values_list("pk", flat=True)[: count - len(claimed)])
+        if not ids:
+            break
+        # Only rows that are still claimable are taken; rows another
+        # editor won in the meantime are left alone.
+        claimable(now).filter(pk__in=ids).update(
+            claimed_by=editor, claim_expires_at=expires
+        )
+        claimed += (
+            _articles()
+            .filter(pk__in=ids, claimed_by=editor, claim_expires_at=expires)
+            .values_list("pk", flat=True)
+        )
+        if len(claimed) >= count:
+            break
+    return claimed
+
+
+def my_claims(editor):
+    """The editor's live claims, oldest first, with their leases renewed."""
+    now = timezone.now()
+    claims = pending().filter(claimed_by=editor, claim_expires_at__gt=now)
+    claims.update(claim_expires_at=now + lease())
+    return claims.select_related("author", "signature__duplicate_of").order_by(
+        "created_at", "pk"
+    )
+
+
+def release(editor, article_ids):
+    """Hand the editor's claims on article_ids back to the queue."""
+    return (
+        pending()
+        .filter(pk__in=article_ids, claimed_by=editor)
+        .update(claimed_by=None, claim_expires_at=None)
+    )
+
+
+def decidable(editor):
+    """Pending articles the editor may approve or reject."""
+    now = timezone.now()
+    return pending().filter(
+        Q(claimed_by=editor)
+        | Q(claim_expires_at__isnull=True)
+        | Q(claim_expires_at__lte=now)
+    )
+
+
+def unclaimed_count():
+    return claimable(timezone.now()).count()
@@ -0,0 +1,194 @@
+"""
+This file keeps the revision history of each article's title and
+content, for the editors' audit trail.
+
+Article.save() calls record() in the same transaction as the save, so
+a revision exists exactly when the edit was committed. Saves that
+leave the title and content unchanged (approving, soft-deleting) add
+no revision. Queryset update() and bulk_create() bypass save() and are
+not recorded; code creating articles in bulk calls record_created().
+
+Storing a full copy of every revision of a long article would make
+the history many times larger than the article table. Instead, one
+revision in REVISION_SNAPSHOT_INTERVAL is a full snapshot. Each of
+the others stores only a diff against the revision before it:
+paragraphs are compared first, and only the paragraphs that changed
+are compared word by word. A diff is a list of (start, end,
+replacement) edits on the previous text, JSON-encoded and compressed
+with zlib, as snapshots are. When a diff would be larger than a
+snapshot (the article was rewritten), a snapshot is stored instead.
+
+Every revision records the snapshot it is rebuilt from (base).
+content_at() reads that snapshot and the diffs after it in one query
+and applies at most REVISION_SNAPSHOT_INTERVAL - 1 diffs, however long
+the history is.
+"""
+
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+from itertools import accumulate
+
+from django.conf import settings
+from django.db.models import Subquery
+
+from .models import Article, ArticleRevision
+
+# Words with their trailing whitespace; joined, they give the text back.
+TOKEN_RE = re.compile(r"\s+|\S+\s*")
+
+
+def snapshot_interval():
+    return max(1, getattr(settings, "REVISION_SNAPSHOT_INTERVAL", 10))
+
+
+def _opcodes(old, new):
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            yield i1, i2, j1, j2
+
+
+def diff(old, new):
+    """The (start, end, replacement) edits that turn old into new."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    line_offsets = list(accumulate(map(len, old_lines), initial=0))
+    edits = []
+    for i1, i2, j1, j2 in _opcodes(old_lines, new_lines):
+        start = line_offsets[i1]
+        old_words = TOKEN_RE.findall("".join(old_lines[i1:i2]))
+        new_words = TOKEN_RE.findall("".join(new_lines[j1:j2]))
+        word_offsets = list(accumulate(map(len, old_words), initial=start))
+        for w1, w2, v1, v2 in _opcodes(old_words, new_words):
+            edits.append(
+                (
+                    word_offsets[w1],
+                    word_offsets[w2],
+                    "".join(new_words[v1:v2]),
+                )
+            )
+    return edits
+
+
+def apply(text, edits):
+    pieces = []
+    position = 0
+    for start, end, replacement in edits:
+        pieces.append(text[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+def content_at(article_id, number):
+    """The content of revision number of the article, or None."""
+    base = ArticleRevision.objects.filter(
+        article_id=article_id, number=number
+    ).values("base")
+    chain = (
+        ArticleRevision.objects.filter(
+            article_id=article_id,
+            number__lte=number,
+            number__gte=Subquery(base),
+        )
+        .order_by("number")
+        .values_list("number", "base", "data")
+    )
+    content = None
+    for revision, revision_base, data in chain:
+        if revision == revision_base:
+            content = _unpack(data)
+        else:
+            content = apply(content, _unpack(data))
+    return content
+
+
+def stored_version(article, update_fields=None):
+    """
+    The (title, content) stored for article before it is saved, with the
+    row locked until the end of the transaction; None for a new article.
+    """
+    if article.pk is None or (
+        update_fields is not None
+        and not {"title", "content"} & set(update_fields)
+    ):
+        return None if article.pk is None else (article.title, article.content)
+    return (
+        Article.objects.select_for_update()
+        .filter(pk=article.pk)
+        .values_list("title", "content")
+        .first()
+    )
+
+
+def _add(article, number, base, title, data):
+    return ArticleRevision.objects.create(
+        article=article, number=number, base=base, title=title, data=data
+    )
+
+
+def record(article, previous):
+    """
+    Add a revision for article if its title or content changed from
+    previous (see stored_version()). Returns the revision or None.
+    """
+    if previous == (article.title, article.content):
+        return None
+    last = (
+        ArticleRevision.objects.filter(article=article)
+        .order_by("-number")
+        .values_list("number", "base", "title")
+        .first()
+    )
+    if last is None and previous is not None:
+        # Edited before the history began: keep the old text first.
+        last = (1, 1, previous[0])
+        _add(article, *last, _pack(previous[1]))
+    if last is None:
+        return _add(article, 1, 1, article.title, _pack(article.content))
+
+    number, base, title = last
+    content = content_at(article.pk, number)
+    if (title, content) == (article.title, article.content):
+        return None
+    snapshot = _pack(article.content)
+    if number + 1 - base >= snapshot_interval():
+        return _add(article, number + 1, number + 1, article.title, snapshot)
+    edits = _pack(diff(content, article.content))
+    if len(edits) >= len(snapshot):
+        return _add(article, number + 1, number + 1, article.title, snapshot)
+    return _add(article, number + 1, base, article.title, edits)
+
+
+def record_created(articles):
+    """Add the first revision of new articles, in one INSERT."""
+    ArticleRevision.objects.bulk_create(
+        ArticleRevision(
+            article=article,
+            number=1,
+            base=1,
+            title=article.title,
+            data=_pack(article.content),
+        )
+        for article in articles
+    )
+
+
+def history(article_id):
+    """(number, created_at, title) of every revision, newest first."""
+    return (
+        ArticleRevision.objects.filter(article_id=article_id)
+        .order_by("-number")
+        .values_list("number", "created_at", "title")
+    )
@@ -0,0 +1,151 @@
+"""
+This file contains the database router used to spread reads over
+read replicas.
+
+PrimaryReplicaRouter sends every write to the "default" (primary)
+database and every read to one of the aliases in DATABASE_REPLICAS.
+With no replicas configured all traffic stays on "default".
+
+Read-your-writes:
+
+* ReplicaPinningMiddleware opens a routing state for each request.
+  As soon as the request writes anything (approving, creating,
+  subscribing ...) the rest of the request reads from the primary.
+* The middleware then sets a short-lived cookie, so the following
+  requests of the same client also read from the primary for
+  REPLICA_PIN_SECONDS, long enough for replication to catch up.
+* Reads inside a transaction on the primary stay on the primary.
+
+Replica lag is checked at most every REPLICA_LAG_CHECK_INTERVAL
+seconds per process. Replicas further behind than
+REPLICA_MAX_LAG_SECONDS (or that cannot be reached) are skipped, and
+if none are healthy reads fall back to the primary.
+"""
+
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+PRIMARY = "default"
+
+_state = ContextVar("newsapp_routing_state", default=None)
+
+
+class RoutingState:
+    """Per-request routing flags."""
+
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def start_routing(pinned=False):
+    state = RoutingState(pinned)
+    return state, _state.set(state)
+
+
+def finish_routing(token):
+    _state.reset(token)
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary (inf if unknown)."""
+    connection = connections[alias]
+    if connection.vendor != "mysql":
+        # SQLite test replicas share the primary's data.
+        return 0
+    try:
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except DatabaseError:
+                # MySQL < 8.0.22 and MariaDB < 10.5.1
+                cursor.execute("SHOW SLAVE STATUS")
+            columns = [column[0] for column in cursor.description or ()]
+            row = cursor.fetchone()
+    except DatabaseError:
+        return float("inf")
+    if row is None:
+        # Not configured as a replica: treat it as fully caught up.
+        return 0
+    status = dict(zip(columns, row))
+    lag = status.get(
+        "Seconds_Behind_Source", status.get("Seconds_Behind_Master")
+    )
+    # NULL means replication is stopped or broken.
+    return float("inf") if lag is None else lag
+
+
+class _LagMonitor:
+    """Caches replica health so lag is not checked on every query."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = {}
+
+    def healthy(self, alias):
+        interval = getattr(settings, "REPLICA_LAG_CHECK_INTERVAL", 5)
+        max_lag = getattr(settings, "REPLICA_MAX_LAG_SECONDS", 5)
+        now = time.monotonic()
+        checked_at, lag = self.checked.get(alias, (None, None))
+        if checked_at is None or now - checked_at >= interval:
+            with self.lock:
+                checked_at, lag = self.checked.get(alias, (None, None))
+                if checked_at is None or now - checked_at >= interval:
+                    lag = replica_lag(alias)
+                    self.checked[alias] = (now, lag)
+        return lag <= max_lag
+
+    def reset(self):
+        with self.lock:
+            self.checked = {}
+
+
+lag_monitor = _LagMonitor()
+
+
+class PrimaryReplicaRouter:
+    # Apps whose reads must always see the latest write.
+    primary_only_apps = {"sessions"}
+
+    def db_for_read(self, model, **hints):
+        available = replicas()
+        if not available or model._meta.app_label in self.primary_only_apps:
+            return PRIMARY
+        state = _state.get()
+        if state is not None and (state.pinned or state.wrote):
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Follow relations on the database the object came from.
+            return instance._state.db
+        healthy = [alias for alias in available if lag_monitor.healthy(alias)]
+        return random.choice(healthy) if healthy else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if (
+            state is not None
+            and model._meta.app_label not in self.primary_only_apps
+        ):
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
@@ -0,0 +1,188 @@
+"""
+This file is an opt-in session engine (SESSION_ENGINE, set by
+NEWSAPP_SESSION_WRITE_BEHIND=1): sessions live in the cache and are
+written to the database behind the request.
+
+Django's "cached_db" engine reads sessions from the cache but still
+writes each change straight to the django_session table, and its
+plain "db" engine reads the table on every request. Here the cache is
+the primary copy. save() stores the session in the cache and queues
+its key. The database copy is written later, in bulk: WriteBehind
+flushes every SESSION_WRITE_BEHIND_SECONDS, or once
+SESSION_WRITE_BEHIND_MAX_PENDING sessions are waiting. The request
+that finds a flush due performs it; a background thread flushes due
+sessions when no request comes, and the queue is flushed when the
+process exits. A flush is a single upsert, however many sessions it
+carries.
+
+A flush writes what the cache holds at that moment, not what was
+queued. Several changes to one session cost one write, and a session
+deleted meanwhile (on logout) is not written back. delete() removes
+the database row straight away, so a logged-out session cannot come
+back from the database when the cache entry is gone.
+
+The database copy is what survives a cache restart or eviction. A
+session changed in the last flush interval falls back to its previous
+database copy in that case (a new login is lost and the user logs in
+again), as does one queued by a process that is killed rather than
+stopped. With a shared cache (Redis, Memcached) that is rare. With the
+local-memory default every worker has its own sessions, and a user
+whose requests reach another worker is logged out: only enable this
+engine with a shared cache.
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.cached_db import (
+    SessionStore as CachedDBStore,
+)
+from django.db import DatabaseError, connections, router
+
+logger = logging.getLogger("newsApp.session_store")
+
+
+class WriteBehind:
+    """Queues changed sessions and writes them to the database in bulk."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}  # session key: expire date
+        self.last_flush = time.monotonic()
+        self.timer = None
+
+    def record(self, session_key, expire_date):
+        """Queue a changed session; return True when a flush is due."""
+        max_pending = getattr(
+            settings, "SESSION_WRITE_BEHIND_MAX_PENDING", 500
+        )
+        with self.lock:
+            self.pending[session_key] = expire_date
+            if self.timer is None:
+                self._start_timer()
+            return len(self.pending) >= max_pending or self._due()
+
+    def _due(self):
+        flush_seconds = getattr(settings, "SESSION_WRITE_BEHIND_SECONDS", 5)
+        return time.monotonic() - self.last_flush >= flush_seconds
+
+    def _start_timer(self):
+        # Started by the first queued session, so processes that never
+        # use this engine run no thread.
+        self.timer = threading.Thread(
+            target=self._run, name="session-write-behind", daemon=True
+        )
+        self.timer.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(getattr(settings, "SESSION_WRITE_BEHIND_SECONDS", 5))
+            try:
+                self.flush_if_due()
+            except Exception:
+                logger.exception("Session write-behind flush failed.")
+            finally:
+                # The thread's own connections; not held while it sleeps.
+                connections.close_all()
+
+    def flush_if_due(self):
+        """Flush when the interval has passed; return how many were written."""
+        with self.lock:
+            due = bool(self.pending) and self._due()
+        return self.flush() if due else 0
+
+    def discard(self, session_key):
+        with self.lock:
+            self.pending.pop(session_key, None)
+
+    def take(self):
+        """Empty the queue and return what it held."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        return pending
+
+    def flush(self):
+        """Write the queued sessions and return how many were written."""
+        pending = self.take()
+        if not pending:
+            return 0
+        store = SessionStore()
+        model = store.model
+        cached = store._cache.get_many(
+            [store.cache_key_prefix + key for key in pending]
+        )
+        sessions = [
+            model(
+                session_key=key,
+                session_data=store.encode(
+                    cached[store.cache_key_prefix + key]
+                ),
+                expire_date=expire_date,
+            )
+            for key, expire_date in pending.items()
+            # Gone from the cache: deleted (or evicted) since.
+            if store.cache_key_prefix + key in cached
+        ]
+        features = connections[router.db_for_write(model)].features
+        # MySQL upserts on any unique key and takes no target.
+        unique_fields = (
+            ["session_key"]
+            if features.supports_update_conflicts_with_target
+            else None
+        )
+        try:
+            model.objects.bulk_create(
+                sessions,
+                update_conflicts=True,
+                update_fields=["session_data", "expire_date"],
+                unique_fields=unique_fields,
+                batch_size=500,
+            )
+        except DatabaseError:
+            # Keep them for the next flush, unless changed again since.
+            with self.lock:
+                for key, expire_date in pending.items():
+                    self.pending.setdefault(key, expire_date)
+            logger.exception("Could not flush %d sessions.", len(pending))
+            return 0
+        return len(sessions)
+
+
+write_behind = WriteBehind()
+
+
+class SessionStore(CachedDBStore):
+    """cached_db with the database writes queued in write_behind."""
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        if must_create:
+            # add() fails if the key exists, like the INSERT of the db
+            # engine; create() then picks another key.
+            if not self._cache.add(
+                self.cache_key, data, self.get_expiry_age()
+            ):
+                raise CreateError
+        else:
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
+        if write_behind.record(self.session_key, self.get_expiry_date()):
+            write_behind.flush()
+
+    async def asave(self, must_create=False):
+        await sync_to_async(self.save)(must_create)
+
+    def delete(self, session_key=None):
+        write_behind.discard(session_key or self.session_key)
+        super().delete(session_key)
+
+    async def adelete(self, session_key=None):
+        await sync_to_async(self.delete)(session_key)
@@ -1,24 +1,63 @@
 """
 This file utilizes Django signals to automatically send an email to
 subscribers and post the article to X when an article is approved.
+Both are sent after the approval commits, by the worker pool of
+announcements.py.
 
 The signal is triggered on post-save of an Article.
 
+New or edited article content is also indexed for near-duplicate
+detection (see duplicates.py), so the approval queue can flag
+resubmitted stories. When the image changes, its resized variants
+are scheduled (see thumbnails.py). Saves and deletes also invalidate
+the cached detail-page records (see article_cache.py), including
+renames of the author, category or publisher they show. The cached
+user records of auth_cache.py are dropped on logout, when the user is
+saved or deleted and when their subscriptions change. The cached
+publisher and category options of the article form (pickers.py) are
+dropped when a publisher, a category or a publisher's journalists
+change. The parts of the cached publisher stats (publisher_stats.py)
+are dropped when an approved article, a subscription, a roster or a
+shown name changes. Approvals are logged for the live feed
+(live_feed.py). The shared reader feeds (feed_cache.py) of the
+publishers and authors of changed approved articles are dropped.
+Articles created in bulk send no signals;
+articles_created() runs the same work once for the whole batch.
+
+This module is imported by NewsappConfig.ready() in every worker, so
+it imports only what registering the receivers needs. duplicates.py
+(which loads NumPy) is imported by the receiver on first use.
+
 When an editor approves an article in the approval view,
-the post_save signal in signals.py automatically triggers email
+the post_save signal in signals.py automatically schedules email
 notifications to subscribers and publishes the article on X
 using the tweet.py function.
 """
 
-from django.db.models.signals import post_save, pre_save
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
-from .models import Article
-from django.core.mail import send_mail
-from django.conf import settings
-from .functions.tweet import post_tweet
+from . import (
+    announcements,
+    article_cache,
+    auth_cache,
+    feed_cache,
+    live_feed,
+    pickers,
+    publisher_stats,
+)
+from .models import Article, Category, CustomUser, Publisher
+from .metrics import timed_signal_handler
 
 
 @receiver(pre_save, sender=Article)
+@timed_signal_handler
 def store_old_status(sender, instance, **kwargs):
     """
     Before saving the Article, store the old status so we can compare
@@ -28,16 +67,25 @@ def store_old_status(sender, instance, **kwargs):
     if instance.pk:
         old_article = Article.objects.filter(pk=instance.pk).first()
         instance._old_status = old_article.status if old_article else None
+        instance._old_content = old_article.content if old_article else None
+        instance._old_image = old_article.image.name if old_article else None
+        instance._old_publisher_id = (
+            old_article.publisher_id if old_article else None
+        )
     else:
         instance._old_status = None
+        instance._old_content = None
+        instance._old_image = None
+        instance._old_publisher_id = None
 
 
 @receiver(post_save, sender=Article)
+@timed_signal_handler
 def article_post_save(sender, instance, created, **kwargs):
     """
     After saving the Article, compare the old status to the new one.
     If it changed from 'pending' to 'approved', notify subscribers
-    and post to X (formerly Twitter).
+    and post to X (formerly Twitter) once the save commits.
     """
     # Retrieve the old status that was set in pre_save
     old_status = getattr(instance, "_old_status", None)
@@ -45,30 +93,284 @@ def article_post_save(sender, instance, created, **kwargs):
 
     # If the status changed from 'pending' to 'approved'
     if old_status == "pending" and new_status == "approved":
-        # 1. Notify subscribers by email
-        subscribers_emails = set()
-        if instance.publisher:
-            for reader in instance.publisher.subscribed_readers.all():
-                subscribers_emails.add(reader.email)
-        for reader in instance.author.subscribed_readers_by.all():
-            subscribers_emails.add(reader.email)
-
-        if subscribers_emails:
-            send_mail(
-                subject=f"New Article Published: {instance.title}",
-                message=(
-                    f"Hello,\n\n"
-                    f"A new article titled '{instance.title}' by "
-                    f"{instance.author.username} "
-                    f"has just been approved.\n\n"
-                    f"Content Preview:\n{instance.content[:200]}..."
-                ),
-                from_email=getattr(
-                    settings, "DEFAULT_FROM_EMAIL", "noreply@example.com"
-                ),
-                recipient_list=list(subscribers_emails),
-                fail_silently=True,
-            )
+        live_feed.record_approvals([instance.pk])
+        announcements.schedule([instance.pk])
+
+
+def articles_created(articles):
+    """
+    The post_save work for articles inserted with bulk_create(), done
+    once for the batch (see serializers.ArticleListSerializer).
+    """
+    from . import revisions
+    from .duplicates import index_article
+
+    revisions.record_created(articles)
+    for article in articles:
+        index_article(article.pk, article.content)
+    article_cache.invalidate(*[article.pk for article in articles])
+    approved = [
+        article for article in articles if article.status == "approved"
+    ]
+    publisher_stats.invalidate(
+        "articles", *[article.publisher_id for article in approved]
+    )
+    feed_cache.invalidate(
+        publisher_ids=[article.publisher_id for article in approved],
+        journalist_ids=[article.author_id for article in approved],
+    )
+
+
+@receiver(post_save, sender=Article)
+@timed_signal_handler
+def index_for_duplicates(sender, instance, **kwargs):
+    """
+    Compute the MinHash signature of new or edited content and flag the
+    article if an earlier one is a near-duplicate.
+    """
+    if instance.content != getattr(instance, "_old_content", None):
+        from .duplicates import index_article
+
+        index_article(instance.pk, instance.content)
+
+
+@receiver(post_save, sender=Article)
+@timed_signal_handler
+def schedule_image_variants(sender, instance, **kwargs):
+    """
+    Resize a new or replaced image in the worker pool once the save has
+    committed.
+    """
+    old_image = getattr(instance, "_old_image", None) or None
+    if (instance.image.name or None) != old_image:
+        from .thumbnails import schedule
+
+        schedule(instance.pk)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@timed_signal_handler
+def invalidate_cached_article(sender, instance, **kwargs):
+    """Drop the cached record of a saved or deleted article."""
+    article_cache.invalidate(instance.pk)
+
+
+# Fields of these models that cached article records show.
+SHOWN_FIELDS = {"username", "role", "name", "slug"}
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Publisher)
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Publisher)
+@timed_signal_handler
+def invalidate_articles_showing(sender, instance, **kwargs):
+    """
+    Drop the cached records of the articles that show this author,
+    category or publisher, when it is renamed or deleted. Saves that
+    cannot change a shown name (a new object, or last_login on login)
+    are skipped.
+    """
+    if not _may_change_shown_name(kwargs):
+        return
+    article_cache.invalidate(*instance.articles.values_list("pk", flat=True))
+
+
+def _may_change_shown_name(kwargs):
+    update_fields = kwargs.get("update_fields")
+    return not kwargs.get("created") and (
+        update_fields is None or bool(SHOWN_FIELDS & set(update_fields))
+    )
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@timed_signal_handler
+def invalidate_publisher_articles(sender, instance, **kwargs):
+    """
+    Drop the article stats of the publisher (old and new) of an article
+    that is or was approved: published, withdrawn, edited or moved.
+    """
+    if "approved" in (instance.status, getattr(instance, "_old_status", None)):
+        publisher_stats.invalidate(
+            "articles",
+            instance.publisher_id,
+            getattr(instance, "_old_publisher_id", None),
+        )
 
-        # 2. Post to X (formerly Twitter)
-        post_tweet(instance)
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@timed_signal_handler
+def invalidate_reader_feeds(sender, instance, **kwargs):
+    """
+    Drop the cached feeds following the publisher (old and new) or the
+    author of an article that is or was approved.
+    """
+    if "approved" in (instance.status, getattr(instance, "_old_status", None)):
+        feed_cache.invalidate(
+            publisher_ids=[
+                instance.publisher_id,
+                getattr(instance, "_old_publisher_id", None),
+            ],
+            journalist_ids=[instance.author_id],
+        )
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=CustomUser)
+@receiver(pre_delete, sender=Category)
+@timed_signal_handler
+def invalidate_publishers_showing(sender, instance, **kwargs):
+    """
+    Drop the publisher stats that show a renamed (or deleted) author,
+    journalist, editor or category. Deleting a user also removes their
+    subscriptions, which sends no m2m_changed.
+    """
+    if not _may_change_shown_name(kwargs):
+        return
+    publisher_stats.invalidate(
+        "articles",
+        *instance.articles.values_list("publisher_id", flat=True).distinct(),
+    )
+    if sender is CustomUser:
+        publisher_stats.invalidate(
+            "profile",
+            *instance.journalism_publishers.values_list("pk", flat=True),
+            *instance.editing_publishers.values_list("pk", flat=True),
+        )
+    if sender is CustomUser and kwargs["signal"] is pre_delete:
+        publisher_stats.invalidate(
+            "subscribers",
+            *instance.subscriptions_publishers.values_list("pk", flat=True),
+        )
+
+
+@receiver(post_save, sender=Publisher)
+@receiver(post_delete, sender=Publisher)
+@timed_signal_handler
+def invalidate_publisher_profile(sender, instance, **kwargs):
+    """Drop the cached profile of a created, edited or deleted publisher."""
+    publisher_stats.invalidate("profile", instance.pk)
+
+
+@receiver(m2m_changed, sender=Publisher.editors.through)
+@receiver(m2m_changed, sender=Publisher.journalists.through)
+@timed_signal_handler
+def invalidate_publisher_roster(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Drop the cached profile of publishers whose editors or journalists
+    change, from either side: publisher.journalists.add(user) or
+    user.journalism_publishers.add(publisher).
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        publisher_stats.invalidate("profile", instance.pk)
+    elif pk_set is not None:
+        publisher_stats.invalidate("profile", *pk_set)
+    else:
+        publisher_stats.invalidate(
+            "profile",
+            *sender.objects.filter(customuser_id=instance.pk).values_list(
+                "publisher_id", flat=True
+            ),
+        )
+
+
+@receiver(m2m_changed, sender=publisher_stats.PublisherSubscription)
+@timed_signal_handler
+def invalidate_publisher_subscribers(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Drop the cached subscriber count of publishers whose subscribers
+    change, from either side: reader.subscriptions_publishers.add(
+    publisher) or publisher.subscribed_readers.add(reader).
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        publisher_stats.invalidate("subscribers", instance.pk)
+    elif pk_set is not None:
+        publisher_stats.invalidate("subscribers", *pk_set)
+    else:
+        publisher_stats.invalidate(
+            "subscribers",
+            *sender.objects.filter(customuser_id=instance.pk).values_list(
+                "publisher_id", flat=True
+            ),
+        )
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+@timed_signal_handler
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop the cached auth record of a saved or deleted user, so a role,
+    password or is_active change applies to the next request.
+    """
+    auth_cache.invalidate(instance.pk)
+
+
+@receiver(user_logged_out)
+@timed_signal_handler
+def invalidate_logged_out_user(sender, request, user, **kwargs):
+    """Drop the cached auth record of a user who logs out."""
+    if user is not None:
+        auth_cache.invalidate(user.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Publisher)
+@receiver(post_delete, sender=Publisher)
+@receiver(m2m_changed, sender=Publisher.journalists.through)
+@timed_signal_handler
+def invalidate_article_options(sender, **kwargs):
+    """Drop the cached picker options of the article form."""
+    if kwargs.get("action", "post_").startswith("post_"):
+        pickers.invalidate()
+
+
+# Through model: (followed column, follower column).
+SUBSCRIPTION_COLUMNS = {
+    auth_cache.PublisherSubscription: ("publisher_id", "customuser_id"),
+    auth_cache.JournalistSubscription: (
+        "to_customuser_id",
+        "from_customuser_id",
+    ),
+}
+
+
+@receiver(m2m_changed, sender=auth_cache.PublisherSubscription)
+@receiver(m2m_changed, sender=auth_cache.JournalistSubscription)
+@timed_signal_handler
+def invalidate_cached_subscriber(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Drop the cached auth records of readers whose subscriptions change,
+    from either side: reader.subscriptions_publishers.add(publisher) or
+    publisher.subscribed_readers.add(reader).
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        auth_cache.invalidate(instance.pk)
+    elif pk_set is not None:
+        auth_cache.invalidate(*pk_set)
+    else:
+        # Clearing the followers of a publisher or journalist.
+        followed, follower = SUBSCRIPTION_COLUMNS[sender]
+        auth_cache.invalidate(
+            *sender.objects.filter(**{followed: instance.pk}).values_list(
+                follower, flat=True
+            )
+        )
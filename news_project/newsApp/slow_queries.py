@@ -0,0 +1,271 @@
+"""
+This file implements the slow-query log.
+
+The metrics db_timer (installed by RequestMetricsMiddleware through
+connection.execute_wrapper) collects every query of a request that
+takes longer than SLOW_QUERY_THRESHOLD_MS. Once the response is ready
+the middleware hands them to log_slow_queries(), which:
+
+* normalises the SQL into a fingerprint, so the same query with
+  different parameters is reported as one entry,
+* writes a warning to the "newsApp.slow_queries" logger,
+* passes the query on to be recorded, at most once every
+  SLOW_QUERY_RECORD_SECONDS per fingerprint unless it is slower than
+  before. The calls skipped in between are added to the next record.
+
+Recording runs on a SLOW_QUERY_LOG_WORKERS thread, so the request that
+was slow does not also wait for the log (with 0 workers it runs in the
+request, as the tests do). It:
+
+* captures an EXPLAIN plan (EXPLAIN on MySQL, EXPLAIN QUERY PLAN on
+  SQLite) the first time a fingerprint is seen and whenever it
+  becomes slower than before,
+* stores the entry in the SlowQuery table, which is pruned to the
+  SLOW_QUERY_LOG_SIZE slowest fingerprints.
+
+The stored sample is the SQL with its placeholders; parameters, which
+may hold personal data or credentials, are only used for the EXPLAIN
+and never stored.
+
+The table can be read on the staff-only /slow-queries/ page or with
+"python manage.py slow_queries".
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SlowQuery
+
+logger = logging.getLogger("newsApp.slow_queries")
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+MAX_TRACKED = 10000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def threshold():
+    """The configured threshold in seconds, or None when disabled."""
+    value = getattr(settings, "SLOW_QUERY_THRESHOLD_MS", None)
+    return None if value is None else value / 1000
+
+
+def normalize_sql(sql):
+    """Replace literals and placeholders so similar queries match."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode("utf-8")).hexdigest()
+
+
+def redact(sql):
+    """The SQL without its quoted literals (raw SQL may inline them)."""
+    return _STRING.sub("?", sql)
+
+
+def explain(alias, sql, params):
+    """Return the database's plan for a SELECT as plain text."""
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return ""
+    connection = connections[alias]
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            rows = cursor.fetchall()
+    except DatabaseError as exc:
+        return f"EXPLAIN failed: {exc}"
+    return "\n".join("\t".join(str(column) for column in row) for row in rows)
+
+
+class RecordThrottle:
+    """
+    Lets a fingerprint be recorded once every SLOW_QUERY_RECORD_SECONDS,
+    or sooner when it is slower than its last record. Occurrences in
+    between are counted and carried into the next record.
+    """
+
+    timer = time.monotonic
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = {}  # fingerprint: [recorded at, max, calls, time]
+
+    def reset(self):
+        with self.lock:
+            self.state.clear()
+
+    def admit(self, key, duration):
+        """Count one occurrence; return (calls, total_time) or None."""
+        interval = getattr(settings, "SLOW_QUERY_RECORD_SECONDS", 60)
+        now = self.timer()
+        with self.lock:
+            state = self.state.get(key)
+            if state is None:
+                if len(self.state) >= MAX_TRACKED:
+                    # A forgotten fingerprint is simply recorded again.
+                    self.state.clear()
+                state = self.state[key] = [None, 0.0, 0, 0.0]
+            state[2] += 1
+            state[3] += duration
+            recorded_at, max_time = state[0], state[1]
+            if (
+                recorded_at is not None
+                and now - recorded_at < interval
+                and duration <= max_time
+            ):
+                return None
+            calls, total_time = state[2], state[3]
+            state[:] = [now, max(max_time, duration), 0, 0.0]
+        return calls, total_time
+
+
+throttle = RecordThrottle()
+
+
+def workers():
+    return getattr(settings, "SLOW_QUERY_LOG_WORKERS", 1)
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=workers(), thread_name_prefix="slow-queries"
+            )
+    return _executor
+
+
+def record_slow_query(
+    view, alias, sql, params, many, duration, calls=1, total_time=None
+):
+    """
+    Store one slow query, standing for calls occurrences that took
+    total_time (duration) in all.
+    """
+    if total_time is None:
+        total_time = duration
+    normalized = normalize_sql(sql)
+    key = fingerprint(normalized)
+    sample = redact(sql)
+
+    existing = (
+        SlowQuery.objects.filter(fingerprint=key).only("max_time").first()
+    )
+    if existing is None:
+        try:
+            with transaction.atomic():
+                SlowQuery.objects.create(
+                    fingerprint=key,
+                    normalized_sql=normalized,
+                    sample_sql=sample,
+                    view=view,
+                    vendor=connections[alias].vendor,
+                    explain="" if many else explain(alias, sql, params),
+                    calls=calls,
+                    total_time=total_time,
+                    max_time=duration,
+                )
+            return
+        except IntegrityError:
+            # Another worker logged the same fingerprint first.
+            existing = SlowQuery.objects.get(fingerprint=key)
+
+    changes = {
+        "calls": F("calls") + calls,
+        "total_time": F("total_time") + total_time,
+        "view": view,
+        "last_seen": timezone.now(),
+    }
+    if duration > existing.max_time:
+        # Refresh the sample and the plan for the new worst case.
+        changes.update(
+            max_time=duration,
+            sample_sql=sample,
+            explain="" if many else explain(alias, sql, params),
+        )
+    SlowQuery.objects.filter(pk=existing.pk).update(**changes)
+
+
+def prune(size=None):
+    """Keep only the slowest SLOW_QUERY_LOG_SIZE fingerprints."""
+    if size is None:
+        size = getattr(settings, "SLOW_QUERY_LOG_SIZE", 50)
+    stale = list(
+        SlowQuery.objects.order_by("-max_time").values_list("pk", flat=True)[
+            size:
+        ]
+    )
+    if stale:
+        SlowQuery.objects.filter(pk__in=stale).delete()
+
+
+def record_all(view, entries):
+    """Store the entries the throttle admitted, then prune the table."""
+    for entry in entries:
+        record_slow_query(view, *entry)
+    prune()
+
+
+def _record_all(view, entries):
+    # Runs on a pool thread, which has its own connections.
+    try:
+        record_all(view, entries)
+    except Exception:
+        logger.exception("Recording the slow queries of %s failed", view)
+    finally:
+        connections.close_all()
+
+
+def log_slow_queries(view, entries):
+    """
+    Log the slow queries collected while serving one request and hand
+    the ones the throttle admits to the recorder.
+    """
+    admitted = []
+    for alias, sql, params, many, duration in entries:
+        normalized = normalize_sql(sql)
+        key = fingerprint(normalized)
+        logger.warning(
+            "Slow query (%.1f ms) in %s [%s]: %s",
+            duration * 1000,
+            view,
+            key[:12],
+            normalized,
+        )
+        counts = throttle.admit(key, duration)
+        if counts is not None:
+            admitted.append((alias, sql, params, many, duration, *counts))
+    if not admitted:
+        return None
+    if not workers():
+        record_all(view, admitted)
+        return None
+    return executor().submit(_record_all, view, admitted)
+
+
+def top_queries(limit=None):
+    if limit is None:
+        limit = getattr(settings, "SLOW_QUERY_LOG_SIZE", 50)
+    return SlowQuery.objects.order_by("-max_time")[:limit]
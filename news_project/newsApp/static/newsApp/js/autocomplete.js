@@ -0,0 +1,81 @@
+/*
+ * Autocomplete for the <select> pickers of the article form.
+ *
+ * forms.AutocompleteSelect renders a <select data-autocomplete-url>
+ * holding only its empty and selected options. A search box is added
+ * in front of it; as the user types, the matching options are fetched
+ * from the URL ({"results": [{"id", "text"}], "more": bool}) and
+ * replace the others. The selected option is always kept.
+ */
+(function () {
+  "use strict";
+
+  var DELAY_MS = 200;
+
+  function setOptions(select, results) {
+    var keep = Array.prototype.filter.call(select.options, function (option) {
+      return option.value === "" || option.selected;
+    });
+    var kept = keep.map(function (option) {
+      return option.value;
+    });
+    select.innerHTML = "";
+    keep.forEach(function (option) {
+      select.appendChild(option);
+    });
+    results.forEach(function (result) {
+      if (kept.indexOf(String(result.id)) === -1) {
+        select.appendChild(new Option(result.text, result.id));
+      }
+    });
+  }
+
+  function attach(select) {
+    var url = select.getAttribute("data-autocomplete-url");
+    var search = document.createElement("input");
+    var timer = null;
+    var latest = 0;
+    var loaded = false;
+
+    search.type = "search";
+    search.className = "form-control mb-1";
+    search.placeholder = "Search...";
+    search.setAttribute("aria-label", "Search " + select.name);
+    select.parentNode.insertBefore(search, select);
+
+    function load() {
+      var request = ++latest;
+      fetch(url + "?q=" + encodeURIComponent(search.value), {
+        credentials: "same-origin",
+        headers: { Accept: "application/json" },
+      })
+        .then(function (response) {
+          return response.ok ? response.json() : { results: [] };
+        })
+        .then(function (data) {
+          // Ignore answers to queries typed over since.
+          if (request === latest) {
+            setOptions(select, data.results);
+          }
+        });
+    }
+
+    search.addEventListener("input", function () {
+      clearTimeout(timer);
+      timer = setTimeout(load, DELAY_MS);
+    });
+    // The first options load when the picker is first used.
+    select.addEventListener("focus", function () {
+      if (!loaded) {
+        loaded = true;
+        load();
+      }
+    });
+  }
+
+  document.addEventListener("DOMContentLoaded", function () {
+    document
+      .querySelectorAll("select[data-autocomplete-url]")
+      .forEach(attach);
+  });
+})();
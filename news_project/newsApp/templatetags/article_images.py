@@ -0,0 +1,18 @@
+"""
+Template tags for article images (see thumbnails.py).
+
+    {% load article_images %}
+    {% article_picture article "tile" %}
+"""
+
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag("newsApp/article_picture.html")
+def article_picture(article, size="tile"):
+    """The article's image as a responsive <picture> for a layout size."""
+    return thumbnails.picture(article, size)
@@ -20,11 +20,99 @@ editors can approve them, and readers receive the correct API data.
 
 """
 
-from django.test import TestCase, Client
+import hashlib
+import io
+import random
+import smtplib
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.mail.utils import DNS_NAME
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections
+from django.db.models import F
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import (
+    AsyncRequestFactory,
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from .models import Article, Publisher
+from .models import (
+    ApprovalEvent,
+    Article,
+    ArticleImageVariant,
+    ArticleRevision,
+    ArticleSignature,
+    ArticleViewBucket,
+    Category,
+    Newsletter,
+    NewsletterDigest,
+    NewsletterDigestRun,
+    Publisher,
+    RelatedArticle,
+    RequestProfile,
+    SlowQuery,
+)
+from .mailer import RateLimiter
+from .newsletters import send_digests
+from .notifications import notify_subscribers
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
+from . import (
+    announcements,
+    api_views,
+    article_cache,
+    async_views,
+    auth_cache,
+    delta_sync,
+    duplicates,
+    feed_cache,
+    live_feed,
+    metrics,
+    popularity,
+    profiling,
+    publisher_stats,
+    related,
+    renderers,
+    review_queue,
+    revisions,
+    routers,
+    session_store,
+    slow_queries,
+    thumbnails,
+    warmup,
+)
+from .renderers import FastJSONRenderer
+from .serializers import ArticleSerializer, ArticleValuesSerializer
+from .throttling import RoleScopedThrottle
+from .middleware import ReplicaPinningMiddleware
+from .slow_queries import normalize_sql
 
 User = get_user_model()
 
@@ -66,7 +154,8 @@ class NewsAppTests(TestCase):
         )
 
     def test_article_creation_by_journalist(self):
-        # GIVEN a journalist is logged in.
+        # GIVEN a journalist of the publisher is logged in.
+        self.publisher.journalists.add(self.journalist)
         self.client.login(username="journalist1", password="Journalist@123")
         # WHEN the journalist submits an article.
         response = self.client.post(
@@ -104,3 +193,2513 @@ class NewsAppTests(TestCase):
         # THEN the API response contains the approved article.
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data), 1)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A journalist and an empty metrics registry.
+        metrics.registry.reset()
+        self.journalist = User.objects.create_user(
+            username="journalist1",
+            password="Journalist@123",
+            role="journalist",
+        )
+
+    def test_server_timing_header_is_added(self):
+        # GIVEN a journalist is logged in.
+        self.client.login(username="journalist1", password="Journalist@123")
+        # WHEN the dashboard is requested.
+        response = self.client.get(reverse("dashboard"))
+        # THEN the response carries the DB, template and total timings.
+        timing = response["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn("tpl;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+    def test_metrics_endpoint_exports_per_view_histograms(self):
+        # GIVEN a request to the dashboard has been served.
+        self.client.login(username="journalist1", password="Journalist@123")
+        self.client.get(reverse("dashboard"))
+        # WHEN /metrics is scraped from an allowed address.
+        response = self.client.get(reverse("metrics"))
+        # THEN the dashboard histograms are exported.
+        body = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'newsapp_request_queries_count{view="dashboard"} 1', body
+        )
+        self.assertIn("# TYPE newsapp_request_db_seconds histogram", body)
+
+    def test_metrics_endpoint_rejects_unknown_addresses(self):
+        # WHEN an anonymous client outside METRICS_ALLOWED_IPS scrapes.
+        response = self.client.get(
+            reverse("metrics"), REMOTE_ADDR="203.0.113.9"
+        )
+        # THEN access is refused.
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(SLOW_QUERY_LOG_WORKERS=0)
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A journalist who will load the dashboard, and no
+        # fingerprint recorded yet.
+        slow_queries.throttle.reset()
+        self.addCleanup(slow_queries.throttle.reset)
+        self.journalist = User.objects.create_user(
+            username="journalist1",
+            password="Journalist@123",
+            role="journalist",
+        )
+
+    def test_normalize_sql_merges_literals_and_in_lists(self):
+        # WHEN two queries differ only in their literals.
+        first = normalize_sql(
+            "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a'"
+        )
+        second = normalize_sql("SELECT  *  FROM t WHERE id IN (?, ?) AND name = 'b'")
+        # THEN they share one fingerprint text.
+        self.assertEqual(first, second)
+        self.assertEqual(first, "SELECT * FROM t WHERE id IN (...) AND name = ?")
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_queries_are_logged_with_view_and_plan(self):
+        # GIVEN every query counts as slow.
+        self.client.login(username="journalist1", password="Journalist@123")
+        # WHEN the dashboard is served.
+        with self.assertLogs("newsApp.slow_queries", level="WARNING"):
+            self.client.get(reverse("dashboard"))
+        # THEN its article query is stored with the view and a plan.
+        entry = SlowQuery.objects.get(normalized_sql__contains="newsApp_article")
+        self.assertEqual(entry.view, "dashboard")
+        self.assertNotEqual(entry.explain, "")
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_management_command_lists_slow_queries(self):
+        # GIVEN some slow queries were logged.
+        self.client.login(username="journalist1", password="Journalist@123")
+        with self.assertLogs("newsApp.slow_queries", level="WARNING"):
+            self.client.get(reverse("dashboard"))
+        # WHEN the command is run.
+        out = StringIO()
+        call_command("slow_queries", "--explain", stdout=out)
+        # THEN the dashboard entries are printed.
+        self.assertIn("dashboard", out.getvalue())
+
+    def test_parameters_are_not_stored(self):
+        # WHEN a query is logged with a password hash as parameter.
+        sql = 'SELECT "id" FROM "newsApp_customuser" WHERE "password" = %s'
+        with self.assertLogs("newsApp.slow_queries", level="WARNING"):
+            slow_queries.log_slow_queries(
+                "login", [("default", sql, ["pbkdf2$secret"], False, 0.5)]
+            )
+        # THEN the stored sample keeps the placeholder only.
+        entry = SlowQuery.objects.get()
+        self.assertEqual(entry.sample_sql, sql)
+        self.assertNotIn("secret", entry.sample_sql + entry.explain)
+
+    @override_settings(SLOW_QUERY_RECORD_SECONDS=60)
+    def test_fingerprint_is_recorded_once_per_interval(self):
+        # GIVEN a query logged once.
+        query = ("default", "SELECT 1 WHERE 1 = %s", [1], False)
+
+        def log(duration):
+            with self.assertLogs("newsApp.slow_queries", level="WARNING"):
+                slow_queries.log_slow_queries("view", [(*query, duration)])
+
+        clock = [1000.0]
+        with mock.patch.object(
+            slow_queries.RecordThrottle,
+            "timer",
+            staticmethod(lambda: clock[0]),
+        ):
+            log(0.5)
+            # WHEN it recurs, no slower, within the interval, then
+            # once the interval has passed.
+            with self.assertNumQueries(0):
+                log(0.4)
+                log(0.3)
+            clock[0] += 60
+            log(0.2)
+        # THEN the second record carries the skipped calls.
+        entry = SlowQuery.objects.get()
+        self.assertEqual(entry.calls, 4)
+        self.assertAlmostEqual(entry.total_time, 1.4)
+        self.assertEqual(entry.max_time, 0.5)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_MAX_LAG_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        # ARRANGE: A router with fresh lag readings.
+        self.router = routers.PrimaryReplicaRouter()
+        routers.lag_monitor.reset()
+        self.addCleanup(routers.lag_monitor.reset)
+
+    def test_reads_use_replica_and_writes_use_primary(self):
+        # GIVEN a replica that is in sync.
+        with mock.patch.object(routers, "replica_lag", return_value=0):
+            # WHEN the router is asked where to read and write articles.
+            read_db = self.router.db_for_read(Article)
+            write_db = self.router.db_for_write(Article)
+        # THEN reads go to the replica and writes to the primary.
+        self.assertEqual(read_db, "replica")
+        self.assertEqual(write_db, "default")
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        # GIVEN a replica a minute behind.
+        with mock.patch.object(routers, "replica_lag", return_value=60):
+            # WHEN a read is routed.
+            read_db = self.router.db_for_read(Article)
+        # THEN it is served by the primary.
+        self.assertEqual(read_db, "default")
+
+    def test_request_that_writes_is_pinned_to_primary(self):
+        # GIVEN a view that writes and then reads again.
+        seen = {}
+
+        def view(request):
+            with mock.patch.object(routers, "replica_lag", return_value=0):
+                seen["before"] = self.router.db_for_read(Article)
+                self.router.db_for_write(Article)
+                seen["after"] = self.router.db_for_read(Article)
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(view)
+        # WHEN the request is served.
+        response = middleware(RequestFactory().post("/"))
+        # THEN reads after the write use the primary and a pin cookie is set.
+        self.assertEqual(seen, {"before": "replica", "after": "default"})
+        self.assertIn("primary_pin", response.cookies)
+
+    def test_pin_cookie_keeps_reads_on_primary(self):
+        # GIVEN a client holding an unexpired pin cookie.
+        seen = {}
+
+        def view(request):
+            seen["read"] = self.router.db_for_read(Article)
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.COOKIES["primary_pin"] = str(int(time.time()) + 10)
+        # WHEN the next request is served.
+        ReplicaPinningMiddleware(view)(request)
+        # THEN it reads from the primary.
+        self.assertEqual(seen["read"], "default")
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A reader following a journalist with one approved
+        # and one pending article.
+        self.factory = AsyncRequestFactory()
+        self.reader = User.objects.create_user(
+            username="reader1", password="Reader@123", role="reader"
+        )
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.reader.subscriptions_journalists.add(self.journalist)
+        self.category = Category.objects.create(name="Tech", slug="tech")
+        self.approved = Article.objects.create(
+            title="Approved Story",
+            content="Approved content.",
+            author=self.journalist,
+            category=self.category,
+            status="approved",
+        )
+        self.pending = Article.objects.create(
+            title="Pending Story",
+            content="Pending content.",
+            author=self.journalist,
+            category=self.category,
+        )
+
+    def request_as(self, user, path="/"):
+        request = self.factory.get(path)
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        request.user = user
+        return request
+
+    async def test_article_list_shows_only_approved_articles(self):
+        # WHEN an anonymous visitor opens the async article list.
+        response = await async_views.article_list(
+            self.request_as(AnonymousUser())
+        )
+        # THEN only approved articles are shown.
+        self.assertContains(response, "Approved Story")
+        self.assertNotContains(response, "Pending Story")
+
+    async def test_homepage_uses_prefetched_category_menu(self):
+        # WHEN a logged-in reader opens the async homepage.
+        response = await async_views.homepage(self.request_as(self.reader))
+        # THEN the category menu is rendered from the gathered query.
+        self.assertContains(response, "/category/tech/")
+        self.assertContains(response, "Approved Story")
+
+    async def test_category_articles_filters_by_slug(self):
+        # WHEN the tech category page is requested.
+        response = await async_views.category_articles(
+            self.request_as(AnonymousUser()), slug="tech"
+        )
+        # THEN the approved tech article is listed.
+        self.assertContains(response, "Approved Story")
+
+    async def test_reader_cannot_open_pending_article(self):
+        # WHEN a reader opens a pending article through the async view.
+        from django.http import Http404
+
+        # THEN it is not found.
+        with self.assertRaises(Http404):
+            await async_views.article_detail(
+                self.request_as(self.reader), pk=self.pending.pk
+            )
+
+    def test_async_api_matches_drf_output(self):
+        # GIVEN the DRF view's response for the reader.
+        self.client.login(username="reader1", password="Reader@123")
+        expected = self.client.get(reverse("api_article_list")).content
+        # WHEN the async API view serves the same reader.
+        response = async_to_sync(async_views.api_article_list)(
+            self.request_as(self.reader, "/api/articles/")
+        )
+        # THEN the JSON is byte-identical.
+        self.assertEqual(response.content, expected)
+
+
+class FastReadPathTests(TestCase):
+    def setUp(self):
+        # ARRANGE: Articles with non-ASCII text, line separators and a
+        # missing publisher.
+        journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        publisher = Publisher.objects.create(name="Test Publisher")
+        Article.objects.create(
+            title="Café “quotes”",
+            content="Line\u2028separator and \x01 control",
+            author=journalist,
+            publisher=publisher,
+            status="approved",
+        )
+        Article.objects.create(
+            title="No publisher", content="Plain", author=journalist
+        )
+        self.queryset = Article.objects.order_by("id")
+
+    def expected(self):
+        data = ArticleSerializer(self.queryset, many=True).data
+        return JSONRenderer().render(data)
+
+    def test_values_serializer_matches_model_serializer(self):
+        # WHEN the same rows go through both serializers.
+        fast = ArticleValuesSerializer(self.queryset).data
+        # THEN the data is identical.
+        self.assertEqual(fast, ArticleSerializer(self.queryset, many=True).data)
+
+    def test_fast_renderer_is_byte_identical(self):
+        # WHEN the fast path renders with orjson (if installed).
+        rendered = FastJSONRenderer().render(
+            ArticleValuesSerializer(self.queryset).data
+        )
+        # THEN the bytes match DRF's standard output.
+        self.assertEqual(rendered, self.expected())
+
+    def test_fast_renderer_falls_back_without_orjson(self):
+        # GIVEN orjson is not installed.
+        with mock.patch.object(renderers, "orjson", None):
+            # WHEN the fast path renders.
+            rendered = FastJSONRenderer().render(
+                ArticleValuesSerializer(self.queryset).data
+            )
+        # THEN the stdlib output is identical too.
+        self.assertEqual(rendered, self.expected())
+
+
+class FlakyEmailBackend(LocmemBackend):
+    """Locmem backend whose call number fail_on raises error."""
+
+    calls = 0
+    fail_on = 2
+    error = RuntimeError("worker killed")
+
+    def send_messages(self, messages):
+        FlakyEmailBackend.calls += 1
+        if FlakyEmailBackend.calls == FlakyEmailBackend.fail_on:
+            raise FlakyEmailBackend.error
+        return super().send_messages(messages)
+
+
+class NewsletterDigestTests(TestCase):
+    def setUp(self):
+        # ARRANGE: Two newsletters and four readers, three of whom follow
+        # the same journalist.
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.publisher = Publisher.objects.create(name="Test Publisher")
+        Newsletter.objects.create(
+            title="Weekly Tech",
+            content="Tech news.",
+            journalist=self.journalist,
+            approved=True,
+        )
+        Newsletter.objects.create(
+            title="Publisher Notes",
+            content="From the desk.",
+            journalist=self.journalist,
+            publisher=self.publisher,
+            approved=True,
+        )
+        Newsletter.objects.create(
+            title="Draft",
+            content="Not approved.",
+            journalist=self.journalist,
+        )
+        for index in range(3):
+            reader = User.objects.create_user(
+                username=f"reader{index}",
+                email=f"reader{index}@example.com",
+                role="reader",
+            )
+            reader.subscriptions_journalists.add(self.journalist)
+        self.publisher_reader = User.objects.create_user(
+            username="reader_pub",
+            email="reader_pub@example.com",
+            role="reader",
+        )
+        self.publisher_reader.subscriptions_publishers.add(self.publisher)
+
+    def test_identical_subscriptions_share_one_rendered_digest(self):
+        # WHEN the digest is sent.
+        summary = send_digests(batch_size=2)
+        # THEN every reader gets one private message, and only two
+        # distinct digests are rendered.
+        self.assertEqual(summary["sent"], 4)
+        self.assertEqual(summary["rendered"], 2)
+        self.assertTrue(all(len(message.to) == 1 for message in mail.outbox))
+        shared = NewsletterDigest.objects.get(sent_count=3)
+        self.assertIn("Weekly Tech", shared.body)
+        self.assertNotIn("Draft", shared.body)
+
+    @override_settings(EMAIL_BACKEND="newsApp.tests.FlakyEmailBackend")
+    def test_crashed_run_resumes_without_resending(self):
+        # GIVEN a run that crashes on the third message of its batch.
+        FlakyEmailBackend.calls = 0
+        FlakyEmailBackend.fail_on = 3
+        FlakyEmailBackend.error = RuntimeError("worker killed")
+        with self.assertRaises(RuntimeError):
+            send_digests(batch_size=4)
+        self.assertEqual(len(mail.outbox), 2)
+        # WHEN the command is run again.
+        out = StringIO()
+        call_command("send_newsletter_digest", "--batch-size", "4", stdout=out)
+        # THEN the same run finishes with the remaining readers only.
+        self.assertEqual(len(mail.outbox), 4)
+        recipients = sorted(message.to[0] for message in mail.outbox)
+        self.assertEqual(len(set(recipients)), 4)
+        self.assertIn("resumed", out.getvalue())
+        self.assertEqual(NewsletterDigestRun.objects.count(), 1)
+
+    @override_settings(EMAIL_BACKEND="newsApp.tests.FlakyEmailBackend")
+    def test_refused_recipient_is_counted_and_skipped(self):
+        # GIVEN a relay that refuses the second reader.
+        FlakyEmailBackend.calls = 0
+        FlakyEmailBackend.fail_on = 2
+        FlakyEmailBackend.error = smtplib.SMTPRecipientsRefused(
+            {"reader1@example.com": (550, b"No such user")}
+        )
+        # WHEN the digest is sent.
+        with self.assertLogs("newsApp.mailer", level="WARNING"):
+            summary = send_digests(batch_size=4)
+        # THEN the others are mailed and the run finishes with the
+        # failure on record, so nothing is sent again.
+        self.assertEqual((summary["sent"], summary["failed"]), (3, 1))
+        run = NewsletterDigestRun.objects.get()
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(run.failed_count, 1)
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib; records every envelope."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 stub ESMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 stub")
+            elif verb in ("MAIL", "RSET"):
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip(" <>")
+                if address in server.rejected:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    line = self.rfile.readline()
+                    if line in (b".\r\n", b""):
+                        break
+                    data.append(line)
+                with server.lock:
+                    server.envelopes.append((recipients, b"".join(data)))
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Not implemented")
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, rejected=()):
+        super().__init__(("127.0.0.1", 0), StubSMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.envelopes = []
+        self.rejected = set(rejected)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class SubscriberNotificationTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A pending article whose journalist has five
+        # subscribers, one with an address the relay refuses.
+        # DNS_NAME caches the host's FQDN on first use; skip the lookup.
+        patcher = mock.patch.object(
+            DNS_NAME, "_fqdn", "localhost", create=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.editor = User.objects.create_user(
+            username="editor1", password="Editor@123", role="editor"
+        )
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        for index in range(4):
+            User.objects.create_user(
+                username=f"reader{index}",
+                email=f"reader{index}@example.com",
+                role="reader",
+            ).subscriptions_journalists.add(self.journalist)
+        User.objects.create_user(
+            username="bounce", email="bounce@example.com", role="reader"
+        ).subscriptions_journalists.add(self.journalist)
+        self.article = Article.objects.create(
+            title="Breaking",
+            content="Breaking content.",
+            author=self.journalist,
+        )
+
+    def smtp_settings(self, server):
+        return override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=server.server_address[1],
+            NOTIFICATION_BATCH_SIZE=2,
+        )
+
+    @override_settings(ANNOUNCEMENT_WORKERS=0)
+    def test_each_subscriber_gets_a_private_message(self):
+        with StubSMTPServer(rejected={"bounce@example.com"}) as server:
+            with self.smtp_settings(server):
+                # WHEN the editor approves the article.
+                with self.assertLogs("newsApp.mailer", level="WARNING"):
+                    with self.captureOnCommitCallbacks(execute=True):
+                        self.article.approve(self.editor)
+        # THEN four envelopes with one recipient each were delivered over
+        # one connection per batch of two.
+        self.assertEqual(len(server.envelopes), 4)
+        self.assertTrue(all(len(rcpt) == 1 for rcpt, _ in server.envelopes))
+        self.assertEqual(server.connections, 3)
+        bodies = b"".join(body for _, body in server.envelopes)
+        self.assertIn(b"Hello reader0", bodies)
+
+    def test_refused_recipients_are_reported(self):
+        with StubSMTPServer(rejected={"bounce@example.com"}) as server:
+            with self.smtp_settings(server):
+                # WHEN subscribers are notified.
+                with self.assertLogs("newsApp.mailer", level="WARNING"):
+                    report = notify_subscribers(self.article)
+        # THEN the refused address is accounted for, the rest are sent.
+        self.assertEqual(report.sent, 4)
+        self.assertEqual([rcpt for rcpt, _ in report.failed], ["bounce@example.com"])
+
+    @override_settings(ANNOUNCEMENT_WORKERS=0)
+    def test_announcements_are_sent_once_after_commit(self):
+        # WHEN the editor approves the article.
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.article.approve(self.editor)
+        # THEN nothing is sent until the approval commits.
+        self.assertEqual(len(mail.outbox), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(mail.outbox), 5)
+        # AND the approval is not announced a second time.
+        self.assertFalse(announcements.announce(self.article.pk))
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_command_sends_announcements_left_behind(self):
+        # GIVEN an approval whose announcement was never sent (its
+        # on-commit callback is dropped).
+        with self.captureOnCommitCallbacks():
+            self.article.approve(self.editor)
+        # WHEN the command runs, twice.
+        out = StringIO()
+        call_command("send_announcements", "--older-than", "0", stdout=out)
+        call_command("send_announcements", "--older-than", "0", stdout=out)
+        # THEN the subscribers were told once.
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(
+            out.getvalue().splitlines(),
+            ["1 approvals announced.", "0 approvals announced."],
+        )
+
+    def test_rate_limiter_spaces_sends(self):
+        # GIVEN a limit of 50 messages per second.
+        limiter = RateLimiter(50)
+        start = time.monotonic()
+        # WHEN six messages are sent.
+        for _ in range(6):
+            limiter.wait()
+        # THEN at least five intervals of 20 ms have passed.
+        self.assertGreaterEqual(time.monotonic() - start, 0.099)
+
+
+@override_settings(
+    API_THROTTLE_RATES={
+        "articles": {
+            "reader": {"list": "2/min"},
+            "journalist": {"list": "50/min", "create": "1/min"},
+        },
+        "article_changes": {"reader": {"list": "1/min"}},
+    }
+)
+class ApiThrottlingTests(TestCase):
+    def setUp(self):
+        # ARRANGE: An empty cache, a reader and a journalist.
+        cache.clear()
+        self.api_client = APIClient()
+        self.reader = User.objects.create_user(
+            username="reader1", password="Reader@123", role="reader"
+        )
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+
+    def test_reader_over_budget_gets_429_with_retry_after(self):
+        # GIVEN a reader with a budget of two list calls a minute.
+        self.api_client.force_authenticate(self.reader)
+        url = reverse("api_article_list")
+        # WHEN the feed is polled three times.
+        responses = [self.api_client.get(url) for _ in range(3)]
+        # THEN the third call is throttled and says when to retry.
+        self.assertEqual([r.status_code for r in responses], [200, 200, 429])
+        retry_after = int(responses[2]["Retry-After"])
+        self.assertTrue(0 < retry_after <= 120)
+
+    def test_sync_has_its_own_budget(self):
+        # GIVEN a reader who has used up their list budget.
+        self.api_client.force_authenticate(self.reader)
+        for _ in range(3):
+            self.api_client.get(reverse("api_article_list"))
+        # WHEN they sync twice.
+        url = reverse("api_article_changes")
+        responses = [self.api_client.get(url) for _ in range(2)]
+        # THEN the first sync is allowed and the second counts against
+        # the sync budget only.
+        self.assertEqual([r.status_code for r in responses], [200, 429])
+
+    def test_list_and_create_have_separate_budgets(self):
+        # GIVEN a journalist who has used their one create this minute.
+        self.api_client.force_authenticate(self.journalist)
+        url = reverse("api_article_list")
+        created = self.api_client.post(url, {"title": "A", "content": "B"})
+        # WHEN they create again and then list.
+        second = self.api_client.post(url, {"title": "C", "content": "D"})
+        listed = self.api_client.get(url)
+        # THEN only the second create is throttled.
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(second.status_code, 429)
+        self.assertEqual(listed.status_code, 200)
+
+    def test_concurrent_requests_never_exceed_the_budget(self):
+        # GIVEN a frozen clock and 8 worker threads sharing a budget of 50.
+        throttle = RoleScopedThrottle()
+        allowed = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(25):
+                result = throttle.check("articles", "journalist", "list", "u1")
+                with lock:
+                    allowed.append(result)
+
+        with mock.patch.object(
+            RoleScopedThrottle, "timer", staticmethod(lambda: 6_000_030.0)
+        ):
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        # THEN exactly 50 of the 200 requests were let through.
+        self.assertEqual(allowed.count(True), 50)
+
+    def test_check_runs_no_queries(self):
+        # WHEN the limiter is consulted.
+        with self.assertNumQueries(0):
+            RoleScopedThrottle().check("articles", "reader", "list", "u2")
+
+    def test_previous_window_is_weighted(self):
+        # GIVEN 50 requests at the end of the previous minute.
+        throttle = RoleScopedThrottle()
+        with mock.patch.object(
+            RoleScopedThrottle, "timer", staticmethod(lambda: 6_000_059.0)
+        ):
+            for _ in range(50):
+                throttle.check("articles", "journalist", "list", "u3")
+        # WHEN 15 seconds into the next minute (75% overlap) more arrive.
+        with mock.patch.object(
+            RoleScopedThrottle, "timer", staticmethod(lambda: 6_000_075.0)
+        ):
+            results = [
+                throttle.check("articles", "journalist", "list", "u3")
+                for _ in range(20)
+            ]
+        # THEN only 50 - 0.75 * 50 = 12 fit.
+        self.assertEqual(results.count(True), 12)
+
+
+@override_settings(VIEW_COUNT_FLUSH_SECONDS=3600, VIEW_COUNT_MAX_PENDING=1000)
+class ViewCountingTests(TestCase):
+    def setUp(self):
+        # ARRANGE: An empty view buffer and cache, a reader and two
+        # approved articles.
+        popularity.view_counter.take()
+        cache.clear()
+        self.reader = User.objects.create_user(
+            username="reader1", password="Reader@123", role="reader"
+        )
+        journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.first, self.second = [
+            Article.objects.create(
+                title=title, content="Body", author=journalist, status="approved"
+            )
+            for title in ("First", "Second")
+        ]
+        self.client.login(username="reader1", password="Reader@123")
+
+    def tearDown(self):
+        popularity.view_counter.take()
+
+    def test_reads_are_buffered_and_flushed_in_bulk(self):
+        # GIVEN an article read five times and another read twice.
+        updated_at = self.first.updated_at
+        for pk in [self.first.pk] * 5 + [self.second.pk] * 2:
+            with CaptureQueriesContext(connection) as reads:
+                self.client.get(reverse("article_detail", args=[pk]))
+            # THEN no read writes to the database.
+            self.assertFalse(
+                [q for q in reads if q["sql"].startswith("UPDATE")]
+            )
+        # WHEN the buffer is flushed.
+        with CaptureQueriesContext(connection) as flush:
+            written = popularity.view_counter.flush()
+        # THEN all reads land with one UPDATE for buckets and one for
+        # the articles, and updated_at is left alone.
+        self.assertEqual(written, 7)
+        updates = [q for q in flush if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 2)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.view_count, 5)
+        self.assertEqual(self.first.updated_at, updated_at)
+        self.assertEqual(
+            ArticleViewBucket.objects.get(article=self.second).views, 2
+        )
+
+    @override_settings(VIEW_COUNT_MAX_PENDING=1)
+    def test_full_buffer_is_flushed_off_the_request(self):
+        # GIVEN a counter whose flush thread is not running.
+        counter = popularity.ViewCounter()
+        with mock.patch.object(popularity, "view_counter", counter):
+            with mock.patch.object(counter, "_start_timer"):
+                # WHEN a read fills its buffer.
+                with CaptureQueriesContext(connection) as reads:
+                    self.client.get(
+                        reverse("article_detail", args=[self.first.pk])
+                    )
+        # THEN the request writes nothing and wakes the thread, which
+        # writes the read.
+        writes = ("INSERT", "UPDATE", "DELETE")
+        self.assertFalse([q for q in reads if q["sql"].startswith(writes)])
+        self.assertTrue(counter.wakeup.is_set())
+        self.assertEqual(counter.flush_if_due(), 1)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.view_count, 1)
+
+    def test_flush_adds_to_existing_buckets(self):
+        # GIVEN two flushes within the same hour.
+        for _ in range(2):
+            for _ in range(3):
+                popularity.view_counter.record(self.first.pk)
+            popularity.view_counter.flush()
+        # THEN the hour bucket holds both.
+        self.assertEqual(
+            ArticleViewBucket.objects.get(article=self.first).views, 6
+        )
+
+    def test_rankings_cover_their_period(self):
+        # GIVEN reads today for the first article and reads three days
+        # ago for the second.
+        now = timezone.now()
+        ArticleViewBucket.objects.create(
+            article=self.first, hour=popularity.hour_of(now), views=10
+        )
+        ArticleViewBucket.objects.create(
+            article=self.second,
+            hour=popularity.hour_of(now - timedelta(days=3)),
+            views=50,
+        )
+        # WHEN the rankings are read.
+        day = popularity.most_read("24h")
+        week = popularity.most_read("7d")
+        # THEN each only counts its own period, and is cached.
+        self.assertEqual(day, [(self.first.pk, 10)])
+        self.assertEqual(week, [(self.second.pk, 50), (self.first.pk, 10)])
+        with self.assertNumQueries(0):
+            popularity.most_read("7d")
+
+    def test_most_read_page_and_api(self):
+        # GIVEN flushed reads.
+        for pk in [self.second.pk] * 3 + [self.first.pk]:
+            popularity.view_counter.record(pk)
+        popularity.view_counter.flush()
+        # WHEN the page and the API are requested.
+        page = self.client.get(reverse("most_read"))
+        api_client = APIClient()
+        api_client.force_authenticate(self.reader)
+        api = api_client.get(reverse("api_most_read"), {"period": "7d"})
+        bad = api_client.get(reverse("api_most_read"), {"period": "1y"})
+        # THEN both list the most read first with their views.
+        self.assertContains(page, "3 views")
+        self.assertEqual(
+            [(row["title"], row["views"]) for row in api.json()],
+            [("Second", 3), ("First", 1)],
+        )
+        self.assertEqual(bad.status_code, 400)
+
+    def test_save_after_flush_keeps_the_count(self):
+        # GIVEN an instance loaded before its reads are flushed.
+        stale = Article.objects.get(pk=self.first.pk)
+        for _ in range(5):
+            popularity.view_counter.record(self.first.pk)
+        popularity.view_counter.flush()
+        # WHEN the stale instance is saved.
+        stale.approve(self.reader)
+        # THEN the flushed reads are kept.
+        stale.refresh_from_db()
+        self.assertEqual(stale.view_count, 5)
+
+
+class RelatedArticlesTests(TestCase):
+    def setUp(self):
+        # ARRANGE: Two football and two election articles, plus a
+        # pending football article.
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.football = [
+            self.create("Football final", "The striker scored a late goal."),
+            self.create("Cup final goal", "A late goal from the striker."),
+        ]
+        self.elections = [
+            self.create("Election results", "Voters turned out at the polls."),
+            self.create("Polls close", "Election turnout of voters was high."),
+        ]
+        self.pending = self.create(
+            "Football cup", "A striker goal in the final.", status="pending"
+        )
+
+    def create(self, title, content, status="approved"):
+        return Article.objects.create(
+            title=title, content=content, author=self.journalist, status=status
+        )
+
+    def test_full_build_links_similar_articles(self):
+        # WHEN the related articles are built.
+        run = related.build(k=2)
+        # THEN each article's best match is on the same subject, and the
+        # pending article is neither scored nor recommended.
+        self.assertEqual(run.articles, 4)
+        self.assertEqual(
+            list(self.football[0].related_articles()), [self.football[1]]
+        )
+        self.assertEqual(
+            list(self.elections[1].related_articles()), [self.elections[0]]
+        )
+        self.assertFalse(RelatedArticle.objects.filter(related=self.pending))
+
+    def test_detail_page_lists_related_articles(self):
+        # GIVEN built recommendations and a logged-in reader.
+        related.build()
+        User.objects.create_user(
+            username="reader1", password="Reader@123", role="reader"
+        )
+        self.client.login(username="reader1", password="Reader@123")
+        # WHEN an article page is opened.
+        response = self.client.get(
+            reverse("article_detail", args=[self.elections[0].pk])
+        )
+        # THEN it links to the related article.
+        self.assertContains(
+            response, reverse("article_detail", args=[self.elections[1].pk])
+        )
+
+    def test_incremental_build_scores_only_new_articles(self):
+        # GIVEN a full build, after which the pending article is approved.
+        related.build(k=2)
+        self.pending.status = "approved"
+        self.pending.save()
+        # WHEN an incremental build runs.
+        run = related.build(incremental=True, k=2)
+        # THEN only the new article was scored, and it now appears in
+        # the football articles' lists.
+        self.assertTrue(run.incremental)
+        self.assertEqual(run.articles, 1)
+        self.assertEqual(
+            set(self.pending.related_articles()), set(self.football)
+        )
+        self.assertIn(self.pending, self.football[0].related_articles())
+        self.assertNotIn(self.pending, self.elections[0].related_articles())
+
+    def test_blocked_top_neighbours_match_brute_force(self):
+        # GIVEN random unit vectors.
+        rng = np.random.default_rng(0)
+        matrix = rng.random((50, 8), dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        # WHEN the neighbours are computed in blocks of 7.
+        indices, _ = related.top_neighbours(
+            matrix, np.arange(50), 3, block_size=7
+        )
+        # THEN they match a full sort of the similarity matrix.
+        similarity = matrix @ matrix.T
+        np.fill_diagonal(similarity, -1)
+        expected = np.argsort(-similarity, axis=1)[:, :3]
+        np.testing.assert_array_equal(indices, expected)
+
+
+STORY = (
+    "The city council voted on Tuesday to approve the new budget for "
+    "public transport, adding three bus routes and extending the tram "
+    "line to the harbour district. Residents had campaigned for two "
+    "years for better connections, and the mayor said the first new "
+    "buses would run before the end of the summer. Opposition members "
+    "questioned the cost of the tram extension and asked for an "
+    "independent review of the contracts."
+)
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A journalist who has submitted a story, and an editor.
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        User.objects.create_user(
+            username="editor1", password="Editor@123", role="editor"
+        )
+        self.original = Article.objects.create(
+            title="Budget approved", content=STORY, author=self.journalist
+        )
+
+    def test_resubmitted_story_is_flagged_in_approval_queue(self):
+        # GIVEN the same story resubmitted with a small edit.
+        self.client.login(username="journalist1", password="Journalist@123")
+        self.client.post(
+            reverse("article_create"),
+            {
+                "title": "Council budget",
+                "content": STORY.replace("Tuesday", "Wednesday"),
+            },
+        )
+        resubmitted = Article.objects.get(title="Council budget")
+        # WHEN an editor claims the pending articles for review.
+        self.client.login(username="editor1", password="Editor@123")
+        response = self.client.post(
+            reverse("article_approval"), {"action": "claim"}, follow=True
+        )
+        # THEN the resubmission is flagged as a duplicate of the original.
+        self.assertEqual(
+            resubmitted.signature.duplicate_of_id, self.original.pk
+        )
+        self.assertGreaterEqual(resubmitted.signature.similarity, 0.8)
+        self.assertContains(response, "Possible duplicate", count=1)
+
+    def test_unrelated_story_is_not_flagged(self):
+        # WHEN a different story is submitted.
+        other = Article.objects.create(
+            title="Match report",
+            content="The home side won the derby with two late goals "
+            "after a goalless first half in front of a sold out crowd.",
+            author=self.journalist,
+        )
+        # THEN it is indexed but not flagged.
+        self.assertIsNone(other.signature.duplicate_of)
+
+    def test_lookup_cost_does_not_grow_with_corpus(self):
+        # GIVEN a signature to look up.
+        signature = duplicates.minhash(STORY)
+        keys = duplicates.band_keys(signature)
+        # WHEN it is checked against the index.
+        with self.assertNumQueries(2):
+            found = duplicates.find_duplicate(signature, keys)
+        # THEN the candidates come from one indexed query.
+        self.assertEqual(found, (self.original.pk, 1.0))
+
+    def test_backfill_indexes_existing_articles(self):
+        # GIVEN articles saved without signatures (bulk_create skips
+        # signals).
+        ArticleSignature.objects.all().delete()
+        Article.objects.bulk_create(
+            [Article(title="Copy", content=STORY, author=self.journalist)]
+        )
+        # WHEN the backfill command runs.
+        out = StringIO()
+        call_command("backfill_minhash", stdout=out)
+        # THEN both are indexed and the copy is flagged.
+        copy = Article.objects.get(title="Copy")
+        self.assertEqual(copy.signature.duplicate_of_id, self.original.pk)
+        self.assertIn("2 articles indexed, 1 flagged", out.getvalue())
+
+
+@override_settings(REVIEW_CLAIM_BATCH=2, REVIEW_CLAIM_SECONDS=600)
+class ReviewQueueTests(TestCase):
+    def setUp(self):
+        # ARRANGE: Two editors and five pending articles.
+        self.alice, self.bob = [
+            User.objects.create_user(
+                username=name, password="Editor@123", role="editor"
+            )
+            for name in ("alice", "bob")
+        ]
+        journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.articles = [
+            Article.objects.create(
+                title=f"Story {index}", content="Body", author=journalist
+            )
+            for index in range(5)
+        ]
+
+    def test_editors_claim_disjoint_batches(self):
+        # WHEN both editors claim the next batch.
+        alice = review_queue.claim_next(self.alice)
+        bob = review_queue.claim_next(self.bob)
+        # THEN they get different articles, oldest first.
+        ids = [article.pk for article in self.articles]
+        self.assertEqual(alice, ids[:2])
+        self.assertEqual(bob, ids[2:4])
+
+    def test_queue_shows_only_own_claims(self):
+        # GIVEN Alice has claimed two articles.
+        review_queue.claim_next(self.alice)
+        # WHEN Bob opens his queue before claiming.
+        self.client.login(username="bob", password="Editor@123")
+        response = self.client.get(reverse("article_approval"))
+        # THEN he sees none of Alice's articles.
+        self.assertNotContains(response, "Story 0")
+        self.assertContains(response, "3 unclaimed articles waiting")
+
+    def test_expired_lease_returns_article_to_queue(self):
+        # GIVEN Alice's claims have expired.
+        review_queue.claim_next(self.alice)
+        Article.objects.filter(claimed_by=self.alice).update(
+            claim_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        # WHEN Bob claims.
+        bob = review_queue.claim_next(self.bob)
+        # THEN he gets the oldest articles again.
+        self.assertEqual(bob, [self.articles[0].pk, self.articles[1].pk])
+        self.assertFalse(review_queue.my_claims(self.alice))
+
+    def test_cannot_decide_article_claimed_by_another_editor(self):
+        # GIVEN Alice holds the oldest article.
+        review_queue.claim_next(self.alice)
+        # WHEN Bob tries to approve it.
+        self.client.login(username="bob", password="Editor@123")
+        self.client.post(
+            reverse("article_approval"),
+            {"article_id": self.articles[0].pk, "action": "approve"},
+        )
+        # THEN it stays pending and claimed by Alice.
+        self.articles[0].refresh_from_db()
+        self.assertEqual(self.articles[0].status, "pending")
+        self.assertEqual(self.articles[0].claimed_by, self.alice)
+
+    def test_approving_clears_the_claim(self):
+        # GIVEN Alice holds the oldest article.
+        review_queue.claim_next(self.alice)
+        self.client.login(username="alice", password="Editor@123")
+        # WHEN she approves it.
+        self.client.post(
+            reverse("article_approval"),
+            {"article_id": self.articles[0].pk, "action": "approve"},
+        )
+        # THEN it is approved and no longer claimed.
+        self.articles[0].refresh_from_db()
+        self.assertEqual(self.articles[0].status, "approved")
+        self.assertIsNone(self.articles[0].claimed_by)
+
+
+class ReviewQueueConcurrencyTests(TransactionTestCase):
+    # Committed data, so that the editors' threads can see it.
+    def setUp(self):
+        # ARRANGE: Five pending articles.
+        journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        for index in range(5):
+            Article.objects.create(
+                title=f"Story {index}", content="Body", author=journalist
+            )
+
+    def test_concurrent_claims_never_overlap(self):
+        # GIVEN four editors claiming at the same time.
+        editors = [
+            User.objects.create_user(username=f"editor{index}", role="editor")
+            for index in range(4)
+        ]
+        claims = {}
+
+        def claim(editor):
+            try:
+                claims[editor.pk] = review_queue.claim_next(editor, count=2)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=claim, args=[editor]) for editor in editors
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # THEN no article was handed to two editors.
+        claimed = [pk for ids in claims.values() for pk in ids]
+        self.assertEqual(len(claimed), len(set(claimed)))
+        self.assertEqual(len(claimed), 5)
+
+# Forty paragraphs of shuffled words: long, and not trivially
+# compressible.
+LONG_STORY = "\n".join(
+    f"Paragraph {index}: "
+    + " ".join(random.Random(index).sample(STORY.split(), 20))
+    for index in range(40)
+)
+
+
+@override_settings(REVISION_SNAPSHOT_INTERVAL=5)
+class ArticleRevisionTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A journalist's long article.
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.article = Article.objects.create(
+            title="Budget", content=LONG_STORY, author=self.journalist
+        )
+
+    def edit(self, index):
+        self.article.content = self.article.content.replace(
+            f"Paragraph {index}:", f"Paragraph {index} (updated):"
+        )
+        self.article.save()
+        return self.article.content
+
+    def test_every_revision_can_be_rebuilt(self):
+        # GIVEN twelve edits after the first version.
+        versions = [LONG_STORY] + [self.edit(index) for index in range(12)]
+        # WHEN each revision is rebuilt.
+        rebuilt = [
+            revisions.content_at(self.article.pk, number)
+            for number in range(1, len(versions) + 1)
+        ]
+        # THEN every version comes back, and one revision in five is a
+        # snapshot.
+        self.assertEqual(rebuilt, versions)
+        self.assertEqual(
+            list(
+                ArticleRevision.objects.filter(
+                    article=self.article, base=F("number")
+                ).values_list("number", flat=True)
+            ),
+            [1, 6, 11],
+        )
+
+    def test_diffs_are_small_and_rebuilt_in_one_query(self):
+        # GIVEN a one-word edit.
+        self.edit(7)
+        snapshot, diff = ArticleRevision.objects.filter(article=self.article)
+        # THEN the diff is a small fraction of the snapshot.
+        self.assertFalse(diff.is_snapshot)
+        self.assertLess(len(diff.data) * 10, len(snapshot.data))
+        # AND rebuilding it takes one query.
+        with self.assertNumQueries(1):
+            revisions.content_at(self.article.pk, 2)
+
+    def test_saves_without_edits_add_no_revision(self):
+        # WHEN the article is approved and saved again unchanged.
+        self.article.approve(editor=self.journalist)
+        self.article.save()
+        # THEN only the first revision exists.
+        self.assertEqual(self.article.revisions.count(), 1)
+
+    def test_failed_revision_rolls_back_the_edit(self):
+        # GIVEN the revision cannot be written.
+        self.article.content = "Rewritten"
+        with mock.patch.object(
+            ArticleRevision.objects, "create", side_effect=IntegrityError
+        ):
+            # WHEN the edit is saved.
+            with self.assertRaises(IntegrityError):
+                self.article.save()
+        # THEN the article is unchanged.
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.content, LONG_STORY)
+
+    def test_edit_of_article_without_history_keeps_old_text(self):
+        # GIVEN an article created without revisions (bulk_create).
+        (article,) = Article.objects.bulk_create(
+            [Article(title="Old", content="Old text", author=self.journalist)]
+        )
+        # WHEN it is edited.
+        article.content = "New text"
+        article.save()
+        # THEN the old text is revision 1 and the edit revision 2.
+        self.assertEqual(revisions.content_at(article.pk, 1), "Old text")
+        self.assertEqual(revisions.content_at(article.pk, 2), "New text")
+
+
+class WarmUpTests(TransactionTestCase):
+    # warm_up() closes the connections, which a TestCase transaction
+    # would not survive.
+    def test_warm_up_fills_most_read_cache(self):
+        # GIVEN an empty cache.
+        cache.clear()
+        # WHEN the worker is warmed up.
+        timings = warmup.warm_up()
+        # THEN every step ran and the rankings are cached.
+        self.assertEqual(
+            [name for name, seconds in timings if seconds is not None],
+            [name for name, _ in warmup.STEPS],
+        )
+        with self.assertNumQueries(0):
+            popularity.most_read("24h")
+
+    def test_warm_up_leaves_no_connection_open(self):
+        # WHEN the worker is warmed up.
+        with mock.patch.object(
+            connections, "close_all", wraps=connections.close_all
+        ) as close_all:
+            warmup.warm_up()
+        # THEN no connection is left open for forked workers to share
+        # (Django never closes an in-memory SQLite test database).
+        close_all.assert_called_once_with()
+        self.assertEqual(
+            [
+                conn.alias
+                for conn in connections.all(initialized_only=True)
+                if conn.connection is not None
+                and not (conn.vendor == "sqlite" and conn.is_in_memory_db())
+            ],
+            [],
+        )
+
+
+class StartupTests(TestCase):
+    def test_setup_does_not_import_heavy_integrations(self):
+        # WHEN a fresh worker runs django.setup().
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, django; django.setup(); "
+                "print('requests' in sys.modules, 'numpy' in sys.modules)",
+            ],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # THEN neither requests nor NumPy has been imported yet.
+        self.assertEqual(result.stdout.split(), ["False", "False"])
+
+    def test_startup_profile_reports_phases_and_packages(self):
+        # WHEN the startup profile is run.
+        out = StringIO()
+        call_command("startup_profile", "--limit", "3", stdout=out)
+        # THEN it reports the setup phase and the slowest packages.
+        self.assertIn("django.setup()", out.getvalue())
+        self.assertIn("django", out.getvalue().split("package")[-1])
+
+
+def png_upload(width=900, height=600, name="photo.png"):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "steelblue").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+
+@override_settings(ARTICLE_IMAGE_WORKERS=0, ARTICLE_IMAGE_WIDTHS=[400, 800])
+class ArticleImageTests(TestCase):
+    def setUp(self):
+        # ARRANGE: Uploads go to a throwaway media folder.
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+
+    def test_upload_builds_hashed_variants_after_commit(self):
+        # WHEN a journalist submits an article with a 600px image.
+        self.client.login(username="journalist1", password="Journalist@123")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("article_create"),
+                {
+                    "title": "Harbour",
+                    "content": "Body",
+                    "image": png_upload(width=600, height=400),
+                },
+            )
+        article = Article.objects.get(title="Harbour")
+        # THEN WebP and JPEG variants exist at 400px and at the image's
+        # own width (never upscaled to 800px), each named after the hash
+        # of its bytes.
+        variants = list(article.image_variants.all())
+        self.assertEqual(
+            [(v.format, v.width, v.height) for v in variants],
+            [
+                ("jpeg", 400, 267),
+                ("jpeg", 600, 400),
+                ("webp", 400, 267),
+                ("webp", 600, 400),
+            ],
+        )
+        for variant in variants:
+            digest = hashlib.sha256(variant.file.read()).hexdigest()
+            self.assertIn(digest[:32], variant.file.name)
+
+    def test_tile_markup_uses_srcset_and_lazy_loading(self):
+        # GIVEN an article whose variants are built.
+        article = Article.objects.create(
+            title="Harbour", content="Body", author=self.journalist
+        )
+        article.image = png_upload()
+        article.save()
+        thumbnails.process(article.pk)
+        # WHEN its tile is rendered.
+        html = Template(
+            '{% load article_images %}{% article_picture article "tile" %}'
+        ).render(Context({"article": article}))
+        # THEN the browser can pick a WebP or JPEG size, lazily.
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(" 400w, ", html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('width="400" height="267"', html)
+
+    def test_variants_of_replaced_image_are_discarded(self):
+        # GIVEN variants rendered from an image that has since been
+        # replaced.
+        article = Article.objects.create(
+            title="Harbour",
+            content="Body",
+            author=self.journalist,
+            image=png_upload(),
+        )
+        source, data = thumbnails.original(article.pk)
+        rendered = thumbnails.images.render_variants(data, [400])
+        article.image = png_upload(name="other.png")
+        article.save()
+        # WHEN the stale variants arrive.
+        stored = thumbnails.store(article.pk, source, rendered)
+        # THEN they are not attached to the article.
+        self.assertEqual(stored, 0)
+        self.assertFalse(
+            ArticleImageVariant.objects.filter(source=source).exists()
+        )
+
+    def test_backfill_resizes_in_worker_processes(self):
+        # GIVEN an article saved with an image but no variants.
+        (article,) = Article.objects.bulk_create(
+            [Article(title="Old", content="Body", author=self.journalist)]
+        )
+        article.image.save("old.png", png_upload(width=500), save=False)
+        Article.objects.filter(pk=article.pk).update(image=article.image.name)
+        # WHEN the backfill runs with a worker process.
+        out = StringIO()
+        call_command("build_image_variants", "--workers", "1", stdout=out)
+        # THEN the image gets variants, and a second run has nothing to
+        # do.
+        self.assertEqual(article.image_variants.count(), 4)
+        call_command("build_image_variants", stdout=out)
+        self.assertIn("0 variants of 0 images", out.getvalue())
+
+
+class ArticleCacheTests(TestCase):
+    def setUp(self):
+        # ARRANGE: An approved and a pending article, and one user of
+        # each role.
+        cache.clear()
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        User.objects.create_user(
+            username="journalist2", password="Journalist@123", role="journalist"
+        )
+        User.objects.create_user(
+            username="reader1", password="Reader@123", role="reader"
+        )
+        self.article = Article.objects.create(
+            title="Breaking", content="Body", author=self.journalist
+        )
+        self.article.approve(editor=self.journalist)
+        self.pending = Article.objects.create(
+            title="Draft", content="Body", author=self.journalist
+        )
+
+    def test_hits_do_not_query_the_database(self):
+        # GIVEN a record loaded once.
+        with self.assertNumQueries(2):
+            article_cache.get(self.article.pk)
+        # WHEN it is read again.
+        with self.assertNumQueries(0):
+            record = article_cache.get(self.article.pk)
+        # THEN it has the author's name without a query.
+        with self.assertNumQueries(0):
+            article = article_cache.to_article(record)
+            self.assertEqual(article.author.username, "journalist1")
+
+    def test_edits_and_renames_are_visible_at_once(self):
+        # GIVEN a reader who has seen the article.
+        self.client.login(username="reader1", password="Reader@123")
+        self.client.get(reverse("article_detail", args=[self.article.pk]))
+        # WHEN the article is edited and its author renamed.
+        self.article.title = "Breaking: update"
+        self.article.save()
+        self.journalist.username = "journalist_renamed"
+        self.journalist.save()
+        response = self.client.get(
+            reverse("article_detail", args=[self.article.pk])
+        )
+        # THEN the page shows both changes.
+        self.assertContains(response, "Breaking: update")
+        self.assertContains(response, "journalist_renamed")
+
+    def test_visibility_is_checked_against_cached_record(self):
+        # GIVEN the pending article's record is cached.
+        article_cache.get(self.pending.pk)
+        url = reverse("article_detail", args=[self.pending.pk])
+        # WHEN a reader, another journalist and its author open it.
+        self.client.login(username="reader1", password="Reader@123")
+        as_reader = self.client.get(url)
+        self.client.login(username="journalist2", password="Journalist@123")
+        as_other = self.client.get(url)
+        self.client.login(username="journalist1", password="Journalist@123")
+        as_author = self.client.get(url)
+        # THEN only its author may read it.
+        self.assertEqual(as_reader.status_code, 404)
+        self.assertEqual(as_other.status_code, 403)
+        self.assertEqual(as_author.status_code, 200)
+
+    def test_fill_that_raced_a_write_is_never_served(self):
+        # GIVEN a reader that loaded the article just before an edit...
+        version = article_cache._version(self.article.pk)
+        stale = article_cache.load(self.article.pk)
+        self.article.title = "Corrected"
+        self.article.save()
+        # WHEN it stores what it loaded afterwards.
+        cache.set(article_cache._key(self.article.pk, version), stale)
+        # THEN readers still get the edited article.
+        record = article_cache.get(self.article.pk)
+        self.assertEqual(record["title"], "Corrected")
+
+    def test_concurrent_misses_load_once(self):
+        # GIVEN a slow database read.
+        loads = []
+
+        def slow_load(pk):
+            loads.append(pk)
+            time.sleep(0.05)
+            return {"id": pk, "title": "Breaking"}
+
+        # WHEN eight requests miss at the same time.
+        with mock.patch.object(article_cache, "load", side_effect=slow_load):
+            threads = [
+                threading.Thread(target=article_cache.get, args=[12345])
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        # THEN the database was read once.
+        self.assertEqual(loads, [12345])
+
+    def test_timed_out_wait_keeps_the_loaders_lock(self):
+        # GIVEN a fill lock held by a slow request.
+        key = article_cache._key(
+            self.article.pk, article_cache._version(self.article.pk)
+        )
+        cache.add(f"{key}:fill", 1, article_cache.FILL_LOCK_SECONDS)
+        # WHEN another request gives up waiting and loads it itself.
+        with mock.patch.object(article_cache, "FILL_WAIT", 0.01):
+            record = article_cache.get(self.article.pk)
+        # THEN it does not release the lock it never took.
+        self.assertEqual(record["title"], "Breaking")
+        self.assertEqual(cache.get(f"{key}:fill"), 1)
+
+
+# "replica" is routed to but not configured, so any cache fill that
+# reads through the router fails instead of reading stale rows.
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_MAX_LAG_SECONDS=5)
+class PrimaryCacheFillTests(TransactionTestCase):
+    # Committed data: inside a transaction every read uses the primary.
+    def setUp(self):
+        # ARRANGE: A healthy replica, an empty cache, an approved
+        # article and a reader following its publisher.
+        cache.clear()
+        routers.lag_monitor.reset()
+        self.addCleanup(routers.lag_monitor.reset)
+        patcher = mock.patch.object(routers, "replica_lag", return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.article = Article.objects.create(
+            title="Breaking", content="Body", author=self.journalist
+        )
+        self.publisher = Publisher.objects.create(name="Daily")
+        Article.objects.filter(pk=self.article.pk).update(
+            status="approved", publisher=self.publisher
+        )
+        self.reader = User.objects.create_user(
+            username="reader1", password="Reader@123", role="reader"
+        )
+        self.reader.subscriptions_publishers.add(self.publisher)
+
+    def test_article_record_is_loaded_from_the_primary(self):
+        # GIVEN reads that would otherwise go to the replica.
+        router = routers.PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Article), "replica")
+        # WHEN the article's record is filled.
+        record = article_cache.get(self.article.pk)
+        # THEN it was read from the primary.
+        self.assertEqual(record["title"], "Breaking")
+        self.assertEqual(record["image_variants"], [])
+
+    def test_user_record_is_loaded_from_the_primary(self):
+        # WHEN the reader's record is filled.
+        user = auth_cache.get(self.reader.pk)
+        # THEN it was read, with the subscriptions, from the primary.
+        self.assertEqual(user.username, "reader1")
+        self.assertEqual(
+            user.cached_subscription_ids, ([self.publisher.pk], [])
+        )
+
+    def test_reader_feed_is_built_from_the_primary(self):
+        # GIVEN the reader as the API sees them.
+        user = auth_cache.get(self.reader.pk)
+        # WHEN their feed is built.
+        data = feed_cache.reader_feed(user, api_views.reader_feed_data)
+        # THEN it was read from the primary.
+        self.assertEqual([item["title"] for item in data], ["Breaking"])
+
+    def test_publisher_stats_are_loaded_from_the_primary(self):
+        # WHEN the publisher's stats are filled.
+        stats = publisher_stats.get(self.publisher.pk)
+        # THEN every part was read from the primary.
+        self.assertEqual(stats["name"], "Daily")
+        self.assertEqual(stats["recent_articles"][0]["title"], "Breaking")
+        self.assertEqual(stats["subscriber_count"], 1)
+
+
+@override_settings(
+    SESSION_ENGINE="newsApp.session_store",
+    SESSION_WRITE_BEHIND_SECONDS=3600,
+)
+class CachedSessionAndUserTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A reader and an editor, a publisher, and an empty
+        # session write-behind queue.
+        cache.clear()
+        session_store.write_behind.take()
+        self.reader = User.objects.create_user(
+            username="reader1", password="Reader@123", role="reader"
+        )
+        User.objects.create_user(
+            username="editor1", password="Editor@123", role="editor"
+        )
+        self.publisher = Publisher.objects.create(name="Test Publisher")
+
+    def session_and_user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [
+            query["sql"]
+            for query in queries.captured_queries
+            if "django_session" in query["sql"]
+            or "newsApp_customuser" in query["sql"]
+        ]
+
+    def test_logged_in_requests_skip_session_and_user_queries(self):
+        # GIVEN a logged-in reader who has made one request.
+        self.client.login(username="reader1", password="Reader@123")
+        self.client.get(reverse("dashboard"))
+        # WHEN they make another.
+        response, queries = self.session_and_user_queries(
+            reverse("dashboard")
+        )
+        # THEN neither the session nor the user came from the database.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_sessions_are_written_to_the_database_in_bulk(self):
+        # GIVEN two logged-in clients.
+        self.client.login(username="reader1", password="Reader@123")
+        other = Client()
+        other.login(username="editor1", password="Editor@123")
+        self.assertFalse(Session.objects.exists())
+        # WHEN the queue is flushed.
+        with self.assertNumQueries(1):
+            written = session_store.write_behind.flush()
+        # THEN both sessions are in the database, and survive the cache.
+        self.assertEqual(written, 2)
+        cache.clear()
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_queue_is_flushed_once_the_interval_has_passed(self):
+        # GIVEN a logged-in reader, with no request since.
+        self.client.login(username="reader1", password="Reader@123")
+        self.assertEqual(session_store.write_behind.flush_if_due(), 0)
+        # WHEN the flush interval has passed.
+        session_store.write_behind.last_flush -= 3600
+        # THEN the background flush writes the session.
+        self.assertEqual(session_store.write_behind.flush_if_due(), 1)
+        self.assertTrue(Session.objects.exists())
+
+    def test_logout_is_not_undone_by_a_later_flush(self):
+        # GIVEN a session flushed once and changed again since.
+        self.client.login(username="reader1", password="Reader@123")
+        session_store.write_behind.flush()
+        session = self.client.session
+        session["seen"] = True
+        session.save()
+        # WHEN the reader logs out before the next flush.
+        self.client.get(reverse("logout"))
+        session_store.write_behind.flush()
+        # THEN the session is gone from the database too.
+        self.assertFalse(
+            Session.objects.filter(session_key=session.session_key).exists()
+        )
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_role_change_applies_to_the_next_request(self):
+        # GIVEN a reader whose user record is cached.
+        self.client.login(username="reader1", password="Reader@123")
+        url = reverse("article_approval")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        # WHEN they are made an editor.
+        self.reader.role = "editor"
+        self.reader.save()
+        # THEN the editor-only page opens.
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_subscription_changes_drop_the_cached_ids(self):
+        # GIVEN a cached reader following nobody.
+        self.assertEqual(
+            auth_cache.get(self.reader.pk).cached_subscription_ids, ([], [])
+        )
+        # WHEN they are subscribed, from the publisher's side.
+        self.publisher.subscribed_readers.add(self.reader)
+        # THEN the next lookup has the publisher.
+        self.assertEqual(
+            auth_cache.get(self.reader.pk).cached_subscription_ids,
+            ([self.publisher.pk], []),
+        )
+        # AND clearing the publisher's followers drops it again.
+        self.publisher.subscribed_readers.clear()
+        self.assertEqual(
+            auth_cache.get(self.reader.pk).cached_subscription_ids, ([], [])
+        )
+
+    def test_logout_drops_the_cached_user(self):
+        # GIVEN a logged-in reader with a cached record.
+        self.client.login(username="reader1", password="Reader@123")
+        self.client.get(reverse("dashboard"))
+        self.assertIsNotNone(cache.get(auth_cache._key(self.reader.pk)))
+        # WHEN they log out.
+        self.client.get(reverse("logout"))
+        # THEN the record is gone.
+        self.assertIsNone(cache.get(auth_cache._key(self.reader.pk)))
+
+
+class ScalableAdminTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A staff editor, a journalist with a subscriber and
+        # three pending articles.
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin1", password="Admin@12345", role="editor"
+        )
+        journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        reader = User.objects.create_user(
+            username="reader1",
+            password="Reader@123",
+            role="reader",
+            email="reader1@example.com",
+        )
+        reader.subscriptions_journalists.add(journalist)
+        self.articles = [
+            Article.objects.create(
+                title=f"Story {index}", content="Body", author=journalist
+            )
+            for index in range(3)
+        ]
+        self.client.login(username="admin1", password="Admin@12345")
+        self.changelist = reverse("admin:newsApp_article_changelist")
+
+    def run_action(self, action):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.changelist,
+                {
+                    "action": action,
+                    "_selected_action": [a.pk for a in self.articles],
+                },
+            )
+        updates = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "newsApp_article"')
+        ]
+        return response, updates
+
+    @override_settings(ANNOUNCEMENT_WORKERS=0)
+    def test_bulk_approve_is_one_update(self):
+        # GIVEN cached records of the pending articles.
+        for article in self.articles:
+            article_cache.get(article.pk)
+        # WHEN the admin approves all three at once.
+        with self.captureOnCommitCallbacks(execute=True):
+            response, updates = self.run_action("approve_selected")
+        # THEN one UPDATE approved them, the cache shows it and the
+        # subscriber was told about each.
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            Article.objects.filter(
+                status="approved", approved_by=self.admin
+            ).count(),
+            3,
+        )
+        self.assertEqual(
+            article_cache.get(self.articles[0].pk)["status"], "approved"
+        )
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_only_editors_may_bulk_approve(self):
+        # GIVEN a staff journalist with every admin permission.
+        self.admin.role = "journalist"
+        self.admin.save()
+        # WHEN they try the approve action.
+        self.run_action("approve_selected")
+        # THEN nothing is approved.
+        self.assertFalse(Article.objects.filter(status="approved").exists())
+
+    def test_bulk_soft_delete_is_one_update(self):
+        # WHEN the admin soft-deletes all three at once.
+        response, updates = self.run_action("soft_delete_selected")
+        # THEN one UPDATE marked them, and no row was removed.
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Article.objects.filter(is_deleted=True).count(), 3)
+        self.assertTrue(article_cache.get(self.articles[0].pk)["is_deleted"])
+
+    def test_change_form_does_not_list_every_user(self):
+        # WHEN the admin opens the add form.
+        response = self.client.get(reverse("admin:newsApp_article_add"))
+        # THEN the user fields are autocomplete widgets without options.
+        self.assertContains(response, "admin-autocomplete")
+        self.assertNotContains(response, "reader1")
+
+    def test_large_unfiltered_changelist_is_not_counted(self):
+        # GIVEN table statistics reporting a large table.
+        with mock.patch(
+            "newsApp.admin.estimated_count", return_value=250000
+        ):
+            # WHEN the changelist is opened unfiltered, then filtered.
+            with CaptureQueriesContext(connection) as unfiltered:
+                response = self.client.get(self.changelist)
+            with CaptureQueriesContext(connection) as filtered:
+                self.client.get(self.changelist + "?status__exact=pending")
+        # THEN only the filtered list ran a COUNT.
+        self.assertContains(response, "250000")
+        self.assertFalse(
+            any("COUNT(" in q["sql"] for q in unfiltered.captured_queries)
+        )
+        self.assertTrue(
+            any("COUNT(" in q["sql"] for q in filtered.captured_queries)
+        )
+
+
+class ArticleFormPickerTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A journalist writing for two of many publishers.
+        cache.clear()
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        Publisher.objects.bulk_create(
+            Publisher(name=f"Other {index}") for index in range(50)
+        )
+        self.own = [
+            Publisher.objects.create(name=name)
+            for name in ("Daily Planet", "Morning Star")
+        ]
+        for publisher in self.own:
+            publisher.journalists.add(self.journalist)
+        self.other = Publisher.objects.get(name="Other 0")
+        self.client.login(username="journalist1", password="Journalist@123")
+
+    def test_form_renders_without_loading_the_choices(self):
+        # WHEN the journalist opens the article form.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("article_create"))
+        # THEN no publisher is queried or listed.
+        self.assertContains(response, "data-autocomplete-url")
+        self.assertNotContains(response, "Daily Planet")
+        self.assertFalse(
+            any("newsApp_publisher" in q["sql"] for q in queries.captured_queries)
+        )
+
+    def test_only_own_publishers_validate(self):
+        # WHEN the journalist files under a publisher they do not write
+        # for, then under their own.
+        other = self.client.post(
+            reverse("article_create"),
+            {"title": "Scoop", "content": "Body", "publisher": self.other.pk},
+        )
+        own = self.client.post(
+            reverse("article_create"),
+            {"title": "Scoop", "content": "Body", "publisher": self.own[0].pk},
+        )
+        # THEN only the second is accepted.
+        self.assertEqual(other.status_code, 200)
+        self.assertContains(other, "Select a valid choice")
+        self.assertEqual(own.status_code, 302)
+        self.assertEqual(
+            Article.objects.get(title="Scoop").publisher, self.own[0]
+        )
+
+    def test_options_are_scoped_searched_and_cached(self):
+        url = reverse("article_field_options", args=["publisher"])
+        # GIVEN the options loaded once.
+        self.client.get(url)
+        # WHEN the journalist searches them again.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"q": "planet"})
+        # THEN only their matching publisher comes back, from the cache.
+        self.assertEqual(
+            response.json(),
+            {
+                "results": [{"id": self.own[0].pk, "text": "Daily Planet"}],
+                "more": False,
+            },
+        )
+        self.assertFalse(
+            any("newsApp_publisher" in q["sql"] for q in queries.captured_queries)
+        )
+
+    def test_new_membership_shows_in_the_options(self):
+        # GIVEN cached options.
+        url = reverse("article_field_options", args=["publisher"])
+        self.client.get(url)
+        # WHEN the journalist joins another publisher.
+        self.other.journalists.add(self.journalist)
+        # THEN it is offered.
+        names = [r["text"] for r in self.client.get(url).json()["results"]]
+        self.assertEqual(names, ["Daily Planet", "Morning Star", "Other 0"])
+
+
+class PublisherStatsTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A publisher with a journalist, two readers, an
+        # approved and a pending article.
+        cache.clear()
+        self.publisher = Publisher.objects.create(
+            name="Daily Planet", description="Metropolis news"
+        )
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.publisher.journalists.add(self.journalist)
+        self.readers = [
+            User.objects.create_user(
+                username=f"reader{index}", password="Reader@123", role="reader"
+            )
+            for index in range(2)
+        ]
+        self.readers[0].subscriptions_publishers.add(self.publisher)
+        self.category = Category.objects.create(name="Sport", slug="sport")
+        Article.objects.create(
+            title="Cup final",
+            content="Body",
+            author=self.journalist,
+            publisher=self.publisher,
+            category=self.category,
+            status="approved",
+        )
+        self.pending = Article.objects.create(
+            title="Transfer rumour",
+            content="Body",
+            author=self.journalist,
+            publisher=self.publisher,
+            category=self.category,
+        )
+
+    def test_page_shows_cached_stats(self):
+        # WHEN the page is opened twice.
+        response = self.client.get(
+            reverse("publisher_detail", args=[self.publisher.pk])
+        )
+        # THEN it shows the roster, subscribers and output, and the
+        # second time the stats cost no query.
+        self.assertContains(response, "journalist1")
+        self.assertContains(response, "1 subscriber")
+        self.assertContains(response, "Cup final")
+        self.assertNotContains(response, "Transfer rumour")
+        with self.assertNumQueries(0):
+            publisher_stats.get(self.publisher.pk)
+
+    def test_approval_reloads_only_the_article_stats(self):
+        # GIVEN cached stats.
+        publisher_stats.get(self.publisher.pk)
+        # WHEN the pending article is approved.
+        self.pending.approve(editor=self.journalist)
+        # THEN only the two article queries run again.
+        with self.assertNumQueries(2):
+            stats = publisher_stats.get(self.publisher.pk)
+        self.assertEqual(
+            stats["articles_by_category"],
+            [
+                {
+                    "category__slug": "sport",
+                    "category__name": "Sport",
+                    "articles": 2,
+                }
+            ],
+        )
+
+    def test_subscriptions_and_roster_changes_show_at_once(self):
+        # GIVEN cached stats.
+        publisher_stats.get(self.publisher.pk)
+        # WHEN a reader subscribes from the publisher's side and an
+        # editor joins from the user's side.
+        self.publisher.subscribed_readers.add(self.readers[1])
+        editor = User.objects.create_user(
+            username="editor1", password="Editor@123", role="editor"
+        )
+        editor.editing_publishers.add(self.publisher)
+        # THEN both show.
+        stats = publisher_stats.get(self.publisher.pk)
+        self.assertEqual(stats["subscriber_count"], 2)
+        self.assertEqual(
+            stats["editors"], [{"id": editor.pk, "username": "editor1"}]
+        )
+
+    def test_api_returns_stats_and_404s(self):
+        # GIVEN a logged-in reader.
+        self.client.login(username="reader0", password="Reader@123")
+        # WHEN they request an existing and a missing publisher.
+        found = self.client.get(
+            reverse("api_publisher_stats", args=[self.publisher.pk])
+        )
+        missing = self.client.get(reverse("api_publisher_stats", args=[999]))
+        # THEN the first has the stats and the second is a 404.
+        self.assertEqual(found.json()["name"], "Daily Planet")
+        self.assertEqual(found.json()["subscriber_count"], 1)
+        self.assertEqual(missing.status_code, 404)
+
+
+@override_settings(LIVE_FEED_HEARTBEAT_SECONDS=0.05)
+class LiveFeedTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A reader following one of two publishers, each with
+        # a pending article.
+        cache.clear()
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.reader = User.objects.create_user(
+            username="reader1", password="Reader@123", role="reader"
+        )
+        self.followed = Publisher.objects.create(name="Daily Planet")
+        self.other = Publisher.objects.create(name="Daily Bugle")
+        self.reader.subscriptions_publishers.add(self.followed)
+        self.category = Category.objects.create(name="Sport", slug="sport")
+        self.articles = {
+            publisher: Article.objects.create(
+                title=f"{publisher.name} story",
+                content="Body",
+                author=self.journalist,
+                publisher=publisher,
+                category=self.category,
+            )
+            for publisher in (self.followed, self.other)
+        }
+
+    def approve(self, publisher):
+        article = self.articles[publisher]
+        article.status = "approved"
+        article.save()
+
+    async def test_reader_receives_only_followed_approvals(self):
+        events = live_feed.stream(self.reader)
+        try:
+            self.assertTrue((await anext(events)).startswith("retry: "))
+            # WHEN both articles are approved and the hub reads the log.
+            await sync_to_async(self.approve)(self.other)
+            await sync_to_async(self.approve)(self.followed)
+            await live_feed.hub.refresh()
+            # THEN only the followed publisher's approval is sent, then
+            # heartbeats.
+            event = await anext(events)
+            self.assertIn("event: approval\n", event)
+            self.assertIn('"title":"Daily Planet story"', event)
+            self.assertEqual(await anext(events), ": heartbeat\n\n")
+        finally:
+            await events.aclose()
+        self.assertEqual(live_feed.hub.streams, 0)
+
+    async def test_reconnect_replays_missed_events(self):
+        # GIVEN two approvals, the first already seen by an editor.
+        await sync_to_async(self.approve)(self.followed)
+        await sync_to_async(self.approve)(self.other)
+        first, second = [
+            pk
+            async for pk in ApprovalEvent.objects.order_by("id").values_list(
+                "id", flat=True
+            )
+        ]
+        editor = await User.objects.acreate(username="editor1", role="editor")
+        # WHEN the editor reconnects with the first event's ID.
+        events = live_feed.stream(editor, last_event_id=first)
+        try:
+            await anext(events)
+            replayed = await anext(events)
+            # THEN only the second approval is replayed.
+            self.assertTrue(replayed.startswith(f"id: {second}\n"))
+            self.assertEqual(await anext(events), ": heartbeat\n\n")
+        finally:
+            await events.aclose()
+
+    async def test_withdrawn_approval_is_not_sent(self):
+        events = live_feed.stream(self.reader)
+        try:
+            await anext(events)
+            # GIVEN an approval the hub holds but the stream has not
+            # sent yet.
+            await sync_to_async(self.approve)(self.followed)
+            await live_feed.hub.refresh()
+            # WHEN the article is soft-deleted and the hub rereads the
+            # log.
+            await Article.objects.filter(
+                pk=self.articles[self.followed].pk
+            ).aupdate(is_deleted=True)
+            await live_feed.hub.refresh()
+            # THEN the stream only sends heartbeats.
+            self.assertEqual(await anext(events), ": heartbeat\n\n")
+            self.assertEqual(await anext(events), ": heartbeat\n\n")
+        finally:
+            await events.aclose()
+
+    def test_approval_wakes_hub_on_commit(self):
+        # WHEN an article is approved.
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.approve(self.followed)
+        # THEN the approval is logged and the hub is told on commit.
+        self.assertEqual(ApprovalEvent.objects.count(), 1)
+        self.assertIn(live_feed.hub.notify, callbacks)
+
+    def test_view_requires_login_and_streams(self):
+        # WHEN an anonymous visitor and a reader open the live feed.
+        anonymous = async_to_sync(self.async_client.get)(
+            reverse("api_article_live")
+        )
+        request = AsyncRequestFactory().get(reverse("api_article_live"))
+
+        async def auser():
+            return self.reader
+
+        request.auser = auser
+        response = async_to_sync(async_views.article_live)(request)
+        # THEN the visitor is refused and the reader gets an event
+        # stream that proxies must not buffer.
+        self.assertEqual(anonymous.status_code, 403)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["X-Accel-Buffering"], "no")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+    def test_view_is_not_served_under_wsgi(self):
+        # WHEN a reader opens the live feed through the WSGI handler.
+        self.client.login(username="reader1", password="Reader@123")
+        response = self.client.get(reverse("api_article_live"))
+        # THEN it is refused instead of buffering forever.
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+
+
+@override_settings(DELTA_SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A reader following a publisher with two approved
+        # articles, and an article of another publisher.
+        cache.clear()
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.reader = User.objects.create_user(
+            username="reader1", password="Reader@123", role="reader"
+        )
+        self.publisher = Publisher.objects.create(name="Daily Planet")
+        other = Publisher.objects.create(name="Daily Bugle")
+        self.reader.subscriptions_publishers.add(self.publisher)
+        category = Category.objects.create(name="Sport", slug="sport")
+        self.first, self.second, self.unfollowed = [
+            Article.objects.create(
+                title=title,
+                content="Body",
+                author=self.journalist,
+                publisher=publisher,
+                category=category,
+                status="approved",
+            )
+            for title, publisher in [
+                ("Cup final", self.publisher),
+                ("Transfer news", self.publisher),
+                ("Elsewhere", other),
+            ]
+        ]
+
+    def ids(self, result):
+        return [row["id"] for row in result["changes"]]
+
+    def test_sync_sends_changes_and_tombstones(self):
+        # GIVEN a reader who has synced their feed.
+        initial = delta_sync.changes(self.reader)
+        # WHEN an article is soft-deleted and the reader syncs again.
+        self.first.is_deleted = True
+        self.first.save()
+        update = delta_sync.changes(self.reader, initial["next"])
+        # THEN the first sync had the followed articles and the second
+        # only the tombstone.
+        self.assertEqual(self.ids(initial), [self.first.pk, self.second.pk])
+        self.assertEqual(update["changes"], [])
+        self.assertEqual(update["deleted"], [self.first.pk])
+
+    def test_list_leaves_out_what_sync_deletes(self):
+        # GIVEN a soft-deleted article the sync sends as a tombstone.
+        self.first.is_deleted = True
+        self.first.save()
+        # WHEN a reader and an editor list the articles.
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        listed = client.get(reverse("api_article_list")).json()
+        editor = User.objects.create_user(username="editor1", role="editor")
+        client.force_authenticate(editor)
+        edited = client.get(reverse("api_article_list")).json()
+        # THEN neither list shows it.
+        self.assertEqual([row["id"] for row in listed], [self.second.pk])
+        self.assertNotIn(self.first.pk, [row["id"] for row in edited])
+
+    def test_sync_with_nothing_new_is_one_query(self):
+        # GIVEN an editor's sync token.
+        editor = User.objects.create_user(username="editor1", role="editor")
+        token = delta_sync.changes(editor)["next"]
+        # WHEN the editor syncs again.
+        with self.assertNumQueries(1):
+            result = delta_sync.changes(editor, token)
+        # THEN nothing is sent and the token is kept.
+        self.assertEqual(result["changes"] + result["deleted"], [])
+        self.assertEqual(result["next"], token)
+
+    def test_pages_follow_the_token(self):
+        # WHEN the feed is synced one article per page.
+        first = delta_sync.changes(self.reader, page_size=1)
+        second = delta_sync.changes(self.reader, first["next"], page_size=1)
+        # THEN the pages carry on from each other.
+        self.assertEqual(self.ids(first), [self.first.pk])
+        self.assertTrue(first["has_more"])
+        self.assertEqual(self.ids(second), [self.second.pk])
+
+    @override_settings(DELTA_SYNC_SETTLE_SECONDS=60)
+    def test_recent_changes_are_sent_again(self):
+        # WHEN the feed is synced twice while its changes are recent.
+        first = delta_sync.changes(self.reader)
+        second = delta_sync.changes(self.reader, first["next"])
+        # THEN the token stays behind them and they are sent again.
+        self.assertEqual(self.ids(second), self.ids(first))
+
+    def test_api_rejects_invalid_token(self):
+        # WHEN a reader syncs with a valid and an invalid token.
+        self.client.login(username="reader1", password="Reader@123")
+        url = reverse("api_article_changes")
+        token = self.client.get(url).json()["next"]
+        valid = self.client.get(url, {"since": token})
+        invalid = self.client.get(url, {"since": "not-a-token"})
+        # THEN the first succeeds and the second is a 400.
+        self.assertEqual(valid.status_code, 200)
+        self.assertEqual(invalid.status_code, 400)
+
+
+class BulkCreateTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A journalist posting through the API.
+        cache.clear()
+        self.api_client = APIClient()
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.api_client.force_authenticate(self.journalist)
+        self.url = reverse("api_article_list")
+        self.batch = [
+            {"title": f"Wire story {index}", "content": f"Body {index}"}
+            for index in range(3)
+        ]
+
+    def test_list_is_created_in_one_batch(self):
+        # WHEN a batch of three articles is posted.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api_client.post(
+                self.url, self.batch, format="json"
+            )
+        # THEN they are inserted together, with their first revisions
+        # and duplicate signatures.
+        self.assertEqual(response.status_code, 201)
+        ids = [row["id"] for row in response.json()]
+        self.assertEqual(
+            set(Article.objects.values_list("id", flat=True)), set(ids)
+        )
+        self.assertEqual(
+            ArticleRevision.objects.filter(article_id__in=ids).count(), 3
+        )
+        self.assertEqual(ArticleSignature.objects.count(), 3)
+        inserts = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith('INSERT INTO "newsApp_article"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+    def test_ids_are_selected_where_the_insert_returns_none(self):
+        # GIVEN a backend that, like MySQL, returns no IDs from a
+        # multi-row INSERT, and two items with the same title.
+        self.batch[2]["title"] = self.batch[0]["title"]
+        # WHEN the batch is posted.
+        with mock.patch.object(
+            type(connection.features),
+            "can_return_rows_from_bulk_insert",
+            new_callable=mock.PropertyMock,
+            return_value=False,
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.api_client.post(
+                    self.url, self.batch, format="json"
+                )
+        # THEN one INSERT created them, and each item carries the ID of
+        # its own row.
+        self.assertEqual(response.status_code, 201)
+        for item in response.json():
+            self.assertEqual(
+                Article.objects.get(pk=item["id"]).content, item["content"]
+            )
+        self.assertEqual(
+            ArticleRevision.objects.filter(
+                article_id__in=[item["id"] for item in response.json()]
+            ).count(),
+            3,
+        )
+        inserts = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith('INSERT INTO "newsApp_article"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+    def test_invalid_item_rejects_the_whole_batch(self):
+        # WHEN one article of the batch has no title.
+        self.batch[1]["title"] = ""
+        response = self.api_client.post(self.url, self.batch, format="json")
+        # THEN nothing is created and the error points at that item.
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("title", response.json()["1"])
+        self.assertFalse(Article.objects.exists())
+
+    @override_settings(ARTICLE_BULK_CREATE_MAX=2)
+    def test_batch_size_is_limited(self):
+        # WHEN a batch larger than the limit is posted.
+        response = self.api_client.post(self.url, self.batch, format="json")
+        # THEN it is refused.
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Article.objects.exists())
+
+    def test_repeated_idempotency_key_replays_the_response(self):
+        # GIVEN a batch posted with an Idempotency-Key.
+        headers = {"Idempotency-Key": "batch-1"}
+        first = self.api_client.post(
+            self.url, self.batch, format="json", headers=headers
+        )
+        # WHEN it is retried, then the key is reused for another batch.
+        retry = self.api_client.post(
+            self.url, self.batch, format="json", headers=headers
+        )
+        reused = self.api_client.post(
+            self.url, self.batch[:1], format="json", headers=headers
+        )
+        # THEN the retry replays the first response without creating
+        # anything, and the reuse is refused.
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Article.objects.count(), 3)
+        self.assertEqual(reused.status_code, 422)
+
+    def test_failed_request_does_not_keep_its_key(self):
+        # GIVEN an invalid batch posted with an Idempotency-Key.
+        headers = {"Idempotency-Key": "batch-2"}
+        self.batch[0]["title"] = ""
+        self.api_client.post(
+            self.url, self.batch, format="json", headers=headers
+        )
+        # WHEN the corrected batch is posted with the same key.
+        self.batch[0]["title"] = "Fixed"
+        response = self.api_client.post(
+            self.url, self.batch, format="json", headers=headers
+        )
+        # THEN it is created.
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Article.objects.count(), 3)
+
+
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        # ARRANGE: A staff journalist and a journalist who is not staff.
+        self.staff = User.objects.create_user(
+            username="journalist1",
+            password="Journalist@123",
+            role="journalist",
+            is_staff=True,
+        )
+        User.objects.create_user(
+            username="journalist2", password="Journalist@123", role="journalist"
+        )
+
+    def test_staff_profile_records_functions_queries_and_templates(self):
+        # WHEN a staff user asks for a profile of the dashboard.
+        self.client.login(username="journalist1", password="Journalist@123")
+        response = self.client.get(reverse("dashboard"), {"profile": "1"})
+        # THEN the report is stored and linked from the response.
+        profile = RequestProfile.objects.get()
+        self.assertEqual(
+            response["X-Profile-URL"],
+            reverse("request_profile", args=[profile.pk]),
+        )
+        self.assertEqual(profile.view, "dashboard")
+        self.assertEqual(profile.user, self.staff)
+        self.assertTrue(profile.functions)
+        self.assertTrue(
+            any("newsApp_article" in query["sql"] for query in profile.queries)
+        )
+        self.assertEqual(
+            [template["template"] for template in profile.templates],
+            ["newsApp/dashboard.html"],
+        )
+        report = self.client.get(response["X-Profile-URL"])
+        self.assertContains(report, "Hottest functions")
+
+    def test_query_parameters_are_not_stored(self):
+        # WHEN a query with a user's e-mail address is profiled.
+        profile = profiling.Profile()
+        sql = 'SELECT "id" FROM "newsApp_customuser" WHERE "email" = %s'
+        profile.add_query("default", sql, ["reader@example.com"], False, 0.01)
+        # THEN only the parameterised SQL is kept.
+        self.assertEqual(profile.queries[0]["sql"], sql)
+
+    def test_header_triggers_profile(self):
+        # WHEN a staff user sends the X-Profile header.
+        self.client.login(username="journalist1", password="Journalist@123")
+        response = self.client.get(
+            reverse("dashboard"), headers={"X-Profile": "1"}
+        )
+        # THEN the request is profiled.
+        self.assertIn("X-Profile-URL", response)
+        self.assertEqual(RequestProfile.objects.count(), 1)
+
+    def test_other_users_and_plain_requests_are_not_profiled(self):
+        # WHEN a non-staff user asks for a profile and staff do not.
+        self.client.login(username="journalist2", password="Journalist@123")
+        refused = self.client.get(reverse("dashboard"), {"profile": "1"})
+        self.client.login(username="journalist1", password="Journalist@123")
+        plain = self.client.get(reverse("dashboard"))
+        # THEN neither request is profiled, and the pages are not open
+        # to non-staff users.
+        self.assertNotIn("X-Profile-URL", refused)
+        self.assertNotIn("X-Profile-URL", plain)
+        self.assertFalse(RequestProfile.objects.exists())
+        self.client.login(username="journalist2", password="Journalist@123")
+        listing = self.client.get(reverse("request_profiles"))
+        self.assertEqual(listing.status_code, 302)
+
+    @override_settings(REQUEST_PROFILE_LOG_SIZE=2)
+    def test_only_latest_profiles_are_kept(self):
+        # WHEN three requests are profiled with room for two.
+        self.client.login(username="journalist1", password="Journalist@123")
+        for _ in range(3):
+            self.client.get(reverse("dashboard"), {"profile": "1"})
+        # THEN the oldest report is pruned.
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+
+class SharedFeedCacheTests(TestCase):
+    def setUp(self):
+        # ARRANGE: Two readers following the same publisher, the second
+        # also following its journalist, and an approved article.
+        cache.clear()
+        metrics.registry.reset()
+        self.api_client = APIClient()
+        self.journalist = User.objects.create_user(
+            username="journalist1", password="Journalist@123", role="journalist"
+        )
+        self.publisher = Publisher.objects.create(name="Daily Planet")
+        self.readers = [
+            User.objects.create_user(
+                username=f"reader{index}", password="Reader@123", role="reader"
+            )
+            for index in range(2)
+        ]
+        for reader in self.readers:
+            reader.subscriptions_publishers.add(self.publisher)
+        self.readers[1].subscriptions_journalists.add(self.journalist)
+        self.article = self.create_article("Cup final", status="approved")
+
+    def create_article(self, title, status="pending"):
+        return Article.objects.create(
+            title=title,
+            content="Body",
+            author=self.journalist,
+            publisher=self.publisher,
+            status=status,
+        )
+
+    def feed(self, reader):
+        self.api_client.force_authenticate(reader)
+        return self.api_client.get(reverse("api_article_list")).json()
+
+    def feed_queries(self, reader):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.feed(reader)
+        articles = [
+            query
+            for query in queries.captured_queries
+            if 'FROM "newsApp_article"' in query["sql"]
+        ]
+        return data, len(articles)
+
+    def test_readers_with_same_subscriptions_share_a_feed(self):
+        # GIVEN a third reader with the same subscriptions as the first.
+        twin = User.objects.create_user(
+            username="reader2", password="Reader@123", role="reader"
+        )
+        twin.subscriptions_publishers.add(self.publisher)
+        # WHEN both read their feed.
+        first, first_queries = self.feed_queries(self.readers[0])
+        second, second_queries = self.feed_queries(twin)
+        # THEN the second is served from the first's cached feed.
+        self.assertEqual(first, second)
+        self.assertEqual((first_queries, second_queries), (1, 0))
+
+    def test_different_subscriptions_do_not_share(self):
+        # WHEN readers with different subscriptions read their feeds.
+        self.feed(self.readers[0])
+        _, queries = self.feed_queries(self.readers[1])
+        # THEN each feed is built.
+        self.assertEqual(queries, 1)
+
+    def test_approval_drops_feeds_of_the_source(self):
+        # GIVEN a cached feed and a pending article.
+        self.feed(self.readers[0])
+        pending = self.create_article("Transfer news")
+        # WHEN the article is approved.
+        pending.status = "approved"
+        pending.save()
+        # THEN the feed is rebuilt with it.
+        titles = {row["title"] for row in self.feed(self.readers[0])}
+        self.assertEqual(titles, {"Cup final", "Transfer news"})
+
+    def test_hit_rate_is_exported(self):
+        # GIVEN one miss and one hit.
+        self.feed(self.readers[0])
+        self.feed(self.readers[0])
+        # WHEN /metrics is read.
+        output = metrics.registry.render()
+        # THEN both are counted.
+        self.assertIn(
+            'newsapp_feed_cache_requests_total{result="hit"} 1', output
+        )
+        self.assertIn(
+            'newsapp_feed_cache_requests_total{result="miss"} 1', output
+        )
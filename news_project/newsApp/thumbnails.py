@@ -0,0 +1,205 @@
+"""
+This file makes the resized article images shown on the site, off the
+request path.
+
+An upload only stores the original (Article.image). When the image of
+a saved article changes, the post_save signal calls schedule(). Once
+the transaction commits, the original's bytes are handed to a pool of
+ARTICLE_IMAGE_WORKERS worker processes. There, functions/images.py
+resizes them to each of ARTICLE_IMAGE_WIDTHS (never upscaling) and
+encodes each size as WebP and as JPEG. Resizing is CPU-bound, so in
+separate processes it neither blocks the request nor holds the GIL
+that the worker's other threads need. The results are stored by the
+pool's result thread in the web process.
+
+Variant files are named after the SHA-256 of their bytes, so a file
+never changes once written. They can be served with
+"Cache-Control: public, max-age=31536000, immutable", and a new upload
+gets new URLs. An identical file is stored only once.
+
+If a worker dies, or the image is replaced before its variants are
+stored, the page falls back to the original (or the newer variants).
+"python manage.py build_image_variants" (re)builds whatever is
+missing.
+
+Pages render the variants with the article_picture template tag: a
+<picture> with a WebP and a JPEG srcset, a sizes hint per layout,
+width and height, and lazy loading for tiles.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from . import article_cache
+from .functions import images
+from .models import Article, ArticleImageVariant
+
+logger = logging.getLogger("newsApp.thumbnails")
+
+VARIANT_DIR = "articles/variants"
+
+# Layout: (width of the fallback <img src>, sizes attribute).
+SIZES = {
+    "tile": (400, "(max-width: 576px) 100vw, 400px"),
+    "detail": (800, "(max-width: 992px) 100vw, 800px"),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def widths():
+    return getattr(settings, "ARTICLE_IMAGE_WIDTHS", [400, 800, 1600])
+
+
+def executor():
+    # Spawned rather than forked: forking a threaded web worker can
+    # copy held locks into the child.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, "ARTICLE_IMAGE_WORKERS", 2),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _executor
+
+
+def original(article_id):
+    """(image name, bytes) of an article's original, or (None, None)."""
+    name = (
+        Article.objects.filter(pk=article_id)
+        .values_list("image", flat=True)
+        .first()
+    )
+    if not name:
+        return None, None
+    with default_storage.open(name, "rb") as image_file:
+        return name, image_file.read()
+
+
+def _file_name(digest, image_format):
+    extension = images.FORMATS[image_format][1]
+    return f"{VARIANT_DIR}/{digest[:2]}/{digest[:32]}.{extension}"
+
+
+def store(article_id, source, variants):
+    """
+    Save rendered variants (see images.render_variants()) of the image
+    source, unless the article's image has changed since. Returns the
+    number of variants stored.
+    """
+    names = []
+    for image_format, _, _, digest, data in variants:
+        name = _file_name(digest, image_format)
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(data))
+        names.append(name)
+
+    with transaction.atomic():
+        current = (
+            Article.objects.select_for_update()
+            .filter(pk=article_id)
+            .values_list("image", flat=True)
+            .first()
+        )
+        if current != source:
+            return 0
+        ArticleImageVariant.objects.filter(article_id=article_id).delete()
+        ArticleImageVariant.objects.bulk_create(
+            ArticleImageVariant(
+                article_id=article_id,
+                source=source,
+                format=image_format,
+                width=width,
+                height=height,
+                file=name,
+            )
+            for (image_format, width, height, _, _), name in zip(
+                variants, names
+            )
+        )
+    article_cache.invalidate(article_id)
+    return len(variants)
+
+
+def process(article_id):
+    """Build the variants of an article's image in this process."""
+    source, data = original(article_id)
+    if source is None:
+        ArticleImageVariant.objects.filter(article_id=article_id).delete()
+        return 0
+    return store(article_id, source, images.render_variants(data, widths()))
+
+
+def _stored(article_id, source, future):
+    # Runs on the pool's result thread, which has its own connections.
+    try:
+        store(article_id, source, future.result())
+    except Exception:
+        logger.exception("Storing image variants of %s failed", article_id)
+    finally:
+        connections.close_all()
+
+
+def submit(article_id):
+    """Build the variants in the worker pool (inline with no workers)."""
+    if not getattr(settings, "ARTICLE_IMAGE_WORKERS", 2):
+        return process(article_id)
+    source, data = original(article_id)
+    if source is None:
+        ArticleImageVariant.objects.filter(article_id=article_id).delete()
+        return None
+    future = executor().submit(images.render_variants, data, widths())
+    future.add_done_callback(partial(_stored, article_id, source))
+    return future
+
+
+def schedule(article_id):
+    """Build the variants once the current transaction has committed."""
+    transaction.on_commit(partial(submit, article_id))
+
+
+def picture(article, size="tile"):
+    """
+    Template context for an article's image at one of SIZES: WebP and
+    JPEG srcsets when its variants are ready, else the original.
+    """
+    if not article.image:
+        return {"article": article}
+    fallback_width, sizes = SIZES[size]
+    # Articles from article_cache carry their variants.
+    variants = getattr(article, "cached_image_variants", None)
+    if variants is None:
+        variants = article.image_variants.all()
+    variants = [
+        variant for variant in variants if variant.source == article.image.name
+    ]
+    jpeg = [variant for variant in variants if variant.format == "jpeg"]
+    if not jpeg:
+        return {"article": article, "src": article.image.url, "size": size}
+    fallback = min(jpeg, key=lambda v: abs(v.width - fallback_width))
+    return {
+        "article": article,
+        "size": size,
+        "sizes": sizes,
+        "src": fallback.file.url,
+        "width": fallback.width,
+        "height": fallback.height,
+        "srcsets": {
+            image_format: ", ".join(
+                f"{v.file.url} {v.width}w"
+                for v in variants
+                if v.format == image_format
+            )
+            for image_format in ("webp", "jpeg")
+        },
+    }
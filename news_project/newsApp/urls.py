@@ -1,20 +1,30 @@
 """
 This file contains the URL patterns defined for the web views.
+
+The hot read views come from async_views.py when ASYNC_VIEWS is on.
 """
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+read_views = async_views if settings.ASYNC_VIEWS else views
 
 
 urlpatterns = [
-    path("", views.article_list, name="article_list"),
-    path("", views.homepage, name="homepage"),
+    path("", read_views.article_list, name="article_list"),
+    path("", read_views.homepage, name="homepage"),
     path("register/", views.register, name="register"),
     path("login/", views.user_login, name="login"),
     path("logout/", views.user_logout, name="logout"),
     path("dashboard/", views.dashboard, name="dashboard"),
     path("article/create/", views.article_create, name="article_create"),
-    path("article/<int:pk>/", views.article_detail, name="article_detail"),
+    path(
+        "article/options/<str:field>/",
+        views.article_field_options,
+        name="article_field_options",
+    ),
+    path("article/<int:pk>/", read_views.article_detail, name="article_detail"),
     path("article/approval/", views.article_approval, name="article_approval"),
     path("article/<int:pk>/delete/", views.article_delete, name="article_delete"),
     path(
@@ -41,5 +51,19 @@ urlpatterns = [
         views.article_delete_by_author,
         name="article_delete_by_author",
     ),
-    path("category/<slug:slug>/", views.category_articles, name="category_articles"),
+    path(
+        "category/<slug:slug>/",
+        read_views.category_articles,
+        name="category_articles",
+    ),
+    path("most-read/", views.most_read, name="most_read"),
+    path(
+        "publisher/<int:pk>/",
+        views.publisher_detail,
+        name="publisher_detail",
+    ),
+    path("metrics", views.metrics, name="metrics"),
+    path("slow-queries/", views.slow_query_log, name="slow_query_log"),
+    path("profiles/", views.request_profiles, name="request_profiles"),
+    path("profiles/<int:pk>/", views.request_profile, name="request_profile"),
 ]
@@ -18,11 +18,26 @@ from django.contrib.auth import login, logout
 from django.contrib import messages
 from .forms import CustomUserCreationForm, ArticleForm
 from django.contrib.auth.decorators import login_required, user_passes_test
-from .models import Article, CustomUser, Category
+from .models import Article, CustomUser, Category, RequestProfile
+from . import metrics as request_metrics
+from . import (
+    article_cache,
+    pickers,
+    popularity,
+    publisher_stats,
+    review_queue,
+    slow_queries,
+)
 
 # from django.core.mail import send_mail
-# from django.conf import settings
-from django.http import HttpResponseForbidden
+from django.conf import settings
+from django.db import transaction
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+)
 
 
 def register(request):
@@ -68,11 +83,8 @@ def dashboard(request):
         context["user_articles"] = user_articles
 
     elif request.user.role == "editor":
-        # Show only articles that are pending
-        pending_articles = Article.objects.filter(
-            status="pending", is_deleted=False
-        ).order_by("-created_at")
-        context["pending_articles"] = pending_articles
+        # Show the pending articles this editor has claimed for review
+        context["pending_articles"] = review_queue.my_claims(request.user)
 
     return render(request, "newsApp/dashboard.html", context)
 
@@ -84,7 +96,7 @@ def article_create(request):
         messages.error(request, "Only journalists can create articles.")
         return redirect("dashboard")
     if request.method == "POST":
-        form = ArticleForm(request.POST)
+        form = ArticleForm(request.POST, request.FILES, user=request.user)
         if form.is_valid():
             article = form.save(commit=False)
             article.author = request.user
@@ -96,36 +108,81 @@ def article_create(request):
             print(form.errors)
             messages.error(request, "There were errors in your submission.")
     else:
-        form = ArticleForm()
+        form = ArticleForm(user=request.user)
     return render(request, "newsApp/article_form.html", {"form": form})
 
 
+@login_required
+def article_field_options(request, field):
+    # Choices of the publisher and category pickers of the article form,
+    # matching ?q=, from the cached option lists (see pickers.py).
+    if request.user.role != "journalist":
+        return HttpResponseForbidden("Only journalists can create articles.")
+    if field not in ("publisher", "category"):
+        raise Http404
+    matches, more = pickers.search(field, request.user, request.GET.get("q", ""))
+    return JsonResponse(
+        {
+            "results": [{"id": pk, "text": name} for pk, name in matches],
+            "more": more,
+        }
+    )
+
+
 @login_required
 @user_passes_test(lambda u: u.role == "editor")
 def article_approval(request):
-    pending_articles = Article.objects.filter(status="pending", is_deleted=False)
-
+    # Editors only see the pending articles they have claimed (see
+    # review_queue.py); opening the page renews their leases.
     if request.method == "POST":
         article_id = request.POST.get("article_id")
-        action = request.POST.get("action")  # "approve" or "reject"
-        article = get_object_or_404(
-            Article, id=article_id, status="pending", is_deleted=False
-        )
-
-        if action == "approve":
-            article.approve(request.user)  # sets status='approved'
-            messages.success(request, "Article approved.")
-            # Signals can handle notifications to subscribers.
-
-        elif action == "reject":
-            article.reject()  # sets status='rejected'
-            messages.warning(request, "Article rejected.")
-            # Optionally email the author about rejection.
+        # "approve", "reject", "claim" (the next batch) or "release"
+        action = request.POST.get("action")
+
+        if action == "claim":
+            if not review_queue.claim_next(request.user):
+                messages.info(request, "No unclaimed articles are waiting.")
+            return redirect("article_approval")
+        if action == "release":
+            review_queue.release(request.user, [article_id])
+            return redirect("article_approval")
+
+        with transaction.atomic():
+            article = (
+                review_queue.decidable(request.user)
+                .select_for_update()
+                .filter(id=article_id)
+                .first()
+            )
+            if article is None:
+                messages.error(
+                    request,
+                    "This article was already decided or is being reviewed "
+                    "by another editor.",
+                )
+                return redirect("article_approval")
+            article.claimed_by = None
+            article.claim_expires_at = None
+
+            if action == "approve":
+                article.approve(request.user)  # sets status='approved'
+                messages.success(request, "Article approved.")
+                # Signals can handle notifications to subscribers.
+
+            elif action == "reject":
+                article.reject()  # sets status='rejected'
+                messages.warning(request, "Article rejected.")
+                # Optionally email the author about rejection.
 
         return redirect("dashboard")  # or redirect('article_approval')
 
     return render(
-        request, "newsApp/article_approval.html", {"pending_articles": pending_articles}
+        request,
+        "newsApp/article_approval.html",
+        {
+            "pending_articles": review_queue.my_claims(request.user),
+            "unclaimed_count": review_queue.unclaimed_count(),
+        },
     )
 
 
@@ -138,20 +195,29 @@ def article_list(request):
 
 @login_required
 def article_detail(request, pk):
-    if request.user.role == "editor":
-        # Editors can view any article that isn’t soft-deleted.
-        article = get_object_or_404(Article, pk=pk, is_deleted=False)
-    elif request.user.role == "journalist":
-        # Journalists can view their own articles regardless of status.
-        article = get_object_or_404(Article, pk=pk, is_deleted=False)
-        if article.author != request.user and article.status != "approved":
-            # Prevent journalists from viewing others' unapproved articles.
-            return HttpResponseForbidden("You are not allowed to view this article.")
-    else:
-        # Readers see only approved articles.
-        article = get_object_or_404(Article, pk=pk, status="approved", is_deleted=False)
-
-    return render(request, "newsApp/article_detail.html", {"article": article})
+    # The article comes from the cache-aside layer (see article_cache.py):
+    # editors and journalists can view any article that isn’t
+    # soft-deleted, readers only approved ones.
+    record = article_cache.get(pk)
+    if not article_cache.visible(record, request.user):
+        raise Http404("No Article matches the given query.")
+    if (
+        request.user.role == "journalist"
+        and record["author_id"] != request.user.pk
+        and record["status"] != "approved"
+    ):
+        # Prevent journalists from viewing others' unapproved articles.
+        return HttpResponseForbidden("You are not allowed to view this article.")
+    article = article_cache.to_article(record)
+
+    if article.status == "approved":
+        # Buffered in memory and flushed in bulk (see popularity.py).
+        popularity.count_view(article.pk)
+    return render(
+        request,
+        "newsApp/article_detail.html",
+        {"article": article, "related_articles": article.related_articles()},
+    )
 
 
 @login_required
@@ -256,7 +322,88 @@ def category_articles(request, slug):
 @login_required
 def homepage(request):
     # Get all approved, non-deleted articles ordered by newest first
-    articles = Article.objects.filter(status="approved", is_deleted=False).order_by(
-        "-created_at"
+    articles = (
+        Article.objects.filter(status="approved", is_deleted=False)
+        .prefetch_related("image_variants")
+        .order_by("-created_at")
     )
     return render(request, "newsApp/homepage.html", {"articles": articles})
+
+
+def most_read(request):
+    # Most read approved articles of the last 24 hours (or ?period=7d).
+    # The ranking is cached; only the ranked articles are loaded here.
+    period = request.GET.get("period", "24h")
+    if period not in popularity.PERIODS:
+        period = "24h"
+    articles = popularity.ranked_articles(
+        Article.objects.select_related("author", "category"),
+        popularity.most_read(period),
+    )
+    return render(
+        request,
+        "newsApp/most_read.html",
+        {"articles": articles, "period": period, "periods": popularity.PERIODS},
+    )
+
+
+def publisher_detail(request, pk):
+    # A publisher's roster, subscriber count, output per category and
+    # latest articles, from the cached stats (see publisher_stats.py).
+    stats = publisher_stats.get(pk)
+    if stats is None:
+        raise Http404("No such publisher.")
+    return render(request, "newsApp/publisher_detail.html", {"stats": stats})
+
+
+def metrics(request):
+    # Per-view request histograms in the Prometheus text format.
+    # Readable by staff users and by scrapers on METRICS_ALLOWED_IPS.
+    allowed_ips = getattr(settings, "METRICS_ALLOWED_IPS", [])
+    if not (
+        request.user.is_staff or request.META.get("REMOTE_ADDR") in allowed_ips
+    ):
+        return HttpResponseForbidden("Metrics are restricted.")
+    return HttpResponse(
+        request_metrics.registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def slow_query_log(request):
+    # Rolling top-N of slow queries recorded by the metrics middleware.
+    return render(
+        request,
+        "newsApp/slow_queries.html",
+        {
+            "slow_queries": slow_queries.top_queries(),
+            "threshold_ms": getattr(settings, "SLOW_QUERY_THRESHOLD_MS", None),
+        },
+    )
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def request_profiles(request):
+    # Reports taken with ?profile=1 (see profiling.py), newest first.
+    return render(
+        request,
+        "newsApp/request_profiles.html",
+        {
+            "profiles": RequestProfile.objects.select_related("user").defer(
+                "functions", "queries", "templates"
+            )
+        },
+    )
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def request_profile(request, pk):
+    return render(
+        request,
+        "newsApp/request_profile.html",
+        {"profile": get_object_or_404(RequestProfile, pk=pk)},
+    )
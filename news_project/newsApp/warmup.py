@@ -0,0 +1,92 @@
+"""
+This file warms up a worker before it serves its first request.
+
+Heavy integrations are imported on first use rather than at startup:
+requests when a tweet is posted (functions/tweet.py), and NumPy when
+an article is indexed for duplicates or related articles are built.
+Starting a worker therefore costs django.setup() plus the app's own
+modules. The URLconf (and with it DRF) is loaded on the first request.
+
+warm_up() moves the remaining first-use costs before the first request
+instead: it loads the URLconf, compiles the most used templates, fills
+the "most read" caches and imports the NumPy modules. With
+WARMUP_ON_STARTUP (NEWSAPP_WARMUP=1), wsgi.py and asgi.py call it when
+the application is created. That suits gunicorn --preload, where the
+master warms up once and forked workers share the result. A failing
+step is logged and skipped; it never keeps a worker from starting.
+The database connections the steps opened are closed at the end, so
+forked workers do not inherit, and share, the master's connection.
+
+"python manage.py startup_profile --warmup" reports what each step
+costs.
+"""
+
+import importlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+from . import popularity
+
+logger = logging.getLogger("newsApp.warmup")
+
+TEMPLATES = [
+    "newsApp/base.html",
+    "newsApp/homepage.html",
+    "newsApp/article_list.html",
+    "newsApp/article_detail.html",
+    "newsApp/most_read.html",
+]
+LAZY_MODULES = ["newsApp.duplicates", "newsApp.related"]
+
+
+def load_urls():
+    get_resolver().url_patterns
+
+
+def compile_templates():
+    for name in TEMPLATES:
+        get_template(name)
+
+
+def fill_most_read():
+    for period in popularity.PERIODS:
+        popularity.most_read(period)
+
+
+def import_lazy_modules():
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+
+
+STEPS = [
+    ("URLconf", load_urls),
+    ("templates", compile_templates),
+    ("most read cache", fill_most_read),
+    ("lazy modules", import_lazy_modules),
+]
+
+
+def warm_up():
+    """Run every step; return [(step, seconds or None if it failed)]."""
+    timings = []
+    for name, step in STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("Warm-up step %r failed", name)
+            timings.append((name, None))
+        else:
+            timings.append((name, time.perf_counter() - start))
+    connections.close_all()
+    return timings
+
+
+def warm_up_if_enabled():
+    if getattr(settings, "WARMUP_ON_STARTUP", False):
+        warm_up()
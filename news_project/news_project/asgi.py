@@ -12,5 +12,14 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "news_project.settings")
+# Serve the hot read views natively async (see newsApp/async_views.py).
+# The live feed (/api/articles/live/) should be served from here too.
+os.environ.setdefault("NEWSAPP_ASYNC_VIEWS", "1")
 
 application = get_asgi_application()
+
+# Preload the URLconf, templates and caches when WARMUP_ON_STARTUP is
+# set (see newsApp/warmup.py).
+from newsApp.warmup import warm_up_if_enabled  # noqa: E402
+
+warm_up_if_enabled()
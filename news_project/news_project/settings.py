@@ -43,12 +43,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so the Server-Timing total covers the whole stack.
+    "newsApp.middleware.RequestMetricsMiddleware",
+    # Keeps clients that just wrote on the primary (see DATABASE_REPLICAS).
+    "newsApp.middleware.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    # Profiles requests of staff users on demand (needs request.user).
+    "newsApp.middleware.RequestProfilingMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -57,7 +63,8 @@ ROOT_URLCONF = "news_project.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # The standard Django backend, with render timing for /metrics
+        "BACKEND": "newsApp.metrics.TimedDjangoTemplates",
         "DIRS": [os.path.join(BASE_DIR, "templates")],  # Global templates folder
         "APP_DIRS": True,
         "OPTIONS": {
@@ -89,6 +96,46 @@ DATABASES = {
     }
 }
 
+# Read replicas: DATABASES aliases that take read traffic. Writes, and
+# reads by clients that wrote in the last REPLICA_PIN_SECONDS, stay on
+# "default". Replicas more than REPLICA_MAX_LAG_SECONDS behind are
+# skipped. To try the routing locally with two SQLite databases:
+#
+#   DATABASES = {
+#       "default": {
+#           "ENGINE": "django.db.backends.sqlite3",
+#           "NAME": BASE_DIR / "db.sqlite3",
+#       },
+#       "replica": {
+#           "ENGINE": "django.db.backends.sqlite3",
+#           "NAME": BASE_DIR / "db_replica.sqlite3",
+#           "TEST": {"MIRROR": "default"},
+#       },
+#   }
+#   DATABASE_REPLICAS = ["replica"]
+DATABASE_ROUTERS = ["newsApp.routers.PrimaryReplicaRouter"]
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = "primary_pin"
+REPLICA_MAX_LAG_SECONDS = 5
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+
+# Admin changelists of tables with more rows than this show the
+# database's row estimate instead of an exact COUNT(*) when unfiltered
+# (newsApp/admin.py). SQLite keeps no estimate and always counts.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+# Cache. The throttling, counters and object caches use it, so in
+# production point it at a shared backend (Redis or Memcached) for all
+# workers; the local-memory default is per process.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -115,6 +162,23 @@ AUTH_PASSWORD_VALIDATORS = [
 # Specify our custom user model.
 AUTH_USER_MODEL = "newsApp.CustomUser"
 
+# request.user is served from a per-user record cached for
+# AUTH_USER_CACHE_SECONDS (newsApp/auth_cache.py). Sessions logged in
+# with another backend path must log in again once.
+AUTHENTICATION_BACKENDS = ["newsApp.auth_cache.CachedModelBackend"]
+AUTH_USER_CACHE_SECONDS = 60
+
+# Set NEWSAPP_SESSION_WRITE_BEHIND=1 to keep sessions in the cache and
+# write them to the database in bulk every SESSION_WRITE_BEHIND_SECONDS,
+# or once SESSION_WRITE_BEHIND_MAX_PENDING sessions are waiting
+# (newsApp/session_store.py). It needs a cache shared by every worker
+# (Redis, Memcached): with the local-memory default each worker has its
+# own sessions. Otherwise Django's database engine is used.
+if os.environ.get("NEWSAPP_SESSION_WRITE_BEHIND") == "1":
+    SESSION_ENGINE = "newsApp.session_store"
+SESSION_WRITE_BEHIND_SECONDS = 5
+SESSION_WRITE_BEHIND_MAX_PENDING = 500
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -133,9 +197,25 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]  # Global static folder
 
+# Uploaded article images and their resized variants. Variant files are
+# content-hashed and never change: serve MEDIA_URL + "articles/variants/"
+# with "Cache-Control: public, max-age=31536000, immutable".
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Email settings – using the console backend for development.
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Approval notifications: one message per subscriber, sent in batches
+# over one SMTP connection each, at most NOTIFICATION_MAX_PER_SECOND
+# (None for no limit).
+NOTIFICATION_BATCH_SIZE = 50
+NOTIFICATION_MAX_PER_SECOND = None
+
+# Days covered by the first newsletter digest run; later runs start
+# where the previous one ended (manage.py send_newsletter_digest).
+NEWSLETTER_DIGEST_DAYS = 7
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -143,3 +223,129 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Set the login URL for the login_required decorator
 LOGIN_URL = "/login/"
+
+# Request metrics: Server-Timing headers and the Prometheus /metrics page.
+# Staff users can always read /metrics; scrapers are allowed by IP.
+REQUEST_METRICS_ENABLED = True
+METRICS_ALLOWED_IPS = ["127.0.0.1"]
+
+# Slow-query log: queries slower than this are logged with their EXPLAIN
+# plan and kept in a rolling table of the SLOW_QUERY_LOG_SIZE slowest.
+# Set the threshold to None to turn the log off. Each fingerprint is
+# recorded at most once every SLOW_QUERY_RECORD_SECONDS (sooner if it
+# got slower), by SLOW_QUERY_LOG_WORKERS threads after the response;
+# with 0 workers the slow request records it itself.
+SLOW_QUERY_THRESHOLD_MS = 200
+SLOW_QUERY_LOG_SIZE = 50
+SLOW_QUERY_RECORD_SECONDS = 60
+SLOW_QUERY_LOG_WORKERS = 1
+
+# On-demand profiling: staff users add ?profile=1 (or send X-Profile: 1)
+# to profile a request; reports are listed on /profiles/ (see
+# newsApp/profiling.py), the REQUEST_PROFILE_LOG_SIZE latest kept.
+REQUEST_PROFILING_ENABLED = True
+REQUEST_PROFILE_LOG_SIZE = 50
+
+# Serve the hot read views from async_views.py. news_project/asgi.py
+# turns this on for the ASGI deployment; WSGI keeps the sync views.
+ASYNC_VIEWS = os.environ.get("NEWSAPP_ASYNC_VIEWS") == "1"
+
+# Warm each worker up (URLconf, templates, "most read" cache, NumPy)
+# before its first request, instead of on first use. See
+# newsApp/warmup.py and "python manage.py startup_profile --warmup".
+WARMUP_ON_STARTUP = os.environ.get("NEWSAPP_WARMUP") == "1"
+
+# Article image variants (newsApp/thumbnails.py): each upload is resized
+# to these widths (never upscaled), as WebP and JPEG, by this many worker
+# processes. With 0 workers the resizing runs in the web process.
+ARTICLE_IMAGE_WIDTHS = [400, 800, 1600]
+ARTICLE_IMAGE_WORKERS = 2
+
+# Approval announcements (newsApp/announcements.py): subscriber e-mails
+# and the post on X are sent after the approval commits, by this many
+# worker threads. With 0 workers they are sent in the web process, still
+# after the commit. "manage.py send_announcements" sends any that a
+# stopped worker left behind.
+ANNOUNCEMENT_WORKERS = 2
+
+# Article detail records are cached for this long (newsApp/article_cache.py).
+# Every write invalidates them, so this only bounds memory.
+ARTICLE_CACHE_SECONDS = 300
+
+# Option lists of the article form's publisher and category pickers
+# (newsApp/pickers.py); invalidated on change, so this bounds memory.
+ARTICLE_OPTIONS_CACHE_SECONDS = 300
+
+# Publisher page and stats API aggregates (newsApp/publisher_stats.py);
+# each part is invalidated when it changes, so this bounds memory and
+# the few changes no signal reports.
+PUBLISHER_STATS_CACHE_SECONDS = 600
+
+# Live feed of approvals (newsApp/live_feed.py, /api/articles/live/).
+# While streams are open, each process reads the approval log every
+# LIVE_FEED_POLL_SECONDS to pick up approvals made by other processes,
+# and keeps the latest LIVE_FEED_BUFFER events for its streams. Idle
+# streams send a heartbeat every LIVE_FEED_HEARTBEAT_SECONDS.
+LIVE_FEED_POLL_SECONDS = 2
+LIVE_FEED_HEARTBEAT_SECONDS = 15
+LIVE_FEED_BUFFER = 1000
+
+# Reader feeds of /api/articles/, shared by readers with the same
+# subscriptions (newsApp/feed_cache.py); invalidated when a followed
+# source's approved articles change, so this bounds memory.
+FEED_CACHE_SECONDS = 300
+
+# The delta-sync token (newsApp/delta_sync.py) stays this far behind
+# the present, so rows of transactions that commit late are not missed.
+DELTA_SYNC_SETTLE_SECONDS = 10
+
+# Most articles one POST to /api/articles/ may create, and how long the
+# response to an Idempotency-Key is replayed (newsApp/idempotency.py).
+ARTICLE_BULK_CREATE_MAX = 500
+IDEMPOTENCY_KEY_SECONDS = 86400
+
+# Article view counting (newsApp/popularity.py): reads are buffered in
+# memory per process and flushed in bulk by a background thread every
+# VIEW_COUNT_FLUSH_SECONDS, or once VIEW_COUNT_MAX_PENDING article/hour
+# pairs are waiting. The "most read" rankings are cached for
+# MOST_READ_CACHE_SECONDS.
+VIEW_COUNT_FLUSH_SECONDS = 10
+VIEW_COUNT_MAX_PENDING = 1000
+MOST_READ_LIMIT = 10
+MOST_READ_CACHE_SECONDS = 60
+
+# Related articles kept per article by manage.py build_related_articles.
+RELATED_ARTICLES_COUNT = 5
+
+# Pending articles whose MinHash similarity to an earlier article
+# reaches this are flagged as possible duplicates in the approval queue.
+# Similarity is over 5-word shingles: changing one word in 30 gives
+# about 0.7.
+DUPLICATE_SIMILARITY = 0.7
+
+# Review queue (newsApp/review_queue.py): editors claim this many pending
+# articles at a time, each for REVIEW_CLAIM_SECONDS unless renewed.
+REVIEW_CLAIM_BATCH = 10
+REVIEW_CLAIM_SECONDS = 900
+
+# Article revision history (newsApp/revisions.py): every Nth revision
+# is a full snapshot, the ones in between are diffs. Rebuilding a
+# revision applies at most N - 1 diffs.
+REVISION_SNAPSHOT_INTERVAL = 10
+
+# API rate limits per endpoint (a view's throttle_scope), role and action
+# ("list" for reads, "create" for writes); see newsApp/throttling.py.
+# A missing or None rate means no limit.
+API_THROTTLE_RATES = {
+    "articles": {
+        "reader": {"list": "120/min", "create": None},
+        "journalist": {"list": "120/min", "create": "30/min"},
+        "editor": {"list": "300/min", "create": "30/min"},
+    },
+    # /api/articles/changes/: sync clients poll it on their own schedule.
+    "article_changes": {
+        "reader": {"list": "60/min"},
+        "journalist": {"list": "60/min"},
+        "editor": {"list": "120/min"},
+    },
+}
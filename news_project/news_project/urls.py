@@ -18,6 +18,8 @@ Defines the main URL routes, including routes for the app and API
 endpoints.
 """
 
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
@@ -26,3 +28,7 @@ urlpatterns = [
     path("", include("newsApp.urls")),  # Web application endpoints
     path("api/", include("newsApp.api_urls")),  # REST API endpoints
 ]
+
+# Uploaded images, served by Django only with DEBUG on (static() is a
+# no-op otherwise); production serves MEDIA_ROOT from the web server.
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
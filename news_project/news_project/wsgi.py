@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "news_project.settings")
 
 application = get_wsgi_application()
+
+# Preload the URLconf, templates and caches when WARMUP_ON_STARTUP is
+# set (see newsApp/warmup.py).
+from newsApp.warmup import warm_up_if_enabled  # noqa: E402
+
+warm_up_if_enabled()